@@ -2,6 +2,53 @@ import { useState, useEffect, useRef } from 'react';
 import mqtt from 'mqtt';
 
 const MQTT_BROKER = 'ws://172.16.206.37:9090';
+const CLIENT_ID = `sgarden_${Math.random().toString(16).slice(2, 8)}`;
+const CHART_POINTS = 150;   // = SNAPSHOT_WINDOW côté Pi (5 min de trames)
+const SYNC_TIMEOUT = 5000;  // ms avant de redemander les trames manquantes
+
+// Trame de télémétrie (iot/mqtt/telemetry.py) : JSON à clés courtes ou binaire
+// little-endian de 27 octets (schéma retenu sur jardin/telemetry/schema).
+// boot identifie le démarrage du Pi : seq repart de 1 à chaque démarrage.
+const FRAME_KEYS = {
+    b: 'boot', s: 'seq', t: 'ts', T: 'temperature', H: 'humidity', L: 'light',
+    D: 'is_dark', I: 'intensity', R: 'rain_pct', W: 'rain_digital', P: 'pump_on',
+};
+
+const decodeFrame = (message) => {
+    if (message[0] === 0x7b) {   // '{'
+        const data = JSON.parse(message.toString());
+        return Object.fromEntries(Object.entries(data).map(([k, v]) => [FRAME_KEYS[k] || k, v]));
+    }
+    // version u8 | seq u32 | boot u32 | ts u64 | temp i16 ×10 | hum u16 ×10 | light u16 | rain u16
+    // | intensité u8 | flags u8 — version 1 : sans boot (trames d'avant la mise à jour, file hors connexion)
+    const view = new DataView(message.buffer, message.byteOffset, message.byteLength);
+    const opt = (value, missing, scale = 1) => (value === missing ? null : value / scale);
+    const v1 = view.getUint8(0) === 1;
+    const o = v1 ? 0 : 4;
+    const flags = view.getUint8(22 + o);
+    return {
+        seq: view.getUint32(1, true),
+        boot: v1 ? null : view.getUint32(5, true),
+        ts: Number(view.getBigUint64(5 + o, true)),
+        temperature: opt(view.getInt16(13 + o, true), -32768, 10),
+        humidity: opt(view.getUint16(15 + o, true), 65535, 10),
+        light: opt(view.getUint16(17 + o, true), 65535),
+        rain_pct: opt(view.getUint16(19 + o, true), 65535),
+        intensity: opt(view.getUint8(21 + o), 255),
+        is_dark: (flags & 1) === 1,
+        rain_digital: (flags >> 1) & 1,
+        pump_on: (flags & 4) === 4,
+    };
+};
+
+const timeLabel = (ts) => new Date(ts).toLocaleTimeString('fr-CA', {
+    hour: '2-digit', minute: '2-digit', second: '2-digit',
+});
+
+// État retenu (iot/mqtt/snapshot.py) : fenêtre en colonnes à clés courtes → trames
+const stateFrames = (columns) =>
+    (columns.s || []).map((_, i) => Object.fromEntries(
+        Object.entries(columns).map(([k, column]) => [FRAME_KEYS[k] || k, column[i]])));
 
 export default function useMqtt() {
     const clientRef = useRef(null);
@@ -13,11 +60,19 @@ export default function useMqtt() {
         isDark: null,   // bool RC
         rainPct: null,   // % analogique
         rainDigital: null,   // 0=pluie, 1=sec
+        anomalyScore: null,   // score IA lissé (> 0 = anomalie)
+        anomaly: null,   // drapeau IA (avec hystérésis)
     });
     const [alerts, setAlerts] = useState([]);
     const [eventLog, setEventLog] = useState([]);
     const [chartTemp, setChartTemp] = useState([]);
     const [chartHum, setChartHum] = useState([]);
+    const [chartAnomaly, setChartAnomaly] = useState([]);
+    const lastFrameRef = useRef(null);   // dernière trame reçue (les topics historiques ne tracent plus les courbes)
+    const bootRef = useRef(null);        // démarrage du Pi ("b" de l'état) : les seq repartent de 1
+    const syncRef = useRef(0);           // heure de la demande de resynchronisation en cours (0 = aucune)
+    const commandsRef = useRef(new Set());   // id des commandes envoyées, en attente de réponse
+    const commandSeqRef = useRef(0);
 
     const addEvent = (topic, summary, type = 'info') => {
         const ts = new Date().toLocaleString('fr-CA', {
@@ -27,17 +82,59 @@ export default function useMqtt() {
         setEventLog(prev => [{ ts, topic, summary, type }, ...prev].slice(0, 20));
     };
 
-    const pushPoint = (setter, value) => {
-        if (value == null) return;
-        const ts = new Date().toLocaleTimeString('fr-CA', {
-            hour: '2-digit', minute: '2-digit', second: '2-digit',
-        });
-        setter(prev => [...prev, { time: ts, value }].slice(-20));
+    const pushPoints = (setter, points, replace = false) => {
+        const kept = points.filter(p => p.value != null);
+        setter(prev => [...(replace ? [] : prev), ...kept].slice(-CHART_POINTS));
+    };
+
+    const pushPoint = (setter, value, ts = Date.now()) => pushPoints(setter, [{ time: timeLabel(ts), value }]);
+
+    const showFrame = (frame) => setSensorData(prev => ({
+        ...prev,
+        temperature: frame.temperature,
+        humidity: frame.humidity,
+        light: frame.light,
+        isDark: Boolean(frame.is_dark),
+        lightIntensity: frame.intensity,
+        rainPct: frame.rain_pct,
+        rainDigital: frame.rain_digital,
+    }));
+
+    // Trames manquantes depuis `since` : une seule demande à la fois, réponse sur jardin/sync/reply/<id>
+    const requestSync = (client, since) => {
+        if (syncRef.current && Date.now() - syncRef.current < SYNC_TIMEOUT) return;
+        syncRef.current = Date.now();
+        client.publish('jardin/sync/request', JSON.stringify({ id: CLIENT_ID, since, b: bootRef.current }));
+    };
+
+    // État retenu ou réponse de synchronisation : même démarrage → on ajoute les trames
+    // postérieures à la dernière reçue ; sinon (premier état, redémarrage du Pi) on remplace
+    const applyState = (state) => {
+        const replace = bootRef.current !== state.b || !lastFrameRef.current;
+        const after = replace ? -1 : lastFrameRef.current.seq;
+        bootRef.current = state.b;
+        syncRef.current = 0;
+        const frames = stateFrames(state.w).filter(f => f.seq > after);
+        const scores = (state.A || []).filter(([t]) => replace || t > lastFrameRef.current.ts);
+        if (frames.length) {
+            const last = frames[frames.length - 1];
+            lastFrameRef.current = last;
+            showFrame(last);
+            pushPoints(setChartTemp, frames.map(f => ({ time: timeLabel(f.ts), value: f.temperature })), replace);
+            pushPoints(setChartHum, frames.map(f => ({ time: timeLabel(f.ts), value: f.humidity })), replace);
+        } else if (replace) {
+            lastFrameRef.current = null;
+            setChartTemp([]);
+            setChartHum([]);
+        }
+        pushPoints(setChartAnomaly, scores.map(([t, score]) => ({ time: timeLabel(t), value: score })), replace);
+        if (state.a)
+            setSensorData(prev => ({ ...prev, anomalyScore: state.a.score, anomaly: state.a.anomaly }));
     };
 
     useEffect(() => {
         const client = mqtt.connect(MQTT_BROKER, {
-            clientId: `sgarden_${Math.random().toString(16).slice(2, 8)}`,
+            clientId: CLIENT_ID,
             username: 'smartgarden',
             password: 'smart2024',
             keepalive: 60,
@@ -52,16 +149,54 @@ export default function useMqtt() {
             addEvent('system', `Connecté au broker MQTT (${MQTT_BROKER})`, 'success');
             client.subscribe('jardin/sensors/+');
             client.subscribe('jardin/alerts');
+            client.subscribe('jardin/commands/reply');
+            client.subscribe('jardin/telemetry');
+            // État retenu : courbes et valeurs courantes dès l'abonnement, sans attendre les trames
+            client.subscribe('jardin/state');
+            client.subscribe(`jardin/sync/reply/${CLIENT_ID}`);
+            syncRef.current = 0;
+            if (lastFrameRef.current) requestSync(client, lastFrameRef.current.seq);   // reconnexion
         });
 
         client.on('message', (topic, message) => {
             try {
+                if (topic === 'jardin/telemetry') {
+                    const frame = decodeFrame(message);
+                    const last = lastFrameRef.current;
+                    if (bootRef.current === null) bootRef.current = frame.boot ?? null;   // avant tout état
+                    if ((frame.boot ?? null) !== bootRef.current) {
+                        // Autre démarrage : trame d'avant un redémarrage renvoyée par la file hors connexion,
+                        // ou nouveau démarrage dont l'état n'est pas encore reçu → la réponse tranche
+                        requestSync(client, last ? last.seq : null);
+                        return;
+                    }
+                    if (last && frame.seq <= last.seq) return;   // déjà reçue (état, renvoi après coupure)
+                    if (last && frame.seq !== last.seq + 1) {
+                        // Trou : la réponse apporte les trames manquantes et celle-ci
+                        console.warn(`[MQTT] Trames perdues : ${last.seq} → ${frame.seq}, resynchronisation`);
+                        requestSync(client, last.seq);
+                        return;
+                    }
+                    lastFrameRef.current = frame;
+                    showFrame(frame);
+                    pushPoint(setChartTemp, frame.temperature, frame.ts);
+                    pushPoint(setChartHum, frame.humidity, frame.ts);
+                    return;
+                }
+
+                if (topic === 'jardin/state' || topic.startsWith('jardin/sync/reply/')) {
+                    applyState(JSON.parse(message.toString()));
+                    return;
+                }
+
                 const data = JSON.parse(message.toString());
 
                 if (topic === 'jardin/sensors/temperature') {
                     setSensorData(prev => ({ ...prev, temperature: data.temperature, humidity: data.humidity }));
-                    pushPoint(setChartTemp, data.temperature);
-                    pushPoint(setChartHum, data.humidity);
+                    if (!lastFrameRef.current) {   // passerelle sans trames : courbes sur les topics historiques
+                        pushPoint(setChartTemp, data.temperature);
+                        pushPoint(setChartHum, data.humidity);
+                    }
                     addEvent(topic, `T:${data.temperature}°C | H:${data.humidity}%`);
 
                 } else if (topic === 'jardin/sensors/light') {
@@ -78,9 +213,21 @@ export default function useMqtt() {
                     addEvent(topic, `${data.rain_pct}/255 | ${label}`,
                         data.rain_digital === 0 ? 'warning' : 'info');
 
+                } else if (topic === 'jardin/sensors/anomaly') {
+                    setSensorData(prev => ({ ...prev, anomalyScore: data.score, anomaly: data.anomaly }));
+                    pushPoint(setChartAnomaly, data.score);
+
                 } else if (topic === 'jardin/alerts') {
                     setAlerts(prev => [data, ...prev].slice(0, 5));
                     addEvent(topic, data.message, data.level === 'error' ? 'error' : 'warning');
+
+                } else if (topic === 'jardin/commands/reply') {
+                    // Réponse du Pi (iot/logic/commands.py) : seulement pour nos commandes
+                    if (!commandsRef.current.delete(data.id)) return;
+                    const latency = data.latency_ms ?? data.queue_ms;
+                    const type = data.status === 'done' ? 'success' : data.status === 'rejected' ? 'error' : 'warning';
+                    addEvent(topic, `${data.command} : ${data.status}${data.error ? ` (${data.error})` : ''}`
+                        + (latency != null ? ` — ${Math.round(latency)} ms` : ''), type);
                 }
             } catch (e) {
                 console.error('[MQTT] Parse error:', e);
@@ -95,9 +242,12 @@ export default function useMqtt() {
         return () => client.end();
     }, []); // eslint-disable-line
 
+    // id : réponse sur jardin/commands/reply et renvoi QoS 1 dédoublonné par le Pi ; ts : latence de bout en bout
     const publishCommand = (topic, message) => {
-        if (clientRef.current && isConnected)
-            clientRef.current.publish(topic, JSON.stringify(message));
+        if (!clientRef.current || !isConnected) return;
+        const id = `${CLIENT_ID}-${++commandSeqRef.current}`;
+        commandsRef.current.add(id);
+        clientRef.current.publish(topic, JSON.stringify({ ...message, id, ts: Date.now() }), { qos: 1 });
     };
 
     const setLightIntensity = (value) =>
@@ -113,7 +263,7 @@ export default function useMqtt() {
 
     return {
         isConnected, sensorData, alerts, eventLog,
-        chartTemp, chartMoisture: chartHum,
+        chartTemp, chartMoisture: chartHum, chartAnomaly,
         publishCommand, startWatering, stopWatering, setLightIntensity,
     };
 }
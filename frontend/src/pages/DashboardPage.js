@@ -118,6 +118,16 @@ export default function DashboardPage() {
                             status="Temps réel"
                             progress={sensorData.light ? (sensorData.light / 1000) * 100 : 0}
                         />
+                        {/* 5 - Anomalie IA (score lissé : > 0 = anomalie) */}
+                        <MetricCard
+                            title="Anomalie IA"
+                            value={fmt(sensorData.anomalyScore, 2)}
+                            unit=""
+                            icon="fa-brain"
+                            color={sensorData.anomaly ? 'bg-red-500' : 'bg-green-500'}
+                            status={sensorData.anomaly === null ? 'En attente' : sensorData.anomaly ? 'Anomalie' : 'Normal'}
+                            progress={sensorData.anomalyScore !== null ? (sensorData.anomalyScore + 0.2) / 0.4 * 100 : 0}
+                        />
                         {/* 6 - Jour / Nuit */}
                         <MetricCard
                             title="Éclairage"
@@ -1,4 +1,6 @@
-from config import MOCK_MODE, PIN_GROW_LIGHT
+import hal
+from actuators.outputs import outputs
+from config import PIN_GROW_LIGHT
 from utils.logger import logger
 
 
@@ -12,28 +14,31 @@ class GrowLight:
     set_intensity() accepte 0-100 :
       - 0       → OFF
       - 1-100   → PWM avec duty cycle correspondant
+
+    Le rapport cyclique passe par actuators.outputs (sortie "grow_light") :
+    il n'est réécrit que s'il change.
     """
 
     def __init__(self, pin=PIN_GROW_LIGHT):
         self.pin       = pin
         self.intensity = 0   # 0 = éteint, 100 = allumé
-        self._gpio_ok  = False
+        self._gpio     = None
         self._pwm      = None
 
-        if not MOCK_MODE:
-            self._init_gpio()
+        self._init_gpio()
 
     def _init_gpio(self):
         try:
-            import RPi.GPIO as GPIO
+            GPIO = hal.gpio()
             # GPIO.setmode déjà appelé par leds.py
             GPIO.setup(self.pin, GPIO.OUT)
             self._pwm = GPIO.PWM(self.pin, 1000)  # 1kHz PWM
             self._pwm.start(0)  # 0% au démarrage
-            self._gpio_ok = True
+            self._gpio = GPIO
             logger.info(f"Actuator [GrowLight]: GPIO {self.pin} initialisé (PWM)")
         except Exception as e:
             logger.error(f"Actuator [GrowLight]: Impossible d'initialiser GPIO {self.pin}: {e}")
+        outputs.register("grow_light", self._pwm.ChangeDutyCycle if self._pwm else None, 0)
 
     def set_intensity(self, level: int):
         """
@@ -42,22 +47,15 @@ class GrowLight:
         """
         level = max(0, min(100, int(level)))
         self.intensity = level
-        logger.info(f"Actuator [GrowLight]: PWM (level={level}%, GPIO {self.pin})")
-
-        if not MOCK_MODE and self._gpio_ok and self._pwm:
-            try:
-                self._pwm.ChangeDutyCycle(level)
-            except Exception as e:
-                logger.error(f"Actuator [GrowLight]: Erreur PWM: {e}")
+        outputs.set("grow_light", level)
 
     def cleanup(self):
         self.set_intensity(0)
-        if not MOCK_MODE and self._gpio_ok:
+        if self._gpio:
             try:
                 if self._pwm:
                     self._pwm.stop()
-                import RPi.GPIO as GPIO
-                GPIO.cleanup(self.pin)
+                self._gpio.cleanup(self.pin)
                 logger.info(f"Actuator [GrowLight]: GPIO {self.pin} libéré.")
             except Exception as e:
                 logger.error(f"Actuator [GrowLight]: Erreur cleanup: {e}")
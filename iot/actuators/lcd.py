@@ -1,4 +1,5 @@
-from config import MOCK_MODE
+import threading
+import hal
 from utils.logger import logger
 
 # Adresse I2C par défaut du module LCD avec PCF8574 (souvent 0x27 ou 0x3F)
@@ -6,6 +7,13 @@ LCD_I2C_ADDRESS = 0x27
 LCD_PORT        = 1       # I2C bus 1 sur Raspberry Pi
 LCD_COLS        = 16      # Nombre de colonnes
 LCD_ROWS        = 2       # Nombre de lignes
+LCD_MAX_FPS     = 4       # Rafraîchissements max par seconde (thread de rendu)
+_BORDER         = '-' * LCD_COLS
+_BLANK          = (' ' * LCD_COLS,) * LCD_ROWS
+
+# Coût (en transferts I2C de 6 octets) d'un clear() : commande lente de 1,52 ms
+# ≈ 3 transferts à 100 kHz, plus le transfert lui-même
+_CLEAR_COST = 4
 
 
 class Lcd:
@@ -13,42 +21,73 @@ class Lcd:
     Écran LCD 16x2 piloté via I2C avec la librairie RPLCD.
     Compatible avec les modules basés sur PCF8574 (adresse 0x27 ou 0x3F).
 
-    En mode MOCK, les messages sont simplement affichés dans les logs.
+    L'écran est fourni par la HAL (RPLCD réel ou LCD simulé) ; les messages
+    sont aussi affichés dans les logs.
+
+    Tampon d'image : le contenu réellement affiché est mémorisé et seules les
+    cellules modifiées sont envoyées (déplacement de curseur + caractères) ;
+    rien n'est écrit si l'image n'a pas changé. Les écritures physiques se
+    font dans un thread de rendu limité à LCD_MAX_FPS : display() et scroll()
+    ne bloquent jamais l'appelant. Des pages (scroll(), show_pages()) peuvent
+    tourner par-dessus l'image de base fixée par display().
+
+    Avec une horloge virtuelle (HAL simulé), pas de thread : le rendu est
+    fait directement dans display() / show_pages() / poll().
+
+    Deux verrous : _lock protège l'état (images, curseur, compteurs) et
+    n'est jamais tenu pendant un transfert I2C ; _io_lock sérialise les
+    accès à l'écran physique, dans l'ordre où les rendus ont été préparés.
     """
 
-    def __init__(self, address=LCD_I2C_ADDRESS, port=LCD_PORT):
+    def __init__(self, address=LCD_I2C_ADDRESS, port=LCD_PORT, max_fps=LCD_MAX_FPS):
         self.address = address
         self.port = port
         self._lcd = None
+        self._clock = hal.clock()
+        self._min_interval = 1.0 / max_fps
+
+        self._lock        = threading.Lock()
+        self._io_lock     = threading.Lock()
+        self._base        = _BLANK   # image fixée par display()
+        self._pages       = []       # [(ligne1, ligne2)] en rotation par-dessus la base
+        self._page_period = 0.0
+        self._page_start  = 0.0      # clock.monotonic() d'affichage de la page 0
+        self._page_repeat = False
+        self._shown       = None     # image sur l'écran physique (None = inconnue)
+        self._cursor      = None     # position du curseur physique (None = inconnue)
+        self._last_render = None
+
+        # Compteurs
+        self.renders       = 0   # écritures physiques
+        self.skipped       = 0   # rendus évités (image inchangée)
+        self.transfers     = 0   # transferts I2C (commandes + caractères)
 
-        if not MOCK_MODE:
-            self._init_lcd()
+        self._wakeup = threading.Event()
+        self._stop   = threading.Event()
+        self._thread = None
+
+        self._init_lcd()
+        if self._lcd is not None and not self._clock.virtual:
+            self._thread = threading.Thread(target=self._render_loop, name="lcd", daemon=True)
+            self._thread.start()
 
     # ------------------------------------------------------------------
     # Initialisation
     # ------------------------------------------------------------------
 
     def _init_lcd(self):
-        """Initialise l'écran LCD via RPLCD en mode I2C.
+        """Initialise l'écran LCD (HAL → RPLCD) en mode I2C.
 
         Essaie d'abord l'adresse configurée (0x27), puis tente 0x3F
         (adresse alternative fréquente selon le fabricant du module I2C).
         """
-        from RPLCD.i2c import CharLCD
         candidates = [self.address, 0x3F if self.address != 0x3F else 0x27]
         for addr in candidates:
             try:
-                self._lcd = CharLCD(
-                    i2c_expander='PCF8574',
-                    address=addr,
-                    port=self.port,
-                    cols=LCD_COLS,
-                    rows=LCD_ROWS,
-                    dotsize=8,
-                    auto_linebreaks=True,   # évite les problèmes de curseur
-                    backlight_enabled=True,
-                )
+                self._lcd = hal.char_lcd(addr, self.port, LCD_COLS, LCD_ROWS)
                 self._lcd.clear()
+                self._shown  = _BLANK
+                self._cursor = (0, 0)
                 self.address = addr  # mémorise l'adresse qui a fonctionné
                 logger.info(f"Actuator [LCD]: Écran initialisé (adresse={hex(addr)}, {LCD_COLS}x{LCD_ROWS})")
                 return
@@ -63,25 +102,42 @@ class Lcd:
 
     def display(self, line1: str, line2: str = ""):
         """
-        Affiche deux lignes de texte sur l'écran LCD.
+        Affiche deux lignes de texte sur l'écran LCD (sans bloquer).
         Chaque ligne est tronquée / complétée à exactement LCD_COLS caractères.
 
         :param line1: Texte de la première ligne.
         :param line2: Texte de la deuxième ligne (optionnel).
         """
-        l1 = self._format_line(line1)
-        l2 = self._format_line(line2)
+        frame = (self._format_line(line1), self._format_line(line2))
+        with self._lock:
+            if frame == self._base:
+                self.skipped += 1
+                return
+            self._base = frame
 
-        # Toujours logger en mode mock ET en mode réel (pour le débogage)
-        logger.info(f"Actuator [LCD]:\n  +{'-'*LCD_COLS}+\n  |{l1}|\n  |{l2}|\n  +{'-'*LCD_COLS}+")
+        # Logger uniquement les changements (pour le débogage)
+        logger.info("Actuator [LCD]:\n  +%s+\n  |%s|\n  |%s|\n  +%s+", _BORDER, frame[0], frame[1], _BORDER)
+        self._request_render()
 
-        if not MOCK_MODE:
-            self._write(l1, l2)
+    def show_pages(self, pages, period: float = 3.0, repeat: bool = True):
+        """
+        Fait tourner des pages [(ligne1, ligne2), ...] par-dessus l'image de
+        base, `period` secondes chacune, dans le thread de rendu.
+        repeat=False : une seule passe, puis retour à l'image de base.
+        Une liste vide arrête la rotation.
+        """
+        with self._lock:
+            self._pages = [(self._format_line(a), self._format_line(b)) for a, b in pages]
+            self._page_period = period
+            self._page_start  = self._clock.monotonic()
+            self._page_repeat = repeat
+        self._request_render()
 
     def scroll(self, text: str, delay: float = 1.5):
         """
         Affiche un texte long en faisant défiler page par page (16 caractères / ligne).
-        Utile pour les messages qui dépassent 16 caractères.
+        Utile pour les messages qui dépassent 16 caractères. Ne bloque pas :
+        les pages défilent dans le thread de rendu, puis l'écran est effacé.
 
         :param text: Texte complet à afficher.
         :param delay: Durée d'affichage de chaque page (secondes).
@@ -89,14 +145,10 @@ class Lcd:
         Exemple :
             lcd.scroll("Bonjour Manuel Comment tu vas toi moi je vais bien")
         """
-        import time
         words  = text.split()
         line1  = ""
         line2  = ""
-
-        def flush():
-            self.display(line1, line2)
-            time.sleep(delay)
+        pages  = []
 
         for word in words:
             # Essaie de placer le mot sur line1
@@ -109,69 +161,204 @@ class Lcd:
                 if len(candidate2) <= LCD_COLS:
                     line2 = candidate2
                 else:
-                    # Les deux lignes sont pleines : affiche et réinitialise
-                    flush()
+                    # Les deux lignes sont pleines : nouvelle page
+                    pages.append((line1, line2))
                     line1 = word
                     line2 = ""
 
-        # Affiche le reste
+        # Le reste
         if line1 or line2:
-            flush()
+            pages.append((line1, line2))
 
-        self.clear()
+        with self._lock:
+            self._base = _BLANK   # effacé à la fin du défilement
+        self.show_pages(pages, delay, repeat=False)
+
+    def poll(self):
+        """Horloge virtuelle : fait avancer la rotation des pages (sans effet sinon)."""
+        if self._thread is None:
+            self._render_now()
 
     def clear(self):
-        """Efface l'écran LCD."""
+        """Efface l'écran LCD (image de base vide, rotation arrêtée)."""
         logger.debug("Actuator [LCD]: Effacement de l'écran.")
-        if not MOCK_MODE and self._lcd:
-            try:
-                self._lcd.clear()
-            except Exception as e:
-                logger.error(f"Actuator [LCD]: Erreur lors de l'effacement: {e}")
+        with self._lock:
+            self._base  = _BLANK
+            self._pages = []
+        self._request_render()
 
     def backlight(self, enabled: bool):
         """Active ou désactive le rétroéclairage."""
         state = "ON" if enabled else "OFF"
-        logger.debug(f"Actuator [LCD]: Rétroéclairage {state}.")
-        if not MOCK_MODE and self._lcd:
+        logger.debug("Actuator [LCD]: Rétroéclairage %s.", state)
+        if self._lcd:
             try:
-                self._lcd.backlight_enabled = enabled
+                with self._io_lock:
+                    self._lcd.backlight_enabled = enabled
             except Exception as e:
                 logger.error(f"Actuator [LCD]: Erreur rétroéclairage: {e}")
 
     def close(self):
-        """Ferme proprement la connexion LCD."""
-        if not MOCK_MODE and self._lcd:
+        """Arrête le thread de rendu et ferme proprement la connexion LCD."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._lcd:
             try:
-                self._lcd.clear()
-                self._lcd.close(clear=True)
+                with self._io_lock:
+                    self._lcd.clear()
+                    self._lcd.close(clear=True)
                 logger.info("Actuator [LCD]: Connexion fermée.")
             except Exception as e:
                 logger.error(f"Actuator [LCD]: Erreur lors de la fermeture: {e}")
 
+    def stats(self):
+        """Compteurs de rendu : écritures, rendus évités, transferts I2C."""
+        return {"renders": self.renders, "skipped": self.skipped, "transfers": self.transfers}
+
     # ------------------------------------------------------------------
-    # Méthodes privées
+    # Rendu
     # ------------------------------------------------------------------
 
-    def _format_line(self, text: str) -> str:
-        """Formate une chaîne pour qu'elle fasse exactement LCD_COLS caractères."""
-        return f"{str(text)[:LCD_COLS]:<{LCD_COLS}}"
+    def _request_render(self):
+        if self._thread is not None:
+            self._wakeup.set()
+        else:
+            self._render_now()
 
-    def _write(self, line1: str, line2: str):
-        """Écrit les deux lignes sur l'écran physique."""
+    def _target(self, now):
+        """Image à afficher à l'instant `now` (page en cours ou base) et prochaine échéance."""
+        if not self._pages:
+            return self._base, None
+        if self._page_period <= 0:
+            return self._pages[0], None
+        elapsed = int((now - self._page_start) // self._page_period)
+        index = elapsed
+        if index >= len(self._pages):
+            if not self._page_repeat:
+                self._pages = []
+                return self._base, None
+            index %= len(self._pages)
+        return self._pages[index], self._page_start + (elapsed + 1) * self._page_period
+
+    def _render_loop(self):
+        while not self._stop.is_set():
+            next_switch = self._render_now()
+            timeout = None if next_switch is None else max(0.0, next_switch - self._clock.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            # Cadence bornée : au plus LCD_MAX_FPS écritures par seconde
+            if self._last_render is not None:
+                wait = self._last_render + self._min_interval - self._clock.monotonic()
+                if wait > 0:
+                    self._stop.wait(wait)
+
+    def _render_now(self):
+        """Écrit l'image cible si elle diffère de l'écran. Retourne la prochaine échéance de page."""
+        with self._io_lock:
+            with self._lock:
+                frame, next_switch = self._target(self._clock.monotonic())
+                if frame == self._shown:
+                    self.skipped += 1
+                    return next_switch
+                ops = self._prepare(frame)
+                self._last_render = self._clock.monotonic()
+            if ops is not None:
+                self._write(ops)
+        return next_switch
+
+    @staticmethod
+    def _runs(old, new):
+        """Plages [début, fin) de cellules différentes (écarts d'une cellule fusionnés)."""
+        runs = []
+        col = 0
+        while col < LCD_COLS:
+            if old is not None and old[col] == new[col]:
+                col += 1
+                continue
+            start = col
+            while col < LCD_COLS and (old is None or old[col] != new[col]
+                                      or (col + 1 < LCD_COLS and old[col + 1] != new[col + 1])):
+                col += 1
+            runs.append((start, col))
+        return runs
+
+    def _plan(self, frame, shown, cursor):
+        """Liste d'opérations ('move', (r, c)) / ('write', texte) et son coût en transferts."""
+        ops, cost = [], 0
+        for row in range(LCD_ROWS):
+            for start, end in self._runs(shown[row] if shown else None, frame[row]):
+                if cursor != (row, start):
+                    ops.append(("move", (row, start)))
+                    cost += 1
+                ops.append(("write", frame[row][start:end]))
+                cost += end - start
+                cursor = (row, end) if end < LCD_COLS else None
+        return ops, cost
+
+    def _prepare(self, frame):
+        """
+        Opérations qui amènent l'écran de _shown à `frame` (appelé sous _lock) ;
+        _shown et _cursor décrivent l'écran une fois ces opérations envoyées.
+        None sans écran physique.
+        """
         if not self._lcd:
-            logger.warning("Actuator [LCD]: Écran non initialisé, écriture ignorée.")
-            return
+            self._shown = frame
+            return None
+        diff_ops, diff_cost = self._plan(frame, self._shown, self._cursor)
+        # Effacer puis n'écrire que les cellules non vides peut coûter moins cher
+        clear_ops, clear_cost = self._plan(frame, _BLANK, (0, 0))
+        use_clear = self._shown is None or clear_cost + _CLEAR_COST < diff_cost
+        ops = [("clear", None)] + clear_ops if use_clear else diff_ops
+        cursor = self._cursor
+        for op, arg in ops:
+            if op == "clear":
+                cursor = (0, 0)
+            elif op == "move":
+                cursor = arg
+            else:
+                row, col = cursor
+                cursor = (row, col + len(arg)) if col + len(arg) < LCD_COLS else None
+        self._shown  = frame
+        self._cursor = cursor
+        return ops
+
+    def _write(self, ops):
+        """Envoie les opérations de _prepare() à l'écran physique (sous _io_lock, hors _lock)."""
+        sent = 0
         try:
-            self._lcd.clear()           # efface les caractères fantômes
-            self._lcd.home()            # curseur en (0,0)
-            self._lcd.write_string(line1[:LCD_COLS])   # ligne 1
-            self._lcd.cursor_pos = (1, 0)
-            self._lcd.write_string(line2[:LCD_COLS])   # ligne 2
+            for op, arg in ops:
+                if op == "clear":
+                    self._lcd.clear()
+                    sent += 1
+                elif op == "move":
+                    self._lcd.cursor_pos = arg
+                    sent += 1
+                else:
+                    self._lcd.write_string(arg)
+                    sent += len(arg)
         except Exception as e:
             logger.error(f"Actuator [LCD]: Erreur d'écriture: {e}")
+            with self._lock:
+                self.transfers += sent
+                self._shown  = None    # contenu inconnu → redessin complet au prochain rendu
+                self._cursor = None
             # Tentative de réinitialisation
             try:
                 self._init_lcd()
             except Exception:
                 pass
+            return
+        with self._lock:
+            self.transfers += sent
+            self.renders   += 1
+
+    # ------------------------------------------------------------------
+    # Méthodes privées
+    # ------------------------------------------------------------------
+
+    def _format_line(self, text: str) -> str:
+        """Formate une chaîne pour qu'elle fasse exactement LCD_COLS caractères."""
+        return f"{str(text)[:LCD_COLS]:<{LCD_COLS}}"
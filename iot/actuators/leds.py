@@ -1,4 +1,5 @@
-from config import MOCK_MODE
+import hal
+from actuators.outputs import outputs
 from utils.logger import logger
 
 
@@ -6,26 +7,38 @@ class Leds:
     """
     Contrôle trois LEDs (verte, orange, rouge) via GPIO BCM.
     Pins définies dans config.py : PIN_LED_GREEN=16, PIN_LED_ORANGE=6, PIN_LED_RED=5.
+
+    Les écritures passent par actuators.outputs (sorties "led_<couleur>") :
+    seuls les changements d'état touchent le GPIO.
     """
 
     def __init__(self, pin_green, pin_orange, pin_red):
         self.pins  = {'green': pin_green, 'orange': pin_orange, 'red': pin_red}
         self.state = {'green': False, 'orange': False, 'red': False}
+        self._gpio = None
 
-        if not MOCK_MODE:
-            self._init_gpio()
+        self._init_gpio()
 
     def _init_gpio(self):
         try:
-            import RPi.GPIO as GPIO
+            GPIO = hal.gpio()
             GPIO.setmode(GPIO.BCM)
             for color, pin in self.pins.items():
                 GPIO.setup(pin, GPIO.OUT)
                 GPIO.output(pin, GPIO.LOW)   # OFF au démarrage
+            self._gpio = GPIO
+            for color, pin in self.pins.items():
+                outputs.register(f"led_{color}", self._writer(pin), False)
             logger.info(f"Actuator [LEDs]: GPIO initialisés "
                         f"(G={self.pins['green']}, O={self.pins['orange']}, R={self.pins['red']})")
         except Exception as e:
             logger.error(f"Actuator [LEDs]: Impossible d'initialiser GPIO: {e}")
+            for color in self.pins:
+                outputs.register(f"led_{color}", None, False)
+
+    def _writer(self, pin):
+        GPIO = self._gpio
+        return lambda state: GPIO.output(pin, GPIO.HIGH if state else GPIO.LOW)
 
     def set(self, color, state: bool):
         """Allume (True) ou éteint (False) une LED."""
@@ -34,12 +47,4 @@ class Leds:
             return
 
         self.state[color] = state
-        status = "ON" if state else "OFF"
-        logger.info(f"Actuator [LED]: {color.upper()} → {status} (GPIO {self.pins[color]})")
-
-        if not MOCK_MODE:
-            try:
-                import RPi.GPIO as GPIO
-                GPIO.output(self.pins[color], GPIO.HIGH if state else GPIO.LOW)
-            except Exception as e:
-                logger.error(f"Actuator [LEDs]: Erreur GPIO set({color}, {state}): {e}")
+        outputs.set(f"led_{color}", bool(state))
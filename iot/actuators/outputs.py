@@ -0,0 +1,110 @@
+import threading
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class _Output:
+    __slots__ = ("name", "write", "committed", "pending", "transitions", "starts")
+
+    def __init__(self, name, write, initial):
+        self.name        = name
+        self.write       = write      # fonction(valeur) qui pilote le matériel, ou None
+        self.committed   = initial    # dernière valeur réellement écrite
+        self.pending     = initial    # dernière valeur demandée
+        self.transitions = 0          # changements d'état écrits
+        self.starts      = 0          # passages "éteint → allumé" (cycles pompe, etc.)
+
+
+class OutputBank:
+    """
+    Couche de commande des actionneurs (LEDs, pompe, lampe).
+
+    Chaque sortie garde la dernière valeur écrite sur le matériel : une
+    demande identique à l'état courant ne touche pas le GPIO et ne logue
+    rien. Dans un bloc `with outputs.batch():` (un cycle de la boucle), les
+    demandes sont seulement mémorisées et les transitions réelles sont
+    écrites en une fois à la sortie du bloc ; une sortie qui change puis
+    revient à son état dans le même cycle n'est pas écrite. Hors batch
+    (minuteries, arrêt), chaque demande est écrite immédiatement.
+
+    Compteurs d'usure : transitions et démarrages par sortie (stats()),
+    aussi reportés dans utils.metrics ("switch.<sortie>", "start.<sortie>").
+    """
+
+    def __init__(self):
+        self._lock    = threading.RLock()
+        self._outputs = {}
+        self._depth   = 0      # profondeur de batch (blocs imbriqués)
+
+    def register(self, name, write, initial):
+        """Déclare une sortie déjà positionnée matériellement à `initial`."""
+        with self._lock:
+            self._outputs[name] = _Output(name, write, initial)
+
+    def set(self, name, value):
+        """Demande une valeur ; écrite tout de suite hors batch, sinon au commit."""
+        with self._lock:
+            output = self._outputs[name]
+            output.pending = value
+            if self._depth == 0:
+                self._commit_one(output)
+
+    def get(self, name):
+        """Valeur demandée (éventuellement pas encore écrite)."""
+        return self._outputs[name].pending
+
+    def batch(self):
+        """Bloc dont les transitions sont écrites en un seul commit à la sortie."""
+        return _Batch(self)
+
+    def commit(self):
+        """Écrit toutes les sorties dont la valeur demandée diffère de l'état écrit."""
+        with self._lock:
+            for output in self._outputs.values():
+                self._commit_one(output)
+
+    def stats(self):
+        """{sortie: {"state", "transitions", "starts"}}"""
+        with self._lock:
+            return {o.name: {"state": o.committed, "transitions": o.transitions, "starts": o.starts}
+                    for o in self._outputs.values()}
+
+    def _commit_one(self, output):
+        value = output.pending
+        if value == output.committed:
+            return
+        if output.write is not None:
+            try:
+                output.write(value)
+            except Exception as e:
+                # État écrit inchangé : nouvel essai au prochain commit
+                logger.error("Actuator [%s]: Erreur d'écriture (%s): %s", output.name, value, e)
+                return
+        if not output.committed and value:
+            output.starts += 1
+            metrics.incr("start." + output.name)
+        output.committed = value
+        output.transitions += 1
+        metrics.incr("switch." + output.name)
+        logger.info("Actuator [%s]: → %s", output.name, value)
+
+
+class _Batch:
+    __slots__ = ("_bank",)
+
+    def __init__(self, bank):
+        self._bank = bank
+
+    def __enter__(self):
+        with self._bank._lock:
+            self._bank._depth += 1
+        return self._bank
+
+    def __exit__(self, *exc):
+        with self._bank._lock:
+            self._bank._depth -= 1
+            if self._bank._depth == 0:
+                self._bank.commit()
+
+
+outputs = OutputBank()
@@ -1,4 +1,6 @@
-from config import MOCK_MODE, PIN_PUMP
+import hal
+from actuators.outputs import outputs
+from config import PIN_PUMP
 from utils.logger import logger
 
 
@@ -10,54 +12,51 @@ class Pump:
         GPIO.LOW  → relais fermé → pompe ON
         GPIO.HIGH → relais ouvert → pompe OFF
 
-    En mock mode, seul l'état interne est modifié.
+    Si le GPIO n'a pas pu être initialisé, seul l'état interne est modifié.
+
+    Les commandes passent par actuators.outputs (sortie "pump") : seules les
+    transitions réelles sont écrites, et outputs.stats()["pump"]["starts"]
+    compte les cycles de la pompe.
     """
 
     def __init__(self, pin=PIN_PUMP):
         self.pin   = pin
         self.is_on = False
-        if not MOCK_MODE:
-            self._init_gpio()
+        self._gpio = None
+        self._init_gpio()
 
     def _init_gpio(self):
         try:
-            import RPi.GPIO as GPIO
+            GPIO = hal.gpio()
             # GPIO.setmode déjà appelé par leds.py
             GPIO.setup(self.pin, GPIO.OUT)
             GPIO.output(self.pin, GPIO.HIGH)   # relais ouvert au démarrage (pompe OFF)
+            self._gpio = GPIO
             logger.info(f"Actuator [Pump]: GPIO {self.pin} initialisé (relais actif-LOW)")
         except Exception as e:
             logger.error(f"Actuator [Pump]: Impossible d'initialiser GPIO {self.pin}: {e}")
+        outputs.register("pump", self._write if self._gpio else None, False)
+
+    def _write(self, on):
+        GPIO = self._gpio
+        GPIO.output(self.pin, GPIO.LOW if on else GPIO.HIGH)   # Actif-LOW : LOW = relais ON
 
     def on(self):
         """Active la pompe (ferme le relais : GPIO → LOW)."""
         self.is_on = True
-        logger.info(f"Actuator [Pump]: ON  (GPIO {self.pin} → LOW)")
-        if not MOCK_MODE:
-            try:
-                import RPi.GPIO as GPIO
-                GPIO.output(self.pin, GPIO.LOW)   # Actif-LOW : LOW = relais ON
-            except Exception as e:
-                logger.error(f"Actuator [Pump]: Erreur GPIO on(): {e}")
+        outputs.set("pump", True)
 
     def off(self):
         """Éteint la pompe (ouvre le relais : GPIO → HIGH)."""
         self.is_on = False
-        logger.info(f"Actuator [Pump]: OFF (GPIO {self.pin} → HIGH)")
-        if not MOCK_MODE:
-            try:
-                import RPi.GPIO as GPIO
-                GPIO.output(self.pin, GPIO.HIGH)  # Actif-LOW : HIGH = relais OFF
-            except Exception as e:
-                logger.error(f"Actuator [Pump]: Erreur GPIO off(): {e}")
+        outputs.set("pump", False)
 
     def cleanup(self):
         """Libère le GPIO (à appeler à l'arrêt du système)."""
         self.off()
-        if not MOCK_MODE:
+        if self._gpio:
             try:
-                import RPi.GPIO as GPIO
-                GPIO.cleanup(self.pin)
+                self._gpio.cleanup(self.pin)
                 logger.info(f"Actuator [Pump]: GPIO {self.pin} libéré.")
             except Exception as e:
                 logger.error(f"Actuator [Pump]: Erreur cleanup(): {e}")
@@ -0,0 +1,91 @@
+import os
+import sys
+import warnings
+import joblib
+import numpy as np
+
+from analysis.forest import CompiledForest, average_path_length
+from analysis.inference import FEATURES
+
+MODEL_PATH    = os.path.join(os.path.dirname(__file__), 'model.pkl')
+COMPILED_PATH = os.path.join(os.path.dirname(__file__), 'model.npz')
+
+
+def compile_forest(model, feature_names=None):
+    """
+    Flattens a fitted sklearn IsolationForest into a CompiledForest.
+    feature_names defaults to the columns the model was fitted on, if known.
+    """
+    if feature_names is None and hasattr(model, "feature_names_in_"):
+        feature_names = [str(name) for name in model.feature_names_in_]
+    features, thresholds, lefts, rights, paths, roots = [], [], [], [], [], []
+    base = 0
+    max_depth = 0
+    for tree, tree_features in zip(model.estimators_, model.estimators_features_):
+        t = tree.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+        index = np.arange(n)
+
+        # Depth of every node (children always come after their parent)
+        depth = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            if not is_leaf[i]:
+                depth[t.children_left[i]]  = depth[i] + 1
+                depth[t.children_right[i]] = depth[i] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        feature = np.where(is_leaf, 0, np.asarray(tree_features)[np.maximum(t.feature, 0)])
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, np.inf, t.threshold))
+        lefts.append(np.where(is_leaf, index, t.children_left) + base)
+        rights.append(np.where(is_leaf, index, t.children_right) + base)
+        paths.append(np.where(is_leaf, depth + average_path_length(t.n_node_samples), 0.0))
+        roots.append(base)
+        base += n
+
+    node_type = np.int32 if base < 2 ** 31 else np.int64
+    return CompiledForest(
+        feature   = np.concatenate(features).astype(np.int32),
+        threshold = np.concatenate(thresholds).astype(np.float64),
+        left      = np.concatenate(lefts).astype(node_type),
+        right     = np.concatenate(rights).astype(node_type),
+        path      = np.concatenate(paths).astype(np.float64),
+        roots     = np.asarray(roots, dtype=node_type),
+        max_depth = max_depth,
+        scale     = len(model.estimators_) * float(average_path_length(model.max_samples_)),
+        offset    = model.offset_,
+        n_features = model.n_features_in_,
+        feature_names = feature_names,
+    )
+
+
+def compile_model(model_path=MODEL_PATH, compiled_path=COMPILED_PATH):
+    model = joblib.load(model_path)
+    compiled = compile_forest(model, FEATURES if model.n_features_in_ == len(FEATURES) else None)
+    compiled.save(compiled_path)
+    print(f"Compiled {len(compiled.roots)} trees ({compiled.left.size} nodes, "
+          f"depth {compiled.max_depth}) to {compiled_path}")
+    return model, compiled
+
+
+def verify(model, compiled, n_samples=20000, seed=0):
+    """Checks the compiled scorer against sklearn on random inputs around the training ranges."""
+    rng = np.random.default_rng(seed)
+    ranges = {"temperature": (-15, 55), "humidity": (-5, 105), "rain": (-5, 260), "light": (-50, 1050)}
+    names = compiled.feature_names or FEATURES
+    X = np.column_stack([rng.uniform(*ranges.get(name, (-10, 1000)), n_samples) for name in names])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)   # fitted on a DataFrame, X has no column names
+        expected = model.score_samples(X)
+        mismatched = int((model.predict(X) != compiled.predict(X)).sum())
+    actual = compiled.score_samples(X)
+    print(f"Verify: max |score diff| = {np.abs(expected - actual).max():.3g}, "
+          f"{mismatched} prediction mismatches / {n_samples}")
+    return mismatched == 0
+
+
+if __name__ == "__main__":
+    model, compiled = compile_model(*sys.argv[1:3])
+    if not verify(model, compiled):
+        sys.exit(1)
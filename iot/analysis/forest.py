@@ -0,0 +1,111 @@
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def average_path_length(n):
+    """
+    Average path length of an unsuccessful BST search among n samples,
+    c(n) in the Isolation Forest paper (same definition as sklearn).
+    Works on scalars and arrays.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class CompiledForest:
+    """
+    IsolationForest flattened into contiguous NumPy arrays, evaluated without
+    sklearn or joblib.
+
+    All trees share one node table (global node indices):
+        feature[i]    input column tested at node i (already remapped through
+                      estimators_features_)
+        threshold[i]  go left when x[feature] <= threshold; +inf at leaves
+        left/right[i] children; a leaf points to itself on both sides, so a
+                      fixed number of steps (max_depth) reaches every leaf
+        path[i]       leaf depth + c(n_node_samples), i.e. the isolation
+                      length sklearn adds for a sample ending in that leaf
+        roots[t]      root node of tree t
+
+    Inputs are rounded to float32 before comparison, as sklearn's trees do,
+    so predictions and scores match IsolationForest exactly.
+
+    feature_names (optional) records the input columns the model was trained
+    on, so inference can refuse a model built for another feature set.
+
+    Built by analysis/compile_forest.py from the trained model.
+    """
+
+    def __init__(self, feature, threshold, left, right, path, roots, max_depth, scale, offset,
+                 n_features, feature_names=None):
+        self.feature    = feature
+        self.threshold  = threshold
+        self.left       = left
+        self.right      = right
+        self.path       = path
+        self.roots      = roots
+        self.max_depth  = int(max_depth)
+        self.scale      = float(scale)       # n_trees * c(max_samples)
+        self.offset     = float(offset)      # IsolationForest.offset_
+        self.n_features = int(n_features)
+        self.feature_names = tuple(feature_names) if feature_names is not None else None
+        # children[2*i] = right, children[2*i + 1] = left: one gather per level
+        self._children  = np.stack([right, left], axis=1).ravel()
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = int(data["version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported compiled forest version {version}")
+            return cls(data["feature"], data["threshold"], data["left"], data["right"],
+                       data["path"], data["roots"], data["max_depth"], data["scale"],
+                       data["offset"], data["n_features"],
+                       data["feature_names"].tolist() if "feature_names" in data else None)
+
+    def save(self, path):
+        extra = {} if self.feature_names is None else {"feature_names": np.array(self.feature_names)}
+        np.savez(path, version=FORMAT_VERSION,
+                 feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, path=self.path, roots=self.roots,
+                 max_depth=self.max_depth, scale=self.scale, offset=self.offset,
+                 n_features=self.n_features, **extra)
+
+    def path_lengths(self, X):
+        """Summed isolation length over all trees for each row of X."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got {X.shape[1]}")
+        feature, threshold, children = self.feature, self.threshold, self._children
+        if X.shape[0] == 1:
+            # One sample (the control loop): vectors of n_trees only
+            x = X[0]
+            nodes = self.roots
+            for _ in range(self.max_depth):
+                nodes = children[2 * nodes + (x[feature[nodes]] <= threshold[nodes])]
+            return self.path[nodes].sum(keepdims=True)
+        flat  = X.ravel()
+        base  = (np.arange(X.shape[0]) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+        for _ in range(self.max_depth):
+            nodes = children[2 * nodes + (flat[base + feature[nodes]] <= threshold[nodes])]
+        return self.path[nodes].sum(axis=1)
+
+    def score_samples(self, X):
+        """Same as IsolationForest.score_samples: lower is more abnormal."""
+        return -np.exp2(-self.path_lengths(X) / self.scale)
+
+    def decision_function(self, X):
+        """Same as IsolationForest.decision_function: negative means anomaly."""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        """Same as IsolationForest.predict: -1 for anomalies, 1 otherwise."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
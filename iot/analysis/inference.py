@@ -1,30 +1,128 @@
-import joblib
 import os
-import numpy as np
+import threading
+from time import perf_counter_ns
+from config import ANOMALY_ENGINE, ANOMALY_WINDOW, ANOMALY_EWMA_ALPHA, ANOMALY_ON, ANOMALY_OFF
 from utils.logger import logger
+from utils.metrics import metrics
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pkl')
+MODEL_PATH    = os.path.join(os.path.dirname(__file__), 'model.pkl')
+COMPILED_PATH = os.path.join(os.path.dirname(__file__), 'model.npz')
+
+# Input columns of the anomaly model, in order (see train_model.py):
+# temperature °C, air humidity %, rain ADC (0 = wet, 255 = dry), light (lux)
+FEATURES = ("temperature", "humidity", "rain", "light")
 
 class AnomalyDetector:
-    def __init__(self):
-        self.model = None
-        self.load_model()
+    """
+    Runs the IsolationForest from train_model.py on the readings.
+
+    Uses the compiled forest (model.npz, pure NumPy, see compile_forest.py)
+    when present: same predictions, no sklearn/joblib import at start-up.
+    Falls back to the pickled sklearn model otherwise.
+
+    Two modes:
+      - check(): one instantaneous sample, boolean (as predict() == -1);
+      - update(): windowed. Samples go into a ring buffer of `window` rows;
+        each full window is scored in one vectorised call. The window score
+        (mean anomaly score, > 0 means anomalous) is smoothed by an EWMA and
+        the anomaly flag follows it with hysteresis (on above `on`, off
+        below `off`), so a single odd sample neither raises nor clears it.
+
+    Anomaly score = -decision_function: > 0 beyond the model's contamination
+    threshold, typically -0.1 (normal) to +0.15 (clearly abnormal).
+
+    numpy and the model are only imported/loaded in load_model(). With
+    background=True this happens in a thread: until `ready` is set, check()
+    returns False and update() ignores samples, so start-up does not wait.
+    """
+
+    def __init__(self, window=ANOMALY_WINDOW, alpha=ANOMALY_EWMA_ALPHA, on=ANOMALY_ON, off=ANOMALY_OFF,
+                 background=False):
+        self.model  = None
+        self.window = max(1, int(window))
+        self.alpha  = alpha
+        self.on     = on
+        self.off    = off
+
+        self._buffer = None
+        self._filled = 0
+        self.raw_score  = None    # score of the last complete window
+        self.score      = None    # smoothed score
+        self.is_anomaly = False   # debounced flag
+        self.scored     = False   # True if the last update() closed a window
+        self.windows    = 0
+        self.ready      = threading.Event()   # set once load_model() has finished (model or not)
+        if background:
+            threading.Thread(target=self.load_model, name="model-loader", daemon=True).start()
+        else:
+            self.load_model()
+
+    def load_model(self, model=None):
+        """Loads model.npz / model.pkl, or uses `model` (a forest already in memory, e.g. benchmarks)."""
+        start = perf_counter_ns()
+        try:
+            if model is None:
+                model = self._load()
+            elif not self._compatible(model.n_features, model.feature_names):
+                model = None
+            if model is not None:
+                import numpy as np
+                self._buffer = np.empty((self.window, len(FEATURES)))
+                self.model = model
+        finally:
+            elapsed = perf_counter_ns() - start
+            metrics.observe("startup.model", elapsed)
+            logger.info("AI Model: load finished in %.2fs", elapsed / 1e9)
+            self.ready.set()
 
-    def load_model(self):
+    def _load(self):
+        if os.path.exists(COMPILED_PATH):
+            try:
+                from analysis.forest import CompiledForest   # numpy only
+                model = CompiledForest.load(COMPILED_PATH)
+                if not self._compatible(model.n_features, model.feature_names):
+                    return None
+                if os.path.exists(MODEL_PATH) and os.path.getmtime(MODEL_PATH) > os.path.getmtime(COMPILED_PATH):
+                    logger.warning("AI Model: model.pkl is newer than model.npz, run python -m analysis.compile_forest.")
+                logger.info("AI Model loaded successfully (compiled).")
+                return model
+            except Exception as e:
+                logger.error(f"Failed to load compiled AI model: {e}")
         if os.path.exists(MODEL_PATH):
             try:
-                self.model = joblib.load(MODEL_PATH)
+                import joblib   # sklearn only needed for the uncompiled model
+                model = joblib.load(MODEL_PATH)
+                names = getattr(model, "feature_names_in_", None)
+                if not self._compatible(model.n_features_in_, None if names is None else names.tolist()):
+                    return None
                 logger.info("AI Model loaded successfully.")
+                return model
             except Exception as e:
                 logger.error(f"Failed to load AI model: {e}")
         else:
-            logger.warning("AI Model not found. Please run train_model.py first.")
+            logger.warning("AI Model not found. Please run python -m analysis.train_model first.")
+        return None
+
+    @staticmethod
+    def _compatible(n_features, feature_names):
+        """A model trained on other columns would score garbage: refuse it."""
+        if n_features != len(FEATURES) or (feature_names is not None and tuple(feature_names) != FEATURES):
+            logger.error("AI Model: trained on %s, expected %s. Please run python -m analysis.train_model again.",
+                         feature_names or f"{n_features} features", list(FEATURES))
+            return False
+        return True
+
+    @staticmethod
+    def _features(temp, hum, rain, light):
+        return (temp, hum,
+                rain  if rain  is not None else 0,
+                light if light is not None else 0)
 
     def check(self, temp, hum, rain, light, water_level=None):
         """
         Returns True if anomaly detected, False otherwise.
-        Capteurs réels : temp, hum, rain_pct, light.
-        water_level gardé pour compatibilité API (ignoré si None).
+        Capteurs réels : temp, hum, rain (ADC pluie brut, 0-255), light (lux).
+        water_level gardé pour compatibilité API (ignoré, pas de capteur).
         """
         if self.model is None:
             return False
@@ -34,11 +132,63 @@ class AnomalyDetector:
             return False
 
         try:
-            rain_val  = rain        if rain        is not None else 0
-            light_val = light       if light       is not None else 0
-            wl_val    = water_level if water_level is not None else 0
-            features  = np.array([[temp, hum, rain_val, light_val, wl_val]])
+            features = [self._features(temp, hum, rain, light)]
             return self.model.predict(features)[0] == -1
         except Exception as e:
             logger.error(f"Inference error: {e}")
             return False
+
+    def update(self, temp, hum, rain, light, water_level=None):
+        """
+        Windowed mode: adds one sample and returns the debounced anomaly flag.
+        Samples without temperature/humidity are skipped (the flag is kept).
+        """
+        self.scored = False
+        if self.model is None or temp is None or hum is None:
+            return self.is_anomaly
+
+        self._buffer[self._filled] = self._features(temp, hum, rain, light)
+        self._filled += 1
+        if self._filled < self.window:
+            return self.is_anomaly
+        self._filled = 0
+
+        try:
+            raw = -float(self.model.decision_function(self._buffer).mean())
+        except Exception as e:
+            logger.error(f"Inference error: {e}")
+            return self.is_anomaly
+
+        return self._close_window(raw)
+
+    def _close_window(self, raw):
+        """Smooths the score of a complete window and updates the debounced flag."""
+        self.raw_score = raw
+        self.score     = raw if self.score is None else self.alpha * raw + (1 - self.alpha) * self.score
+        self.scored    = True
+        self.windows  += 1
+        if not self.is_anomaly and self.score > self.on:
+            self.is_anomaly = True
+        elif self.is_anomaly and self.score < self.off:
+            self.is_anomaly = False
+        return self.is_anomaly
+
+    def close(self):
+        """Nothing to release (the streaming engine saves its state here)."""
+
+
+def create_detector(engine=ANOMALY_ENGINE, persistent=True, **kwargs):
+    """
+    Anomaly detector selected by ANOMALY_ENGINE: "forest" (trained
+    IsolationForest, this module) or "stats" (online statistics learnt
+    on the garden itself, analysis/streaming.py). Same interface.
+    persistent=False keeps the learnt statistics in memory only.
+    """
+    if engine == "stats":
+        from analysis.streaming import StreamingDetector
+        if not persistent:
+            kwargs["path"] = None
+        return StreamingDetector(**kwargs)
+    if engine != "forest":
+        raise ValueError(f"unknown anomaly engine {engine!r}")
+    return AnomalyDetector(**kwargs)
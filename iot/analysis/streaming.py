@@ -0,0 +1,268 @@
+import math
+import os
+import threading
+import time
+from time import perf_counter_ns
+
+import hal
+from config import (STATS_BUCKETS, STATS_MEMORY, STATS_MIN_SAMPLES, STATS_THRESHOLD, STATS_RESIDUAL_ALPHA,
+                    STATS_LEARN_GATE, STATS_STATE_PATH, STATS_SAVE_INTERVAL, STATS_ON, STATS_OFF)
+from analysis.inference import AnomalyDetector, FEATURES
+from utils.logger import logger
+from utils.metrics import metrics
+
+STATE_VERSION = 1
+
+_D = len(FEATURES)
+# Variance floor per feature (sensor resolution: DHT11 1 °C / 1 %, ADC step, lux step ≈ 4),
+# keeps the covariance invertible when a sensor does not move (stuck, night light).
+_VAR_FLOOR = (0.25, 1.0, 1.0, 16.0)
+_REFRESH = 32   # bucket updates between two inversions of its covariance
+
+
+class StreamingDetector(AnomalyDetector):
+    """
+    Anomaly engine learnt online from the garden's own readings, no training.
+
+    Statistics are kept per time-of-day bucket (STATS_BUCKETS per day) plus
+    one global bucket used while an hour has not seen enough samples:
+      - mean and covariance, Welford recurrence with weight 1/n, n capped at
+        STATS_MEMORY (beyond, exponential forgetting follows the seasons);
+      - the Mahalanobis distance of each reading to its bucket;
+      - an EWMA of the residuals (reading - bucket mean), which exposes slow
+        drifts that stay within the spread of single readings.
+    Each reading costs O(1) time and memory (4 features, cached inverse
+    refreshed every _REFRESH updates of a bucket).
+
+    Sample score = max(distance, residual distance) / STATS_THRESHOLD - 1,
+    > 0 means anomalous; windows and smoothing are the ones of
+    AnomalyDetector, with thresholds of its own (STATS_ON / STATS_OFF: the
+    score spreads much wider than the forest's). Readings further than STATS_LEARN_GATE × threshold are
+    learnt clipped to that distance, so an anomaly does not quickly become
+    the new normal. Nothing is scored until a bucket has seen
+    STATS_MIN_SAMPLES readings (the global one: a day of buckets).
+
+    The state (a few KB) is saved to `path` every STATS_SAVE_INTERVAL s, by a
+    thread working on a copy (the control loop only copies the lists), and
+    by close(); path=None disables persistence (replay, benchmarks).
+    `model` stays None: `loaded` tells whether the engine is running.
+    """
+
+    def __init__(self, path=STATS_STATE_PATH, buckets=STATS_BUCKETS, memory=STATS_MEMORY,
+                 min_samples=STATS_MIN_SAMPLES, threshold=STATS_THRESHOLD,
+                 residual_alpha=STATS_RESIDUAL_ALPHA, gate=STATS_LEARN_GATE,
+                 on=STATS_ON, off=STATS_OFF, **kwargs):
+        self.path        = path
+        self.loaded      = False   # set by load_model()
+        self.buckets     = int(buckets)
+        self.memory      = float(memory)
+        self.min_samples = min_samples
+        # The global and residual buckets see every reading: memory and warm-up span a day of buckets
+        self._cap        = [self.memory] * self.buckets + [self.memory * self.buckets] * 2
+        self._warm       = [min_samples] * self.buckets + [min_samples * self.buckets] * 2
+        self.threshold   = threshold
+        self.residual_alpha = residual_alpha
+        self.gate        = gate
+        self._clock      = hal.clock()
+        self._reset()
+        self._sum        = 0.0   # sample scores of the current window
+        self._count      = 0
+        self._last_save  = self._clock.monotonic()
+        self._saver      = None    # thread of the last periodic save
+        super().__init__(on=on, off=off, **kwargs)
+
+    def _reset(self):
+        n = self.buckets + 2   # then: global, residuals
+        self._n        = [0.0] * n
+        self._mean     = [[0.0] * _D for _ in range(n)]
+        self._cov      = [[0.0] * (_D * _D) for _ in range(n)]   # row-major D × D
+        self._inv      = [None] * n
+        self._stale    = [0] * n   # updates since the last inversion
+        self._residual = [0.0] * _D
+
+    # ── Persistence ───────────────────────────────────────────────────
+
+    def load_model(self):
+        start = perf_counter_ns()
+        try:
+            if self.path and os.path.exists(self.path):
+                try:
+                    self._load_state(self.path)
+                    learnt = sum(n >= warm for n, warm in zip(self._n[:self.buckets], self._warm))
+                    logger.info("Anomaly stats: state loaded (%d/%d buckets learnt, %d samples).",
+                                learnt, self.buckets, self._n[self.buckets])
+                except Exception as e:
+                    logger.error(f"Anomaly stats: cannot load {self.path} ({e}), learning from scratch.")
+                    self._reset()
+            else:
+                logger.info("Anomaly stats: no saved state, learning from scratch.")
+            self.loaded = True
+        finally:
+            metrics.observe("startup.model", perf_counter_ns() - start)
+            self.ready.set()
+
+    def _load_state(self, path):
+        import numpy as np
+        with np.load(path) as data:
+            if int(data["version"]) != STATE_VERSION:
+                raise ValueError(f"unsupported state version {int(data['version'])}")
+            if tuple(data["features"].tolist()) != FEATURES or int(data["buckets"]) != self.buckets:
+                raise ValueError("state learnt with other features or buckets")
+            self._n        = data["n"].tolist()
+            self._mean     = data["mean"].tolist()
+            self._cov      = data["cov"].reshape(self.buckets + 2, -1).tolist()
+            self._residual = data["residual"].tolist()
+        self._inv   = [None] * (self.buckets + 2)
+        self._stale = [0] * (self.buckets + 2)
+
+    def _state(self):
+        """Copy of the learnt statistics, safe to write from another thread."""
+        return (list(self._n), [list(m) for m in self._mean], [list(c) for c in self._cov],
+                list(self._residual))
+
+    def save(self, path=None, state=None):
+        """Writes the learnt statistics (atomic replace); `state` from _state(), default: current."""
+        import numpy as np
+        path = path or self.path
+        if not path:
+            return
+        n, mean, cov, residual = state or self._state()
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, version=STATE_VERSION, features=np.array(FEATURES), buckets=self.buckets,
+                         n=np.array(n), mean=np.array(mean),
+                         cov=np.array(cov).reshape(-1, _D, _D), residual=np.array(residual),
+                         saved=time.time())
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Anomaly stats: cannot save {path}: {e}")
+
+    def _save_background(self):
+        """Periodic save: the npz is written by a thread (skipped if the previous one still runs)."""
+        self._last_save = self._clock.monotonic()
+        if self._saver is not None and self._saver.is_alive():
+            return
+        state = self._state()
+        if self._clock.virtual:   # virtual clock: no threads
+            self.save(state=state)
+            return
+        self._saver = threading.Thread(target=self.save, kwargs={"state": state},
+                                       name="stats-saver", daemon=True)
+        self._saver.start()
+
+    def close(self):
+        if self._saver is not None:
+            self._saver.join()
+        if self.loaded:
+            self.save()
+
+    # ── Statistics ────────────────────────────────────────────────────
+
+    def _bucket(self):
+        hour = time.localtime(self._clock.time())
+        return (hour.tm_hour * 3600 + hour.tm_min * 60 + hour.tm_sec) * self.buckets // 86400
+
+    def _inverse(self, b):
+        inv = self._inv[b]
+        if inv is None or self._stale[b] >= _REFRESH:
+            import numpy as np
+            cov = np.array(self._cov[b]).reshape(_D, _D) + np.diag(_VAR_FLOOR)
+            inv = self._inv[b] = np.linalg.inv(cov).ravel().tolist()
+            self._stale[b] = 0
+        return inv
+
+    @staticmethod
+    def _distance(inv, v):
+        """Mahalanobis distance sqrt(vᵀ·inv·v)."""
+        d2 = 0.0
+        for i in range(_D):
+            row = i * _D
+            d2 += v[i] * (inv[row] * v[0] + inv[row + 1] * v[1] + inv[row + 2] * v[2] + inv[row + 3] * v[3])
+        return math.sqrt(max(d2, 0.0))
+
+    def _learn(self, b, x):
+        n = self._n[b] = min(self._n[b] + 1.0, self._cap[b])
+        w = 1.0 / n
+        mean, cov = self._mean[b], self._cov[b]
+        delta = [x[i] - mean[i] for i in range(_D)]
+        for i in range(_D):
+            mean[i] += w * delta[i]
+        # cov ← (1 - w)·(cov + w·δδᵀ): population covariance for w = 1/n, exponentially weighted once capped
+        # (symmetric: upper triangle computed, mirrored)
+        k = 1.0 - w
+        for i in range(_D):
+            row, di = i * _D, w * delta[i]
+            for j in range(i, _D):
+                cov[row + j] = cov[j * _D + i] = k * (cov[row + j] + di * delta[j])
+        self._stale[b] += 1
+
+    def _observe(self, temp, hum, rain, light):
+        """Scores one reading against its bucket, then learns it. Returns the score or None."""
+        x = self._features(temp, hum, rain, light)
+        b, g, r = self._bucket(), self.buckets, self.buckets + 1
+        ref = b if self._n[b] >= self._warm[b] else g
+        score = None
+        if self._n[ref] >= self._warm[ref]:
+            inv  = self._inverse(ref)
+            mean = self._mean[ref]
+            delta = [x[i] - mean[i] for i in range(_D)]
+            distance = self._distance(inv, delta)
+            score = distance / self.threshold - 1.0
+            a = self.residual_alpha
+            residual = self._residual = [a * delta[i] + (1 - a) * self._residual[i] for i in range(_D)]
+            # Readings are strongly autocorrelated: the spread of the smoothed
+            # residual is learnt too (bucket r) rather than derived from Σ
+            residual_warm = self._n[r] >= self._warm[r]
+            if residual_warm:
+                offset = [residual[i] - self._mean[r][i] for i in range(_D)]
+                score = max(score, self._distance(self._inverse(r), offset) / self.threshold - 1.0)
+            limit = self.gate * self.threshold
+            if distance > limit:
+                # Learnt clipped to the gate: a spike barely moves the statistics,
+                # a lasting change is absorbed over ~STATS_MEMORY readings
+                scale = limit / distance
+                x = [mean[i] + delta[i] * scale for i in range(_D)]
+            if distance <= limit or not residual_warm:
+                self._learn(r, residual)
+        self._learn(b, x)
+        self._learn(g, x)
+        return score
+
+    # ── Detector interface ────────────────────────────────────────────
+
+    def check(self, temp, hum, rain, light, water_level=None):
+        """
+        Returns True if the reading is anomalous, False otherwise (also while
+        the statistics are still being learnt). The reading is learnt.
+        """
+        if not self.loaded or temp is None or hum is None:
+            return False
+        score = self._observe(temp, hum, rain, light)
+        return score is not None and score > 0
+
+    def update(self, temp, hum, rain, light, water_level=None):
+        """
+        Windowed mode: learns one reading and returns the debounced flag.
+        A window is scored once `window` readings were seen, from the mean
+        score of those already comparable to learnt statistics.
+        """
+        self.scored = False
+        if not self.loaded or temp is None or hum is None:
+            return self.is_anomaly
+
+        score = self._observe(temp, hum, rain, light)
+        if score is not None:
+            self._sum   += score
+            self._count += 1
+        self._filled += 1
+        if self.path and self._clock.monotonic() - self._last_save >= STATS_SAVE_INTERVAL:
+            self._save_background()
+        if self._filled < self.window:
+            return self.is_anomaly
+        self._filled = 0
+        if not self._count:
+            return self.is_anomaly
+        raw = self._sum / self._count
+        self._sum, self._count = 0.0, 0
+        return self._close_window(raw)
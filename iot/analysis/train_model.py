@@ -1,87 +1,328 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import IsolationForest
+from sklearn.metrics import roc_auc_score
 import joblib
-import os
 
-# Define ranges for "Normal" behavior
-NORMAL_RANGES = {
-    'temperature': (20.0, 30.0),
-    'humidity': (40.0, 60.0),
-    'soil_moisture': (30.0, 70.0),
-    'light_intensity': (0, 1000),
-    'water_level': (20.0, 100.0)
-}
-
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pkl')
-DATA_PATH = os.path.join(os.path.dirname(__file__), 'training_data.csv')
-
-def generate_synthetic_data(n_samples=1000, anomaly_fraction=0.05):
-    """Generates a synthetic dataset with normal and anomalous data."""
-    np.random.seed(42)
-    
-    n_anomalies = int(n_samples * anomaly_fraction)
-    n_normal = n_samples - n_anomalies
-    
-    data = []
-    
-    # Generate Normal Data
-    for _ in range(n_normal):
-        sample = [
-            np.random.uniform(*NORMAL_RANGES['temperature']),
-            np.random.uniform(*NORMAL_RANGES['humidity']),
-            np.random.uniform(*NORMAL_RANGES['soil_moisture']),
-            np.random.uniform(*NORMAL_RANGES['light_intensity']),
-            np.random.uniform(*NORMAL_RANGES['water_level'])
-        ]
-        data.append(sample)
-        
-    # Generate Anomalies (Extreme values)
-    for _ in range(n_anomalies):
-        # Randomly choose a feature to be anomalous
-        feature_idx = np.random.randint(0, 5)
-        sample = [
-            np.random.uniform(*NORMAL_RANGES['temperature']),
-            np.random.uniform(*NORMAL_RANGES['humidity']),
-            np.random.uniform(*NORMAL_RANGES['soil_moisture']),
-            np.random.uniform(*NORMAL_RANGES['light_intensity']),
-            np.random.uniform(*NORMAL_RANGES['water_level'])
-        ]
-        
-        # Make one feature extreme
-        if feature_idx == 0: # Temp
-            sample[0] = np.random.choice([np.random.uniform(35, 50), np.random.uniform(-5, 10)])
-        elif feature_idx == 1: # Hum
-            sample[1] = np.random.choice([np.random.uniform(0, 20), np.random.uniform(80, 100)])
-        elif feature_idx == 2: # Soil
-            sample[2] = np.random.choice([np.random.uniform(0, 10), np.random.uniform(90, 100)])
-        elif feature_idx == 3: # Light
-            sample[3] = np.random.uniform(2000, 5000) # Extreme light
-        elif feature_idx == 4: # Water Level
-            sample[4] = np.random.uniform(0, 10) # Empty tank
-        
-        data.append(sample)
-    
-    columns = ['temperature', 'humidity', 'soil_moisture', 'light_intensity', 'water_level']
-    df = pd.DataFrame(data, columns=columns)
-    return df
-
-def train_model():
-    print("Generating synthetic data...")
-    df = generate_synthetic_data()
-    
-    # Save data for reference
-    df.to_csv(DATA_PATH, index=False)
-    print(f"Data saved to {DATA_PATH}")
-    
+from analysis.compile_forest import COMPILED_PATH, compile_forest
+from analysis.inference import FEATURES
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH   = os.path.join(ANALYSIS_DIR, 'model.pkl')
+METRICS_PATH = os.path.join(ANALYSIS_DIR, 'model.json')
+MODELS_DIR   = os.path.join(ANALYSIS_DIR, 'models')     # one sub-directory per trained version
+DATA_PATH    = os.path.join(ANALYSIS_DIR, 'training_data.csv')
+DB_PATH      = os.path.join(os.path.dirname(ANALYSIS_DIR), 'garden.db')
+
+SAMPLE_PERIOD = 2.0   # s between two rows (LOOP_INTERVAL of main.py)
+
+# Value ranges of the features, as fed by the control loop:
+# temperature °C, air humidity %, rain ADC (0 = wet, 255 = dry), light (ADC scaled to 0-1000)
+FEATURE_RANGES = np.array([(-10.0, 50.0), (0.0, 100.0), (0.0, 255.0), (0.0, 1000.0)])
+
+# Anomalous scenarios injected by generate_scenarios(), label = index + 1 (0 = normal)
+SCENARIOS = ("heat_wave", "drift", "dry_out", "stuck")
+
+# Promotion gates: a model that misses one of them is saved under models/ but
+# does not replace the active one
+MAX_FALSE_POSITIVE_RATE = 0.05   # held-out real rows (and synthetic normal rows)
+MIN_SCENARIO_RECALL     = 0.5    # every scenario of the held-out synthetic set
+
+
+def generate_scenarios(n_rows, anomaly_fraction=0.05, seed=42):
+    """
+    Synthetic garden history, fully vectorised (a few seconds per million rows).
+
+    Normal behaviour follows the daily cycle of the garden: temperature and
+    air humidity in opposite phase with per-day levels and amplitudes, light
+    from 0 at night to a noon peak under passing clouds, and soil (rain ADC)
+    drying slowly between waterings. Anomalous segments (30 min to 6 h) of
+    the SCENARIOS types replace about `anomaly_fraction` of the rows:
+
+      heat_wave  temperature +8..15 °C, air humidity -15..30 %
+      drift      one sensor drifts away linearly over the segment
+      dry_out    soil dries out completely (watering failed)
+      stuck      one sensor frozen at a rail value (0 or full scale)
+
+    Returns (X, labels): X is (n_rows, len(FEATURES)) float64, labels int8.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_rows) * SAMPLE_PERIOD + rng.uniform(0, 86400)
+    hour = (t / 3600.0) % 24
+    day  = (t // 86400).astype(np.int64)
+    n_days = int(day[-1]) + 1 if n_rows else 0
+    phase = np.sin(2 * np.pi * (hour - 9) / 24)
+
+    # ── Normal behaviour ─────────────────────────────────────────────
+    temp = (rng.uniform(16, 26, n_days)[day] + rng.uniform(3, 7, n_days)[day] * phase
+            + rng.normal(0, 0.5, n_rows))
+    hum  = (rng.uniform(50, 75, n_days)[day] - rng.uniform(8, 18, n_days)[day] * phase
+            + rng.normal(0, 2.0, n_rows))
+    hour_index = (t // 3600).astype(np.int64)
+    clouds   = rng.uniform(0.4, 1.0, hour_index[-1] + 1 if n_rows else 0)[hour_index]
+    daylight = np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None)
+    light = (20 + 220 * daylight * clouds + rng.normal(0, 2.0, n_rows)) / 255.0 * 1000.0
+    # Soil: sawtooth from the level after watering/rain to the irrigation trigger (~178)
+    cycle = rng.uniform(0.5, 2.0, n_days)[day] * 86400
+    wet = rng.uniform(20, 110, n_days)[day]
+    soil = wet + (178 - wet) * ((t / cycle + rng.uniform(0, 1, n_days)[day]) % 1.0) + rng.normal(0, 1.5, n_rows)
+    X = np.column_stack([temp, hum, soil, light])
+    labels = np.zeros(n_rows, dtype=np.int8)
+
+    # ── Anomalous segments: alternate normal gaps and anomalies ─────
+    mean_len = 3 * 3600 / SAMPLE_PERIOD
+    n_segments = max(1, int(n_rows * anomaly_fraction / mean_len * 1.2) + 1)
+    lengths = rng.integers(int(1800 / SAMPLE_PERIOD), int(6 * 3600 / SAMPLE_PERIOD), n_segments)
+    gaps = rng.exponential(mean_len * (1 - anomaly_fraction) / max(anomaly_fraction, 1e-9),
+                           n_segments).astype(np.int64)
+    starts = np.cumsum(gaps + np.concatenate([[0], lengths[:-1]]))
+    keep = starts < n_rows
+    starts, lengths = starts[keep], np.minimum(lengths[keep], n_rows - starts[keep])
+    if starts.size:
+        kinds     = rng.integers(1, len(SCENARIOS) + 1, starts.size)
+        features  = rng.integers(0, len(FEATURES), starts.size)   # drift / stuck target
+        magnitude = rng.uniform(0.5, 1.0, starts.size)
+        sign      = rng.choice([-1.0, 1.0], starts.size)
+
+        seg = np.repeat(np.arange(starts.size), lengths)
+        rows = np.repeat(starts, lengths) + (np.arange(seg.size) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+        progress = (rows - starts[seg]) / np.maximum(lengths[seg] - 1, 1)   # 0 → 1 across the segment
+        kind, feature = kinds[seg], features[seg]
+        labels[rows] = kind
+
+        heat = kind == 1
+        ramp = np.minimum(progress[heat] * 4, 1.0)   # builds up over the first quarter
+        X[rows[heat], 0] += ramp * (8 + 7 * magnitude[seg][heat])
+        X[rows[heat], 1] -= ramp * (15 + 15 * magnitude[seg][heat])
+
+        drift = kind == 2
+        span = FEATURE_RANGES[feature[drift], 1] - FEATURE_RANGES[feature[drift], 0]
+        X[rows[drift], feature[drift]] += sign[seg][drift] * progress[drift] * span * 0.4 * magnitude[seg][drift]
+
+        dry = kind == 3
+        X[rows[dry], 2] = np.maximum(X[rows[dry], 2], 215 + 40 * np.minimum(progress[dry] * 2, 1.0))
+
+        stuck = kind == 4
+        rail = np.where(sign[seg][stuck] > 0, 1, 0)
+        X[rows[stuck], feature[stuck]] = FEATURE_RANGES[feature[stuck], rail]
+
+    np.clip(X, FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1], out=X)
+    return X, labels
+
+
+def stream_history(db_path=DB_PATH, chunk_size=50000):
+    """
+    Yields the real readings of garden.db as (n, len(FEATURES)) arrays,
+    `chunk_size` rows at a time (read-only connection, no migration).
+    Rows without temperature or humidity (DHT11 failures) are skipped.
+    """
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        # soil_moisture holds the raw rain ADC value, light_intensity the lux
+        cursor = conn.execute("""
+            SELECT temperature, humidity, COALESCE(soil_moisture, 0), COALESCE(light_intensity, 0)
+            FROM readings
+            WHERE temperature IS NOT NULL AND humidity IS NOT NULL
+        """)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield np.asarray(rows, dtype=np.float64)
+    finally:
+        conn.close()
+
+
+def reservoir_sample(chunks, k, seed=42):
+    """Uniform sample of at most k rows from a stream of arrays (memory O(k))."""
+    rng = np.random.default_rng(seed)
+    sample, seen = None, 0
+    for chunk in chunks:
+        n = len(chunk)
+        if sample is None:
+            sample = np.empty((k, chunk.shape[1]))
+        fill = min(n, max(0, k - seen))
+        sample[seen:seen + fill] = chunk[:fill]
+        if fill < n:
+            # Row i of the stream (0-based) replaces a random slot with probability k / (i + 1)
+            index = np.arange(seen + fill, seen + n)
+            slots = (rng.random(n - fill) * (index + 1)).astype(np.int64)
+            hit = slots < k
+            sample[slots[hit]] = chunk[fill:][hit]
+        seen += n
+    if sample is None:
+        return np.empty((0, len(FEATURES))), 0
+    return sample[:min(k, seen)], seen
+
+
+def evaluate(model, X, labels, X_real=None):
+    """Detection metrics on a labelled synthetic set (and false alarms on real rows)."""
+    flagged = model.predict(X) == -1
+    anomalous = labels > 0
+    tp = int((flagged & anomalous).sum())
+    fp = int((flagged & ~anomalous).sum())
+    fn = int((~flagged & anomalous).sum())
+    metrics = {
+        "precision":  tp / (tp + fp) if tp + fp else 0.0,
+        "recall":     tp / (tp + fn) if tp + fn else 0.0,
+        "false_positive_rate": fp / int((~anomalous).sum()) if (~anomalous).any() else 0.0,
+        "recall_by_scenario": {
+            name: float(flagged[labels == i + 1].mean()) if (labels == i + 1).any() else None
+            for i, name in enumerate(SCENARIOS)
+        },
+    }
+    p, r = metrics["precision"], metrics["recall"]
+    metrics["f1"] = 2 * p * r / (p + r) if p + r else 0.0
+    scores = -model.decision_function(X)
+    # Threshold-free: how well the score ranks anomalous rows above normal ones
+    metrics["roc_auc"] = float(roc_auc_score(anomalous, scores)) if 0 < anomalous.sum() < len(X) else None
+    metrics["anomaly_score_quantiles"] = dict(zip(
+        ("p01", "p50", "p99"), np.percentile(scores[~anomalous], [1, 50, 99]).round(4).tolist()))
+    if X_real is not None and len(X_real):
+        metrics["real_false_positive_rate"] = float((model.predict(X_real) == -1).mean())
+    return metrics
+
+
+def promotion_failures(metrics, max_false_positive_rate=MAX_FALSE_POSITIVE_RATE,
+                       min_scenario_recall=MIN_SCENARIO_RECALL):
+    """Reasons why a model must not be promoted (empty list: all gates passed)."""
+    failures = []
+    for key in ("real_false_positive_rate", "false_positive_rate"):
+        rate = metrics.get(key)
+        if rate is not None and rate > max_false_positive_rate:
+            failures.append(f"{key} {rate:.2%} > {max_false_positive_rate:.2%}")
+    if metrics.get("real_false_positive_rate") is None:
+        failures.append("no held-out real rows to measure real_false_positive_rate")
+    for name, recall in metrics["recall_by_scenario"].items():
+        if recall is None or recall < min_scenario_recall:
+            failures.append(f"{name} recall {'n/a' if recall is None else f'{recall:.2f}'} < {min_scenario_recall:.2f}")
+    return failures
+
+
+def train_model(rows=1_000_000, anomaly_fraction=0.05, contamination=0.01, n_estimators=100,
+                db_path=DB_PATH, max_real=500_000, seed=42, promote=True,
+                max_false_positive_rate=MAX_FALSE_POSITIVE_RATE, min_scenario_recall=MIN_SCENARIO_RECALL):
+    """
+    Trains, evaluates and saves a new model version under models/.
+    With promote=True it also becomes the active model, but only if it passes
+    the promotion gates (promotion_failures()).
+    """
+    version = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    timings = {}
+
+    start = time.perf_counter()
+    print(f"Generating {rows} synthetic rows...")
+    X_syn, labels = generate_scenarios(rows, anomaly_fraction, seed)
+    # Held-out set with more anomalies, so every scenario gets enough segments
+    X_test, labels_test = generate_scenarios(max(rows // 5, 100000), max(anomaly_fraction, 0.25), seed + 1)
+    timings["generate_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    real, real_total = reservoir_sample(stream_history(db_path), max_real, seed)
+    # 80 % of the real rows for training, 20 % held out for the false alarm rate
+    order = np.random.default_rng(seed).permutation(len(real))
+    cut = int(len(real) * 0.8)
+    real_train, real_test = real[order[:cut]], real[order[cut:]]
+    timings["load_real_s"] = time.perf_counter() - start
+    print(f"Real history: {real_total} rows in {db_path}, {len(real_train)} used for training")
+
+    # Fit on the normal regime (plus the real history): long anomalous segments
+    # in the fit set would form dense clusters the forest learns as normal.
+    # The labelled scenarios are only used to evaluate the model.
+    X = np.concatenate([X_syn[labels == 0], real_train])
+
+    start = time.perf_counter()
     print("Training Isolation Forest...")
-    # contamination is the expected proportion of outliers in the data set
-    model = IsolationForest(contamination=0.05, random_state=42)
-    model.fit(df)
-    
-    # Save model
-    joblib.dump(model, MODEL_PATH)
-    print(f"Model saved to {MODEL_PATH}")
+    # contamination sets the threshold: share of the (normal) fit set flagged
+    model = IsolationForest(n_estimators=n_estimators, contamination=contamination,
+                            random_state=seed, n_jobs=-1)
+    model.fit(X)
+    timings["fit_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metrics = evaluate(model, X_test, labels_test, real_test)
+    timings["evaluate_s"] = time.perf_counter() - start
+    failures = promotion_failures(metrics, max_false_positive_rate, min_scenario_recall)
+
+    report = {
+        "version":  version,
+        "features": list(FEATURES),
+        "params":   {"n_estimators": n_estimators, "contamination": contamination,
+                     "anomaly_fraction": anomaly_fraction, "seed": seed},
+        "data":     {"synthetic_rows": int(len(X_syn)), "fit_rows": int(len(X)), "real_rows_total": int(real_total),
+                     "real_rows_train": int(len(real_train)), "real_rows_test": int(len(real_test)),
+                     "test_rows": int(len(X_test))},
+        "metrics":  metrics,
+        "gates":    {"max_false_positive_rate": max_false_positive_rate,
+                     "min_scenario_recall": min_scenario_recall, "failures": failures},
+        "timings":  {k: round(v, 3) for k, v in timings.items()},
+    }
+
+    # Versioned artefacts: models/<version>/{model.pkl, model.npz, model.json}
+    out_dir = os.path.join(MODELS_DIR, version)
+    os.makedirs(out_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(out_dir, 'model.pkl'))
+    compile_forest(model, FEATURES).save(os.path.join(out_dir, 'model.npz'))
+    with open(os.path.join(out_dir, 'model.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Model {version} saved to {out_dir}")
+    print(f"  precision {metrics['precision']:.3f} | recall {metrics['recall']:.3f} | "
+          f"f1 {metrics['f1']:.3f} | auc {metrics['roc_auc']:.3f} | false positives {metrics['false_positive_rate']:.2%}"
+          + (f" (real {metrics['real_false_positive_rate']:.2%})" if "real_false_positive_rate" in metrics else ""))
+    print("  recall by scenario: " + ", ".join(
+        f"{k} {v:.2f}" for k, v in metrics["recall_by_scenario"].items() if v is not None))
+
+    if failures:
+        print("  promotion gates failed: " + "; ".join(failures))
+    if promote and failures:
+        print(f"Model {version} NOT promoted, the active model is unchanged")
+    elif promote:
+        # Active model used by inference.py
+        for name, target in (('model.pkl', MODEL_PATH), ('model.npz', COMPILED_PATH), ('model.json', METRICS_PATH)):
+            shutil.copyfile(os.path.join(out_dir, name), target)
+        print(f"Model {version} promoted to {ANALYSIS_DIR}")
+    return report
+
+
+def save_sample(path=DATA_PATH, rows=2000, seed=42):
+    """Small labelled CSV of generated data, for reference."""
+    X, labels = generate_scenarios(rows, 0.2, seed)
+    header = ",".join(FEATURES) + ",scenario"
+    names = np.array(("normal",) + SCENARIOS)[labels]
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        for row, name in zip(X.round(2).tolist(), names):
+            f.write(",".join(map(str, row)) + f",{name}\n")
+    print(f"Data sample saved to {path}")
+
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the anomaly model (synthetic scenarios + garden.db).")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic rows")
+    parser.add_argument("--anomaly-fraction", type=float, default=0.05)
+    parser.add_argument("--contamination", type=float, default=0.01, help="false alarm share on normal data")
+    parser.add_argument("--estimators", type=int, default=100)
+    parser.add_argument("--db", default=DB_PATH, help="real history (SQLite, read-only)")
+    parser.add_argument("--max-real", type=int, default=500_000, help="real rows sampled at most")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-promote", action="store_true", help="keep the active model unchanged")
+    parser.add_argument("--max-fpr", type=float, default=MAX_FALSE_POSITIVE_RATE,
+                        help="promotion gate: max false positive rate (real and synthetic normal rows)")
+    parser.add_argument("--min-recall", type=float, default=MIN_SCENARIO_RECALL,
+                        help="promotion gate: min recall of every scenario")
+    parser.add_argument("--save-sample", action="store_true", help=f"write a labelled sample to {DATA_PATH}")
+    args = parser.parse_args()
+
+    if args.save_sample:
+        save_sample()
+    train_model(args.rows, args.anomaly_fraction, args.contamination, args.estimators,
+                args.db, args.max_real, args.seed, promote=not args.no_promote,
+                max_false_positive_rate=args.max_fpr, min_scenario_recall=args.min_recall)
@@ -0,0 +1,460 @@
+"""
+Benchmarks du chemin critique d'une itération de main.py, hors Pi.
+
+    python benchmark.py                         # → bench_results/<date>-<commit>.json
+    python benchmark.py --compare bench_results/avant.json
+    python benchmark.py --only sensors,full_iteration -n 2000
+
+Tout tourne sur le HAL simulé avec une horloge virtuelle : les attentes
+matérielles (bus I2C, DHT11, RC) ne coûtent rien, on mesure le coût CPU de
+notre code. Chaque benchmark donne p50/p99/moyenne (µs) et ops/s ; les
+résultats JSON se comparent d'un commit à l'autre (--compare signale les
+régressions au-delà de --threshold).
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import hal
+from config import HAL_SIM_SEED, PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED
+from hal.clocks import VirtualClock
+from hal.simulated import SimBackend
+from utils.logger import logger
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+
+def _percentile(sorted_ns, pct):
+    index = min(len(sorted_ns) - 1, int(round(pct / 100.0 * (len(sorted_ns) - 1))))
+    return sorted_ns[index]
+
+
+def measure(fn, iterations, warmup=50):
+    """Appelle fn() `iterations` fois ; retourne les statistiques de latence."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    clock_ns = time.perf_counter_ns
+    start = clock_ns()
+    for _ in range(iterations):
+        t0 = clock_ns()
+        fn()
+        samples.append(clock_ns() - t0)
+    total = clock_ns() - start
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "p50_us":     _percentile(samples, 50) / 1000.0,
+        "p99_us":     _percentile(samples, 99) / 1000.0,
+        "mean_us":    sum(samples) / len(samples) / 1000.0,
+        "max_us":     samples[-1] / 1000.0,
+        "ops_per_s":  iterations / (total / 1e9) if total else float("inf"),
+    }
+
+
+class _LoopbackPaho:
+    """Client paho minimal : publish() accepte sans réseau (sérialisation seule mesurée)."""
+
+    class _Result:
+        rc = 0
+
+    def __init__(self):
+        self.published = 0
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published += 1
+        return self._Result()
+
+
+class Bench:
+    """Environnement commun : HAL simulé, horloge virtuelle, base temporaire."""
+
+    def __init__(self, iterations, seed=HAL_SIM_SEED):
+        self.iterations = iterations
+        self.seed    = seed
+        self.clock   = VirtualClock()
+        self.backend = SimBackend(clock=self.clock, seed=seed)
+        hal.set_backend(self.backend)
+        self._tmp    = tempfile.TemporaryDirectory(prefix="bench-")
+        self._parts  = {}
+
+    def close(self):
+        db = self._parts.get("db")
+        if db is not None:
+            db.close()
+        self._tmp.cleanup()
+
+    def tmp_path(self, name):
+        """Chemin dans le répertoire temporaire du benchmark."""
+        return os.path.join(self._tmp.name, name)
+
+    def _part(self, name, factory):
+        if name not in self._parts:
+            self._parts[name] = factory()
+        return self._parts[name]
+
+    # ── Composants (construits à la demande) ──────────────────────
+
+    def temp_sensor(self):
+        from sensors.temperature import TemperatureSensor
+        return self._part("temp", TemperatureSensor)
+
+    def rain_sensor(self):
+        from sensors.water_level import WaterLevelSensor
+        return self._part("rain", WaterLevelSensor)
+
+    def light_sensor(self):
+        from sensors.light_sensor import LightSensor
+
+        def build():
+            sensor = LightSensor()
+            sensor.calibrate_rc()
+            return sensor
+        return self._part("light", build)
+
+    def pump(self):
+        from actuators.pump import Pump
+        return self._part("pump", Pump)
+
+    def grow_light(self):
+        from actuators.grow_light import GrowLight
+        return self._part("grow_light", GrowLight)
+
+    def alerts(self):
+        from actuators.leds import Leds
+        from actuators.lcd import Lcd
+        from logic.alert_manager import AlertManager
+        return self._part("alerts", lambda: AlertManager(
+            Leds(PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED), Lcd()))
+
+    def anomaly(self):
+        from analysis.inference import create_detector
+        return self._part("anomaly", lambda: create_detector(persistent=False))
+
+    def db(self):
+        from utils.database import DatabaseManager
+        return self._part("db", lambda: DatabaseManager(os.path.join(self._tmp.name, "bench.db")))
+
+    def mqtt(self):
+        from mqtt.client import MqttClient
+
+        def build():
+            client = MqttClient(lambda topic, payload: None, outbox_dir=self.tmp_path("outbox"))
+            client.client    = _LoopbackPaho()
+            client.connected = True
+            return client
+        return self._part("mqtt", build)
+
+    def pipeline(self):
+        from logic.irrigation import IrrigationManager
+        from logic.lighting import LightingManager
+        from logic.pipeline import ControlPipeline
+        return self._part("pipeline", lambda: ControlPipeline(
+            self.grow_light(), self.pump(),
+            IrrigationManager(self.pump()), LightingManager(self.grow_light()),
+            self.alerts(), self.anomaly(), self.db(), self.mqtt()))
+
+    def tick(self, seconds=2.0):
+        self.clock.advance(seconds)
+
+
+# ── Benchmarks ─────────────────────────────────────────────────────────
+
+def bench_sensors(b):
+    temp, rain, light = b.temp_sensor(), b.rain_sensor(), b.light_sensor()
+
+    def read_dht():
+        b.tick(2.0)   # nouvelle lecture DHT11 à chaque appel (intervalle écoulé)
+        temp.read()
+
+    def read_rain():
+        b.tick(1.0)   # ADC périmé → nouveau scan I2C
+        rain.read()
+
+    return {
+        "dht":   measure(read_dht, b.iterations),
+        "rain":  measure(read_rain, b.iterations),
+        "light": measure(light.read, b.iterations),
+    }
+
+
+def _benchmark_forest(seed):
+    """
+    Forêt compilée entraînée ici comme dans train_model.py (lignes normales
+    synthétiques), quand aucun modèle n'est promu. sklearn est alors requis :
+    sans lui, erreur plutôt qu'une étape absente des résultats.
+    """
+    try:
+        from sklearn.ensemble import IsolationForest
+        from analysis.compile_forest import compile_forest
+        from analysis.inference import FEATURES
+        from analysis.train_model import generate_scenarios
+    except ImportError as e:
+        raise RuntimeError(f"modèle IA absent et sklearn indisponible pour en entraîner un ({e})") from e
+    X, labels = generate_scenarios(50_000, seed=seed)
+    model = IsolationForest(n_estimators=100, contamination=0.01, random_state=seed).fit(X[labels == 0])
+    return compile_forest(model, FEATURES)
+
+
+def bench_anomaly(b):
+    from analysis.inference import AnomalyDetector
+    from analysis.streaming import StreamingDetector
+    results = {}
+    detector = AnomalyDetector()
+    results["forest_model"] = "promu (analysis/model.npz ou model.pkl)"
+    if detector.model is None:
+        detector.load_model(_benchmark_forest(b.seed))
+        results["forest_model"] = "entraîné pour le benchmark (100 arbres)"
+        if detector.model is None:
+            raise RuntimeError("forêt entraînée pour le benchmark refusée par AnomalyDetector")
+    # Un échantillon, une évaluation
+    results["check"]  = measure(lambda: detector.check(22.0, 55.0, 120.0, 480.0), b.iterations)
+    # Mode fenêtré : un score_samples vectorisé toutes les ANOMALY_WINDOW lectures
+    results["update"] = measure(lambda: detector.update(22.0, 55.0, 120.0, 480.0), b.iterations)
+
+    # Moteur statistique en ligne, statistiques déjà apprises (chemin de notation complet)
+    stats = StreamingDetector(path=None)
+    for i in range(stats.min_samples * 2):
+        stats.update(22.0 + i % 5 * 0.3, 55.0 + i % 7, 120.0 + i % 11, 480.0 + i % 13 * 4)
+    results["stats_check"]  = measure(lambda: stats.check(22.0, 55.0, 120.0, 480.0), b.iterations)
+    results["stats_update"] = measure(lambda: stats.update(22.0, 55.0, 120.0, 480.0), b.iterations)
+    return results
+
+
+def bench_database(b):
+    db = b.db()
+    ts = [1_700_000_000_000]
+
+    def save():
+        ts[0] += 2000
+        db.save_reading(22.0, 55.0, 120, 480.0, None, ts=ts[0])
+
+    result = measure(save, b.iterations)
+    # Débit réel : appels + vidange du tampon write-behind
+    start = time.perf_counter()
+    for _ in range(b.iterations):
+        save()
+    db.flush()
+    elapsed = time.perf_counter() - start
+    result["rows_per_s_with_commit"] = b.iterations / elapsed if elapsed else float("inf")
+    return result
+
+
+def bench_mqtt(b):
+    try:
+        client = b.mqtt()
+    except ImportError as e:
+        return {"skipped": f"paho-mqtt absent ({e})"}
+    from mqtt.client import MqttClient
+    # Hors connexion : ajout à la file sur disque (mqtt/outbox.py), client séparé
+    offline = MqttClient(lambda topic, payload: None, outbox_dir=b.tmp_path("outbox-offline"))
+    offline.client = _LoopbackPaho()
+
+    topic, frame = client.telemetry.messages(22.0, 55.0, 480.0, False, 80, 120, 1, False)[0]
+    return {
+        # Boucle de contrôle : encodage de la trame + ajout O(1) au Publisher
+        "submit": measure(lambda: client.publish_sensors(
+            temp=22.0, hum=55.0, lux=480.0, is_dark=False, light_intensity=80,
+            rain_pct=120, rain_digital=1, pump_on=False), b.iterations),
+        # Thread mqtt-publisher : envoi paho (connecté) / ajout à la file sur disque (hors connexion)
+        "send":   measure(lambda: client._send(topic, frame), b.iterations),
+        "store":  measure(lambda: offline._send(topic, frame), b.iterations),
+        # État retenu (mqtt/snapshot.py) : fenêtre pleine, construit toutes les SNAPSHOT_INTERVAL s
+        "state":  measure(lambda: json.dumps(client.state.snapshot()), b.iterations // 10 or 1),
+    }
+
+
+def bench_commands(b):
+    from config import TOPIC_COMMANDS_LIGHT
+    from logic.commands import CommandDispatcher
+    from logic.irrigation import IrrigationManager
+    from logic.lighting import LightingManager
+    dispatcher = CommandDispatcher(IrrigationManager(b.pump()), LightingManager(b.grow_light()))
+    state = [0]
+
+    def submit():
+        state[0] += 1
+        dispatcher.submit(TOPIC_COMMANDS_LIGHT,
+                          '{"command": "SET_INTENSITY", "value": %d, "id": "b%d"}' % (state[0] % 101, state[0]))
+
+    def submit_drain():
+        submit()
+        dispatcher.drain()
+
+    return {
+        # Thread réseau : validation + mise en attente (coalescée : une commande éclairage en attente)
+        "submit": measure(submit, b.iterations),
+        # Boucle de contrôle : exécution en début de cycle
+        "drain":  measure(submit_drain, b.iterations),
+    }
+
+
+def bench_alerts(b):
+    alerts = b.alerts()
+    readings = [(22.0, 55.0, 120), (22.0, 90.0, 120), (22.0, 55.0, 200), (22.0, 55.0, 40)]
+    state = [0]
+
+    def update():
+        temp, hum, rain = readings[state[0] % len(readings)]
+        state[0] += 1
+        alerts.update(temp, hum, rain, 1, False, False, 1.0)
+
+    return {
+        "steady":   measure(lambda: alerts.update(22.0, 55.0, 120, 1, False, False, 1.0), b.iterations),
+        "changing": measure(update, b.iterations),
+    }
+
+
+def bench_full_iteration(b):
+    from logic.scheduler import SensorScheduler
+    from config import SENSOR_INTERVALS, LOOP_INTERVAL
+
+    temp, rain, light = b.temp_sensor(), b.rain_sensor(), b.light_sensor()
+    scheduler = SensorScheduler()
+    scheduler.add_source("dht",   temp.read, SENSOR_INTERVALS["dht"])
+    scheduler.add_source("rain",  lambda: (rain.read(), rain._read_digital()), SENSOR_INTERVALS["rain"])
+    scheduler.add_source("light", lambda: (light.read(), light.is_dark), SENSOR_INTERVALS["light"])
+    scheduler.start()
+    pipeline = b.pipeline()
+
+    def iteration():
+        b.tick(LOOP_INTERVAL)
+        scheduler.run_pending()
+        snapshot = scheduler.snapshot()
+        t, h, age = snapshot["dht"].value if "dht" in snapshot else (None, None, None)
+        lux, is_dark = snapshot["light"].value
+        rain_pct, rain_digital = snapshot["rain"].value
+        sample_ts = max(s.ts for s in snapshot.values())
+        pipeline.step(sample_ts, t, h, age, rain_pct, rain_digital, lux, is_dark)
+
+    result = measure(iteration, b.iterations)
+    scheduler.stop()
+    return result
+
+
+BENCHMARKS = {
+    "sensors":        bench_sensors,
+    "anomaly":        bench_anomaly,
+    "database":       bench_database,
+    "mqtt":           bench_mqtt,
+    "commands":       bench_commands,
+    "alerts":         bench_alerts,
+    "full_iteration": bench_full_iteration,
+}
+
+
+# ── Résultats ──────────────────────────────────────────────────────────
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _flatten(results, prefix=""):
+    """{"sensors": {"dht": {...}}} → {"sensors.dht": {...}} (seulement les mesures)."""
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and "ops_per_s" in value:
+            flat[prefix + name] = value
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}."))
+    return flat
+
+
+def compare(current, previous, threshold):
+    """Affiche les écarts de p50 ; retourne la liste des régressions (> threshold)."""
+    regressions = []
+    old = _flatten(previous["results"])
+    for name, stats in _flatten(current["results"]).items():
+        if name not in old:
+            continue
+        before, after = old[name]["p50_us"], stats["p50_us"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ← RÉGRESSION"
+            regressions.append(name)
+        print(f"  {name:28s} p50 {before:9.1f} → {after:9.1f} µs ({change:+.0%}){flag}")
+    return regressions
+
+
+def run(names, iterations, seed=HAL_SIM_SEED):
+    bench = Bench(iterations, seed=seed)
+    results = {}
+    try:
+        for name in names:
+            start = time.perf_counter()
+            results[name] = BENCHMARKS[name](bench)
+            print(f"  {name:16s} {time.perf_counter() - start:6.2f}s")
+    finally:
+        bench.close()
+    return {
+        "commit":     _git_commit(),
+        "date":       datetime.datetime.now().isoformat(timespec="seconds"),
+        "python":     platform.python_version(),
+        "machine":    platform.machine(),
+        "iterations": iterations,
+        "results":    results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du chemin critique (HAL simulé).")
+    parser.add_argument("-n", "--iterations", type=int, default=1000)
+    parser.add_argument("--only", help=f"liste séparée par des virgules parmi : {', '.join(BENCHMARKS)}")
+    parser.add_argument("-o", "--output", help="fichier JSON (défaut : bench_results/<date>-<commit>.json)")
+    parser.add_argument("--compare", help="résultats JSON de référence")
+    parser.add_argument("--threshold", type=float, default=0.20, help="régression tolérée sur p50 (0.20 = +20 %%)")
+    parser.add_argument("--seed", type=int, default=HAL_SIM_SEED)
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"benchmark inconnu : {', '.join(unknown)}")
+
+    # Logs au niveau de production, mais sans le coût du terminal
+    devnull = open(os.devnull, "w")
+    handlers = [getattr(h, "target", h) for h in logger.handlers]   # AsyncLogHandler → StreamHandler
+    streams = [(h, h.setStream(devnull)) for h in handlers if isinstance(h, logging.StreamHandler)]
+
+    try:
+        report = run(names, args.iterations, seed=args.seed)
+    finally:
+        for handler, stream in streams:
+            handler.setStream(stream)
+        devnull.close()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit'] or 'nocommit'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in _flatten(report["results"]).items():
+        print(f"  {name:28s} p50 {stats['p50_us']:9.1f} µs  p99 {stats['p99_us']:9.1f} µs  "
+              f"{stats['ops_per_s']:10.0f} ops/s")
+    print(f"Résultats → {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"Comparaison avec {args.compare} (commit {previous.get('commit')}) :")
+        if compare(report, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,37 @@ import os
 MOCK_MODE = False  # False = Raspberry Pi réel | True = simulation PC
 LOOP_INTERVAL = 2  # Secondes — cycle rapide pour données temps réel
 
+# --- HAL (hal/) ---
+HAL_BACKEND       = "sim" if MOCK_MODE else "rpi"   # "rpi" | "sim"
+HAL_VIRTUAL_CLOCK = False   # sim : horloge virtuelle (le temps avance sans attendre)
+HAL_SIM_SEED      = 42      # sim : graine du modèle de jardin (reproductible)
+
+# --- Ordonnanceur capteurs (intervalle d'échantillonnage par source, s) ---
+SENSOR_INTERVALS = {
+    "dht":   5,    # DHT11 (valeur servie par son thread d'acquisition)
+    "rain":  1,    # ADC pluie
+    "light": 10,   # ADC lumière + mesure RC
+}
+SCHEDULER_WORKERS = 3
+
+# --- Trace capteurs (rejeu : python replay.py <trace>) ---
+TRACE_PATH = None   # ex. "traces/jardin.sgt.gz" — enregistre chaque cycle ; None = désactivé
+
+# --- Logs (utils/logger.py) ---
+LOG_ASYNC          = True    # écriture des logs dans un thread dédié (file non bloquante)
+LOG_QUEUE_SIZE     = 10000   # messages en attente max (au-delà : perdus et comptés)
+LOG_DEDUP_WINDOW   = 60      # s — un message identique n'est écrit qu'une fois par fenêtre
+LOG_TEMPLATE_BURST = 5       # messages < WARNING de même gabarit écrits max par fenêtre
+
+# --- Métriques (utils/metrics.py) ---
+METRICS_INTERVAL = 60   # s entre deux publications du résumé sur TOPIC_METRICS
+
+# --- Démarrage (main.py) ---
+STARTUP_LAZY             = True   # modèle IA chargé en arrière-plan, calibration RC mémorisée puis revalidée en arrière-plan
+RC_CALIBRATION_PATH      = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rc_calibration.json")
+RC_CALIBRATION_TOLERANCE = 0.30   # écart relatif max entre baseline RC mesurée et mémorisée
+RC_CALIBRATION_CONFIRM   = 3      # revalidations hors tolérance mais concordantes avant de remplacer la baseline
+
 # --- MQTT Settings ---
 MQTT_BROKER = "localhost"   # Broker Mosquitto local sur le Pi
 MQTT_PORT = 1883
@@ -11,15 +42,50 @@ MQTT_USERNAME = "smartgarden"
 MQTT_PASSWORD = "smart2024"
 MQTT_CLIENT_ID = "smart_garden_raspberry_pi"
 
+# --- Publication MQTT (mqtt/publisher.py, thread dédié) ---
+MQTT_PUBLISH_QUEUE = 1000   # messages en attente max (capteurs coalescés par topic ; alertes au-delà → file sur disque)
+
+# --- File d'attente MQTT hors connexion (mqtt/outbox.py) ---
+MQTT_OUTBOX_DIR           = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox")   # None = désactivée
+MQTT_OUTBOX_MAX_BYTES     = 64 * 1024 * 1024   # au-delà, segments les plus anciens supprimés (~ 2 semaines de trames JSON)
+MQTT_OUTBOX_SEGMENT_BYTES = 1024 * 1024        # taille d'un segment append-only
+MQTT_OUTBOX_BATCH         = 50    # messages par lot renvoyé (QoS 1, point de reprise après accusé du broker)
+MQTT_OUTBOX_RATE          = 100   # messages/s max au renvoi (ne pas inonder le broker à la reconnexion)
+MQTT_OUTBOX_ACK_TIMEOUT   = 10    # s d'attente de l'accusé d'un lot avant nouvel essai
+MQTT_RECONNECT_MIN_DELAY  = 1     # s — reconnexion automatique, délai doublé jusqu'au max
+MQTT_RECONNECT_MAX_DELAY  = 60
+
+# --- Télémétrie capteurs (mqtt/telemetry.py) ---
+TELEMETRY_MODE            = "frame"   # "frame" : une trame par cycle | "legacy" : 3 messages JSON par cycle
+TELEMETRY_ENCODING        = "json"    # "json" (clés courtes) | "binary" (struct, 27 o, schéma publié)
+TELEMETRY_LEGACY_INTERVAL = 30        # s entre deux publications sur les topics historiques en mode "frame" (0 = jamais)
+
+# --- État retenu et resynchronisation des tableaux de bord (mqtt/snapshot.py) ---
+SNAPSHOT_WINDOW   = 150   # dernières trames gardées en mémoire et envoyées dans l'état (150 × LOOP_INTERVAL = 5 min)
+SNAPSHOT_INTERVAL = 60    # s entre deux publications de l'état retenu sur TOPIC_STATE (0 = à la connexion seulement) ; l'écart est comblé par une demande de synchronisation
+
+# --- Commandes MQTT (logic/commands.py, exécutées par la boucle de contrôle) ---
+COMMAND_MAX_WATERING   = 600    # s — durée max d'un arrosage manuel (START_WATERING)
+COMMAND_LIGHT_DURATION = 3600   # s — dérogation d'éclairage par défaut (SET_INTENSITY)
+COMMAND_DEDUP          = 256    # derniers id de commande retenus (un id déjà reçu est ignoré)
+
 # --- Topics ---
 TOPIC_PREFIX = "jardin"
 TOPIC_SENSORS_TEMP  = f"{TOPIC_PREFIX}/sensors/temperature"
 TOPIC_SENSORS_SOIL  = f"{TOPIC_PREFIX}/sensors/soil"
 TOPIC_SENSORS_LIGHT = f"{TOPIC_PREFIX}/sensors/light"
 TOPIC_SENSORS_WATER = f"{TOPIC_PREFIX}/sensors/water"   # niveau eau + pluie
+TOPIC_SENSORS_ANOMALY = f"{TOPIC_PREFIX}/sensors/anomaly"   # score IA lissé, une fois par fenêtre
 TOPIC_ALERTS        = f"{TOPIC_PREFIX}/alerts"
+TOPIC_METRICS       = f"{TOPIC_PREFIX}/metrics"   # résumé latences/compteurs (utils/metrics.py)
+TOPIC_TELEMETRY     = f"{TOPIC_PREFIX}/telemetry"          # une trame capteurs par cycle (mqtt/telemetry.py)
+TOPIC_TELEMETRY_SCHEMA = f"{TOPIC_PREFIX}/telemetry/schema"   # retenu : format de la trame
+TOPIC_STATE         = f"{TOPIC_PREFIX}/state"          # retenu : état courant + dernières trames (mqtt/snapshot.py)
+TOPIC_SYNC_REQUEST  = f"{TOPIC_PREFIX}/sync/request"   # {"id", "since", "b"} : trames manquantes d'un client
+TOPIC_SYNC_REPLY    = f"{TOPIC_PREFIX}/sync/reply"     # + "/<id>" : réponse à la demande
 TOPIC_COMMANDS_WATER = f"{TOPIC_PREFIX}/commands/water"
 TOPIC_COMMANDS_LIGHT = f"{TOPIC_PREFIX}/commands/light"
+TOPIC_COMMANDS_REPLY = f"{TOPIC_PREFIX}/commands/reply"   # résultat de chaque commande (id, statut, latences)
 
 # --- GPIO Pins (BCM Mode) ---
 PIN_PUMP       = 17   # Relais pompe → GPIO 17 (test confirmé)
@@ -29,11 +95,18 @@ PIN_LED_ORANGE = 6
 PIN_LED_RED    = 5
 PIN_DHT        = 4    # DHT11 → GPIO 4
 PIN_LDR_RC     = 27   # LDR RC-timing → GPIO 27
+LIGHT_RC_MODE  = "edge"   # "edge" = front montant (sans boucle active) | "poll" = comptage
 
 # --- ADC PCF8591 (I2C) ---
 ADC_ADDRESS      = 0x4B   # Adresse I2C du PCF8591
 RAIN_ADC_CHANNEL = 0      # A0 → Pluie (analogique)
+PIN_SOIL         = 1      # A1 → Humidité du sol
 PIN_LDR          = 2      # A2 → Luminosité
+ADC_MAX_AGE      = 0.5    # s — un scan des 4 canaux sert tous les capteurs du cycle
+
+# --- DHT11 ---
+DHT_READ_INTERVAL = 2.0   # s entre deux lectures (thread d'acquisition, min 1 s)
+DHT_MAX_AGE       = 10.0  # s — au-delà, la dernière valeur est considérée périmée
 
 # --- Thresholds ---
 SOIL_MOISTURE_LOW = 30  # %
@@ -42,3 +115,26 @@ SOIL_MOISTURE_HIGH = 60 # %
 LIGHT_SCHEDULE_HIGH_START = 5   # 5h
 LIGHT_SCHEDULE_MED_START = 12   # 12h
 LIGHT_SCHEDULE_OFF_START = 17   # 17h
+
+# --- IA anomalie (analysis/inference.py, mode fenêtré) ---
+ANOMALY_ENGINE     = "stats"    # "stats" : statistiques en ligne (analysis/streaming.py) | "forest" : IsolationForest promu par analysis/train_model.py
+ANOMALY_WINDOW     = 15     # échantillons par fenêtre (15 × LOOP_INTERVAL = 30 s), un score_samples par fenêtre
+ANOMALY_EWMA_ALPHA = 0.3    # lissage exponentiel du score de fenêtre
+ANOMALY_ON         = 0.0    # score lissé au-dessus → anomalie (0 = seuil de contamination du modèle)
+ANOMALY_OFF        = -0.02  # score lissé en dessous → fin d'anomalie (hystérésis)
+
+# --- Moteur statistique en ligne (analysis/streaming.py, ANOMALY_ENGINE = "stats") ---
+STATS_BUCKETS        = 24     # tranches de l'heure du jour, chacune avec ses moyennes/covariances
+STATS_MEMORY         = 10000  # échantillons par tranche : au-delà, oubli exponentiel (suit les saisons)
+STATS_MIN_SAMPLES    = 1800   # échantillons avant de noter avec une tranche (1 h à 2 s ; globale : × STATS_BUCKETS)
+STATS_THRESHOLD      = 4.0    # distance de Mahalanobis → score 0 (≈ χ² 4 ddl à 99.7 %)
+STATS_RESIDUAL_ALPHA = 0.02   # EWMA des résidus (dérives lentes)
+STATS_LEARN_GATE     = 2.0    # au-delà de GATE × THRESHOLD, échantillon appris ramené à cette distance
+STATS_STATE_PATH     = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anomaly_stats.npz")
+STATS_SAVE_INTERVAL  = 600    # s entre deux sauvegardes de l'état appris (thread, hors boucle de contrôle)
+STATS_ON             = 0.0    # score lissé au-dessus → anomalie (distance moyenne de la fenêtre > THRESHOLD)
+STATS_OFF            = -0.2   # score lissé en dessous → fin d'anomalie (normal : -0.55 ± 0.1, plus large que la forêt)
+
+# --- Database (write-behind) ---
+DB_BATCH_SIZE     = 30    # lignes max avant un commit groupé
+DB_FLUSH_INTERVAL = 60    # secondes max entre deux commits (fenêtre de durabilité)
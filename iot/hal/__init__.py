@@ -0,0 +1,64 @@
+"""
+Couche d'abstraction matérielle (HAL).
+
+Capteurs et actionneurs n'importent jamais RPi.GPIO / smbus / adafruit_dht /
+RPLCD directement : ils passent par les fonctions ci-dessous, qui délèguent
+au backend choisi dans config.py (HAL_BACKEND) :
+
+    "rpi" → hal.rpi.RpiBackend      (matériel réel)
+    "sim" → hal.simulated.SimBackend (PCF8591, relais, PWM, LCD, DHT11 simulés,
+                                      horloge virtuelle si HAL_VIRTUAL_CLOCK)
+
+set_backend() permet d'injecter un backend (benchmarks, rejeu) avant de
+construire les capteurs et actionneurs.
+"""
+from config import HAL_BACKEND, HAL_VIRTUAL_CLOCK, HAL_SIM_SEED
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if HAL_BACKEND == "sim":
+            from hal.clocks import VirtualClock
+            from hal.simulated import SimBackend
+            _backend = SimBackend(clock=VirtualClock() if HAL_VIRTUAL_CLOCK else None, seed=HAL_SIM_SEED)
+        else:
+            from hal.rpi import RpiBackend
+            _backend = RpiBackend()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+def gpio():
+    """Module compatible RPi.GPIO."""
+    return get_backend().gpio
+
+
+def i2c_bus(bus_id=1):
+    """Bus compatible smbus.SMBus (partagé)."""
+    return get_backend().i2c_bus(bus_id)
+
+
+def reset_i2c_bus(bus_id=1):
+    get_backend().reset_i2c_bus(bus_id)
+
+
+def dht11(pin):
+    """Capteur compatible adafruit_dht.DHT11."""
+    return get_backend().dht11(pin)
+
+
+def char_lcd(address, port, cols, rows):
+    """Écran compatible RPLCD.i2c.CharLCD (PCF8574)."""
+    return get_backend().char_lcd(address, port, cols, rows)
+
+
+def clock():
+    """Horloge du backend (SystemClock ou VirtualClock)."""
+    return get_backend().clock
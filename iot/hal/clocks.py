@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class SystemClock:
+    """Horloge réelle (module time)."""
+
+    virtual = False
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def perf_counter_ns(self):
+        return time.perf_counter_ns()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Horloge virtuelle : sleep() avance le temps instantanément.
+
+    Permet d'exécuter des heures de fonctionnement en quelques secondes.
+    monotonic() et time() partagent la même origine (epoch en secondes).
+    À utiliser depuis un seul thread : les composants qui voient
+    `clock.virtual` évitent de lancer leurs propres threads.
+    """
+
+    virtual = True
+
+    def __init__(self, start=None):
+        self._now  = time.time() if start is None else float(start)
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self._now
+
+    def time(self):
+        return self._now
+
+    def perf_counter_ns(self):
+        return int(self._now * 1e9)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.advance(seconds)
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += seconds
@@ -0,0 +1,52 @@
+from hal.clocks import SystemClock
+
+
+class RpiBackend:
+    """
+    Backend matériel réel : RPi.GPIO, smbus, adafruit_dht, RPLCD.
+
+    Les modules sont importés une seule fois, au premier usage ; une
+    ImportError remonte à l'appelant (capteur / actionneur) qui la journalise.
+    """
+
+    name = "rpi"
+
+    def __init__(self):
+        self.clock = SystemClock()
+        self._gpio = None
+        self._buses = {}
+
+    @property
+    def gpio(self):
+        if self._gpio is None:
+            import RPi.GPIO as GPIO
+            self._gpio = GPIO
+        return self._gpio
+
+    def i2c_bus(self, bus_id=1):
+        if bus_id not in self._buses:
+            import smbus
+            self._buses[bus_id] = smbus.SMBus(bus_id)
+        return self._buses[bus_id]
+
+    def reset_i2c_bus(self, bus_id=1):
+        """Réouvre le bus au prochain i2c_bus() (après une erreur I/O)."""
+        self._buses.pop(bus_id, None)
+
+    def dht11(self, pin):
+        import board
+        import adafruit_dht
+        return adafruit_dht.DHT11(getattr(board, f"D{pin}"))
+
+    def char_lcd(self, address, port, cols, rows):
+        from RPLCD.i2c import CharLCD
+        return CharLCD(
+            i2c_expander='PCF8574',
+            address=address,
+            port=port,
+            cols=cols,
+            rows=rows,
+            dotsize=8,
+            auto_linebreaks=True,   # évite les problèmes de curseur
+            backlight_enabled=True,
+        )
@@ -0,0 +1,396 @@
+import math
+import random
+import time
+from config import ADC_ADDRESS, PIN_LDR_RC, PIN_PUMP, RAIN_ADC_CHANNEL, PIN_SOIL, PIN_LDR
+from hal.clocks import SystemClock
+
+SIM_LCD_ADDRESS = 0x27        # seule adresse LCD qui répond en simulation
+I2C_BYTE_TIME   = 9 / 100000  # s par octet (8 bits + ACK) à 100 kHz
+
+
+class GardenModel:
+    """
+    Environnement simulé déterministe (graine fixe), fonction de l'heure
+    de l'horloge et de l'état des actionneurs :
+
+      - température / humidité de l'air : cycle journalier + bruit
+      - lumière : 0 la nuit, maximum à 12h (canal ADC + temps de charge RC)
+      - sol (canal pluie A0, 255 = sec) : sèche lentement, se mouille
+        quand le relais de la pompe est fermé (GPIO LOW = pompe ON)
+    """
+
+    DRY_RATE   = 0.02   # ADC/s quand la pompe est arrêtée
+    WATER_RATE = 1.5    # ADC/s quand la pompe tourne
+
+    def __init__(self, clock, gpio, rng, soil_adc=120.0):
+        self.clock    = clock
+        self.gpio     = gpio
+        self.rng      = rng
+        self.soil_adc = soil_adc
+        self._last    = clock.monotonic()
+
+    def _hour(self):
+        t = time.localtime(self.clock.time())
+        return t.tm_hour + t.tm_min / 60.0 + t.tm_sec / 3600.0
+
+    def pump_on(self):
+        return (self.gpio.modes.get(PIN_PUMP) == self.gpio.OUT
+                and self.gpio.levels.get(PIN_PUMP) == self.gpio.LOW)
+
+    def step(self):
+        """Intègre l'évolution du sol depuis le dernier appel."""
+        now = self.clock.monotonic()
+        dt, self._last = max(0.0, now - self._last), now
+        rate = -self.WATER_RATE if self.pump_on() else self.DRY_RATE
+        self.soil_adc = min(255.0, max(0.0, self.soil_adc + rate * dt))
+
+    def daylight(self):
+        """0 (nuit) → 1 (midi)."""
+        return max(0.0, math.sin(math.pi * (self._hour() - 6) / 12))
+
+    def temperature(self):
+        return 22 + 6 * math.sin(2 * math.pi * (self._hour() - 9) / 24) + self.rng.gauss(0, 0.3)
+
+    def humidity(self):
+        return 65 - 15 * math.sin(2 * math.pi * (self._hour() - 9) / 24) + self.rng.gauss(0, 1.0)
+
+    def adc_channels(self):
+        """Valeurs brutes 0-255 des canaux A0-A3 du PCF8591."""
+        self.step()
+        soil  = self.soil_adc + self.rng.gauss(0, 1.0)
+        light = 20 + 220 * self.daylight() + self.rng.gauss(0, 2.0)
+        values = [128] * 4
+        values[RAIN_ADC_CHANNEL] = soil
+        values[PIN_SOIL]         = soil * 0.9
+        values[PIN_LDR]          = light
+        return [int(min(255, max(0, round(v)))) for v in values]
+
+    def rc_charge_time(self):
+        """Temps de charge RC (s) : plus sombre → plus long."""
+        return 0.004 * (1 + 3 * (1 - self.daylight()))
+
+
+class SimPwm:
+    """Canal PWM simulé (API RPi.GPIO.PWM)."""
+
+    def __init__(self, gpio, pin, frequency):
+        self.gpio      = gpio
+        self.pin       = pin
+        self.frequency = frequency
+        self.duty      = 0
+        self.running   = False
+        self.changes   = 0
+
+    def start(self, duty):
+        self.running = True
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+        self.changes += 1
+        self.gpio.writes += 1
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SimGpio:
+    """
+    Remplaçant de RPi.GPIO (mêmes constantes et fonctions).
+
+    Modélise un circuit RC : après setup(pin, IN), l'entrée passe à HIGH
+    quand le temps de charge de la broche est écoulé. wait_for_edge()
+    dort jusqu'au front (pas de boucle active), comme le noyau sur un Pi.
+
+        gpio = SimGpio()
+        gpio.set_rc_charge_time(27, 0.004)   # 4 ms de charge
+        sensor = LightSensor(gpio=gpio, adc=...)
+    """
+
+    BCM, BOARD = 11, 10
+    OUT, IN    = 0, 1
+    LOW, HIGH  = 0, 1
+    RISING, FALLING, BOTH = 31, 32, 33
+    PUD_OFF, PUD_DOWN, PUD_UP = 20, 21, 22
+
+    def __init__(self, clock=None):
+        self.clock     = clock or SystemClock()
+        self.mode      = None
+        self.modes     = {}    # pin → OUT / IN
+        self.levels    = {}    # pin → niveau écrit (sorties)
+        self.pwms      = {}    # pin → SimPwm
+        self.writes    = 0     # écritures GPIO / PWM (compteur)
+        self.rc_charge_time = {}   # pin → secondes (ou callable) jusqu'au front montant
+        self.missed_edges   = {}   # pin → nombre de prochains fronts manqués par wait_for_edge()
+        self._input_since   = {}   # pin → instant du passage en entrée
+
+    # ── API RPi.GPIO ──────────────────────────────────────────────
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        self.modes[pin] = direction
+        if direction == self.IN:
+            self._input_since[pin] = self.clock.monotonic()
+        elif initial is not None:
+            self.levels[pin] = initial
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+        self.writes += 1
+
+    def input(self, pin):
+        if self.modes.get(pin) == self.IN and pin in self.rc_charge_time:
+            return self.HIGH if self._time_to_high(pin) <= 0 else self.LOW
+        return self.levels.get(pin, self.LOW)
+
+    def wait_for_edge(self, pin, edge, timeout=None, bouncetime=None):
+        """Retourne `pin` au front montant, None si `timeout` (ms) expire."""
+        remaining = self._time_to_high(pin)
+        if remaining is not None and self.missed_edges.get(pin):
+            # Front passé pendant l'armement : l'attente expire, entrée déjà HIGH
+            self.missed_edges[pin] -= 1
+            remaining = None
+        if remaining is None or (timeout is not None and remaining > timeout / 1000.0):
+            self.clock.sleep(timeout / 1000.0 if timeout is not None else 0)
+            return None
+        self.clock.sleep(remaining)
+        return pin
+
+    def PWM(self, pin, frequency):
+        pwm = SimPwm(self, pin, frequency)
+        self.pwms[pin] = pwm
+        return pwm
+
+    def cleanup(self, pin=None):
+        if pin is None:
+            self.modes.clear()
+            self.levels.clear()
+        else:
+            self.modes.pop(pin, None)
+            self.levels.pop(pin, None)
+
+    # ── Simulation ────────────────────────────────────────────────
+
+    def set_rc_charge_time(self, pin, seconds):
+        """Temps de charge du condensateur (valeur ou callable sans argument)."""
+        self.rc_charge_time[pin] = seconds
+
+    def miss_edges(self, pin, count=1):
+        """Les `count` prochains wait_for_edge() sur `pin` manquent le front (course à l'armement)."""
+        self.missed_edges[pin] = self.missed_edges.get(pin, 0) + count
+
+    def _time_to_high(self, pin):
+        if self.modes.get(pin) != self.IN or pin not in self.rc_charge_time:
+            return None
+        charge  = self.rc_charge_time[pin]
+        charge  = charge() if callable(charge) else charge
+        elapsed = self.clock.monotonic() - self._input_since[pin]
+        return max(0.0, charge - elapsed)
+
+
+class SimPcf8591:
+    """
+    PCF8591 simulé : chaque lecture retourne la conversion précédente puis
+    lance la suivante ; l'auto-incrément (bit 0x04) passe au canal suivant.
+    """
+
+    def __init__(self, channels_fn):
+        self.channels_fn = channels_fn
+        self.control     = 0x00
+        self._last       = 0x80   # valeur à la mise sous tension
+
+    def write_byte(self, value):
+        self.control = value
+
+    def read_byte(self):
+        result     = self._last
+        channel    = self.control & 0x03
+        self._last = self.channels_fn()[channel]
+        if self.control & 0x04:
+            self.control = (self.control & ~0x03) | ((channel + 1) & 0x03)
+        return result
+
+    def read_block(self, command, length):
+        self.write_byte(command)
+        return [self.read_byte() for _ in range(length)]
+
+
+class SimI2cBus:
+    """Bus I2C simulé (API smbus) : compte transactions et octets, consomme le temps de transfert."""
+
+    def __init__(self, clock):
+        self.clock        = clock
+        self.devices      = {}
+        self.transactions = 0
+        self.bytes        = 0
+
+    def attach(self, address, device):
+        self.devices[address] = device
+
+    def _device(self, address, nbytes):
+        if address not in self.devices:
+            raise OSError(121, "Remote I/O error")
+        self.transactions += 1
+        self.bytes        += nbytes
+        self.clock.sleep(nbytes * I2C_BYTE_TIME)
+        return self.devices[address]
+
+    def write_byte(self, address, value):
+        self._device(address, 2).write_byte(value)
+
+    def read_byte(self, address):
+        return self._device(address, 2).read_byte()
+
+    def read_i2c_block_data(self, address, command, length=32):
+        return self._device(address, 3 + length).read_block(command, length)
+
+    def close(self):
+        pass
+
+
+class SimCharLcd:
+    """
+    LCD HD44780 derrière un expandeur PCF8574 (API RPLCD CharLCD).
+
+    Garde le contenu de l'écran et compte les octets I2C : en mode 4 bits,
+    chaque caractère ou commande = 2 quartets × 3 écritures = 6 octets.
+    clear() et home() sont des commandes lentes (1,52 ms).
+    """
+
+    BYTES_PER_TRANSFER = 6
+    SLOW_COMMAND_TIME  = 0.00152
+
+    def __init__(self, cols, rows, clock):
+        self.cols, self.rows = cols, rows
+        self.clock     = clock
+        self.framebuffer = [[" "] * cols for _ in range(rows)]
+        self._cursor   = (0, 0)
+        self.backlight_enabled = True
+        self.i2c_bytes = 0
+        self.commands  = 0
+        self.chars     = 0
+
+    def _transfer(self, slow=False, count=1):
+        self.i2c_bytes += self.BYTES_PER_TRANSFER * count
+        self.clock.sleep(count * self.BYTES_PER_TRANSFER * I2C_BYTE_TIME + (self.SLOW_COMMAND_TIME if slow else 0))
+
+    def clear(self):
+        self.commands += 1
+        self._transfer(slow=True)
+        self.framebuffer = [[" "] * self.cols for _ in range(self.rows)]
+        self._cursor = (0, 0)
+
+    def home(self):
+        self.commands += 1
+        self._transfer(slow=True)
+        self._cursor = (0, 0)
+
+    @property
+    def cursor_pos(self):
+        return self._cursor
+
+    @cursor_pos.setter
+    def cursor_pos(self, value):
+        self.commands += 1
+        self._transfer()
+        self._cursor = (value[0] % self.rows, value[1] % self.cols)
+
+    def write_string(self, text):
+        row, col = self._cursor
+        self.chars += len(text)
+        self._transfer(count=len(text))   # une attente pour toute la chaîne
+        for ch in text:
+            self.framebuffer[row][col] = ch
+            col += 1
+            if col >= self.cols:            # auto_linebreaks
+                row, col = (row + 1) % self.rows, 0
+        self._cursor = (row, col)
+
+    def text(self):
+        """Contenu affiché, une chaîne par ligne."""
+        return ["".join(r) for r in self.framebuffer]
+
+    def close(self, clear=False):
+        if clear:
+            self.clear()
+
+
+class SimDht11:
+    """DHT11 simulé (API adafruit_dht) : valeurs entières, échecs de lecture aléatoires (graine fixe)."""
+
+    READ_TIME = 0.025   # s — durée d'une trame DHT11
+
+    def __init__(self, model, rng, clock, failure_rate=0.1):
+        self.model        = model
+        self.rng          = rng
+        self.clock        = clock
+        self.failure_rate = failure_rate
+        self._temperature = None
+        self._humidity    = None
+
+    def measure(self):
+        self.clock.sleep(self.READ_TIME)
+        if self.rng.random() < self.failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        self._temperature = int(round(self.model.temperature()))
+        self._humidity    = int(round(self.model.humidity()))
+
+    @property
+    def temperature(self):
+        self.measure()
+        return self._temperature
+
+    @property
+    def humidity(self):
+        if self._humidity is None:
+            self.measure()
+        return self._humidity
+
+    def exit(self):
+        pass
+
+
+class SimBackend:
+    """
+    Backend simulé complet : GPIO (relais, PWM, RC), bus I2C avec PCF8591,
+    LCD PCF8574 et DHT11, tous branchés sur le même GardenModel.
+
+    clock : SystemClock (temps réel, défaut) ou VirtualClock (accéléré).
+    """
+
+    name = "sim"
+
+    def __init__(self, clock=None, seed=0, dht_failure_rate=0.1):
+        self.clock = clock or SystemClock()
+        self.rng   = random.Random(seed)
+        self.gpio  = SimGpio(self.clock)
+        self.model = GardenModel(self.clock, self.gpio, self.rng)
+        self.gpio.set_rc_charge_time(PIN_LDR_RC, self.model.rc_charge_time)
+        self.bus   = SimI2cBus(self.clock)
+        self.bus.attach(ADC_ADDRESS, SimPcf8591(self.model.adc_channels))
+        self.lcds  = {}
+        self.dht_failure_rate = dht_failure_rate
+
+    def i2c_bus(self, bus_id=1):
+        return self.bus
+
+    def reset_i2c_bus(self, bus_id=1):
+        pass
+
+    def dht11(self, pin):
+        return SimDht11(self.model, self.rng, self.clock, self.dht_failure_rate)
+
+    def char_lcd(self, address, port, cols, rows):
+        if address != SIM_LCD_ADDRESS:
+            raise OSError(121, "Remote I/O error")
+        lcd = SimCharLcd(cols, rows, self.clock)
+        self.lcds[address] = lcd
+        return lcd
@@ -1,4 +1,6 @@
-from config import SOIL_MOISTURE_LOW
+import datetime
+import hal
+from config import SOIL_MOISTURE_LOW, DHT_MAX_AGE
 from utils.logger import logger
 
 
@@ -9,22 +11,31 @@ class AlertManager:
     """
     _FAIL_THRESHOLD = 5
 
-    def __init__(self, leds, lcd):
+    def __init__(self, leds, lcd, clock=None):
         self.leds        = leds
         self.lcd         = lcd
         self._fail_count = 0
+        self._clock      = clock or hal.clock()
 
-    def update(self, temp, hum, rain_pct, rain_digital, is_dark, has_anomaly=False):
+    def update(self, temp, hum, rain_pct, rain_digital, is_dark, has_anomaly=False, dht_age=None):
         """
         rain_digital : 0 = pluie détectée, 1 = sec
         is_dark      : True = nuit → lampe allumée
-        has_anomaly  : True = Erreur critique détectée par l'IA
+        has_anomaly  : True = Erreur critique détectée par l'IA (drapeau lissé, avec hystérésis)
+        dht_age      : âge (s) de la dernière lecture DHT11 valide
         """
-        has_anomaly = False
         # ── Erreur capteur ────────────────────────────────────────────
-        if temp is None or hum is None:
+        stale = dht_age is not None and dht_age > DHT_MAX_AGE
+        if temp is None or hum is None or stale:
             self._fail_count += 1
-            if self._fail_count >= self._FAIL_THRESHOLD:
+            if stale:
+                # L'âge intègre déjà la persistance de la panne
+                logger.error("Alert: DHT11 stale (%.0fs)!", dht_age)
+                self.leds.set('red', True)
+                self.leds.set('green', False)
+                self.leds.set('orange', False)
+                self.lcd.display("ERROR", f"E02: DHT11 {dht_age:.0f}s")
+            elif self._fail_count >= self._FAIL_THRESHOLD:
                 logger.error("Alert: DHT11 Failure!")
                 self.leds.set('red', True)
                 self.leds.set('green', False)
@@ -36,7 +47,7 @@ class AlertManager:
 
         # ── Anomalie IA ──────────────────────────────────────────────
         if has_anomaly:
-            #self.leds.set('red', True)
+            self.leds.set('red', True)
             self.leds.set('green', False)
             self.leds.set('orange', False)
             self.lcd.display("ALERTE CRITIQUE", "Anomalie IA !")
@@ -70,8 +81,7 @@ class AlertManager:
                 self.leds.set('green', True)
                 water_status_msg = "Sol: Parfait"
 
-        import datetime
-        current_time = datetime.datetime.now().strftime("%H:%M")
+        current_time = datetime.datetime.fromtimestamp(self._clock.time()).strftime("%H:%M")
         
         self.lcd.display(
             f"{current_time} T:{temp}C",
@@ -0,0 +1,180 @@
+import json
+import threading
+from collections import deque
+from time import perf_counter_ns
+import hal
+from config import (TOPIC_COMMANDS_WATER, TOPIC_COMMANDS_LIGHT,
+                    COMMAND_MAX_WATERING, COMMAND_LIGHT_DURATION, COMMAND_DEDUP)
+from utils.logger import logger
+from utils.metrics import metrics
+
+# commande → (topic attendu, actionneur : une seule commande en attente par actionneur)
+COMMANDS = {
+    "START_WATERING": (TOPIC_COMMANDS_WATER, "pump"),
+    "STOP_WATERING":  (TOPIC_COMMANDS_WATER, "pump"),
+    "SET_INTENSITY":  (TOPIC_COMMANDS_LIGHT, "light"),
+}
+
+
+class CommandError(ValueError):
+    """Commande refusée à la validation (message renvoyé à l'émetteur)."""
+
+
+def _number(data, key, default, low, high):
+    value = data.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+        raise CommandError(f"{key} doit être un nombre entre {low} et {high}")
+    return value
+
+
+class CommandDispatcher:
+    """
+    Commandes MQTT (arrosage, éclairage) exécutées dans la boucle de contrôle.
+
+    submit() est appelé par le thread réseau de paho : il valide le message,
+    ignore un `id` déjà reçu (renvoi QoS 1, double clic) et met la commande en
+    attente ; une commande plus récente pour le même actionneur remplace
+    celle qui attend (statut "superseded"). Rien n'y touche aux actionneurs.
+
+    drain() est appelé par ControlPipeline au début de chaque cycle, dans le
+    batch actuators.outputs : les commandes en attente sont exécutées par le
+    thread de contrôle, comme les décisions automatiques.
+
+    Chaque commande reçoit une réponse via `reply(dict)` (TOPIC_COMMANDS_REPLY) :
+
+        {"id", "command", "status": "done" | "ignored" | "superseded"
+         | "duplicate" | "rejected", "error"?, "queue_ms", "latency_ms"?}
+
+    queue_ms : réception → exécution (histogramme command.queue) ;
+    latency_ms : horodatage `ts` (ms epoch) de l'émetteur → exécution, si
+    fourni (histogramme command.latency, horloges supposées synchronisées).
+
+    Format d'une commande : {"command", "id"?, "ts"?, ...paramètres}.
+    """
+
+    def __init__(self, irrigation, lighting, reply=None):
+        self.irrigation = irrigation
+        self.lighting   = lighting
+        self.reply      = reply          # fonction(dict), ex. MqttClient.publish_command_result
+        self._pending   = {}             # actionneur → commande (dict)
+        self._lock      = threading.Lock()
+        self._seen      = set()          # COMMAND_DEDUP derniers id reçus
+        self._seen_fifo = deque()
+        self._clock     = hal.clock()
+
+    # ── Thread réseau ─────────────────────────────────────────────────
+
+    def submit(self, topic, payload):
+        """Valide et met en attente une commande reçue sur `topic`."""
+        received = perf_counter_ns()
+        data = {}
+        try:
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                raise CommandError("objet JSON attendu")
+            cmd = self._validate(topic, data)
+        except (ValueError, TypeError) as e:   # JSON invalide ou CommandError
+            metrics.incr("command.rejected")
+            logger.warning(f"[CMD] Refusée ({e}) : {payload!r:.200}")
+            self._reply(data if isinstance(data, dict) else {}, "rejected", error=str(e))
+            return
+        cmd["received"] = received
+        logger.info(f"[CMD] {cmd['command']} {data}")
+
+        with self._lock:
+            duplicate  = cmd["id"] is not None and cmd["id"] in self._seen
+            superseded = None
+            if not duplicate:
+                self._remember(cmd["id"])
+                superseded = self._pending.get(cmd["slot"])
+                self._pending[cmd["slot"]] = cmd
+        if duplicate:
+            metrics.incr("command.duplicate")
+            self._reply(cmd, "duplicate")
+        elif superseded is not None:
+            metrics.incr("command.superseded")
+            self._reply(superseded, "superseded")
+
+    def _remember(self, cmd_id):
+        if cmd_id is None:
+            return
+        self._seen.add(cmd_id)
+        self._seen_fifo.append(cmd_id)
+        if len(self._seen_fifo) > COMMAND_DEDUP:
+            self._seen.discard(self._seen_fifo.popleft())
+
+    def _validate(self, topic, data):
+        command = data.get("command")
+        if command not in COMMANDS:
+            raise CommandError(f"commande inconnue : {command!r}")
+        expected, slot = COMMANDS[command]
+        if topic != expected:
+            raise CommandError(f"{command} attendue sur {expected}")
+        cmd_id = data.get("id")
+        if cmd_id is not None and (not isinstance(cmd_id, (str, int)) or len(str(cmd_id)) > 64):
+            raise CommandError("id invalide")
+        cmd = {"command": command, "id": cmd_id, "slot": slot, "ts": data.get("ts")}
+        if command == "START_WATERING":
+            cmd["duration"] = _number(data, "duration", 10, 1, COMMAND_MAX_WATERING)
+        elif command == "SET_INTENSITY":
+            cmd["value"]    = int(_number(data, "value", None, 0, 100))
+            cmd["duration"] = _number(data, "duration", COMMAND_LIGHT_DURATION, 1, 86400)
+        return cmd
+
+    # ── Thread de contrôle ────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self._pending)
+
+    def drain(self):
+        """Exécute les commandes en attente (boucle de contrôle). Retourne leur nombre."""
+        if not self._pending:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for cmd in pending.values():
+            try:
+                executed = self._execute(cmd)
+            except Exception as e:
+                metrics.incr("command.errors")
+                logger.error(f"[CMD] Erreur: {e}")
+                self._reply(cmd, "rejected", error=str(e))
+                continue
+            metrics.incr("command.done" if executed else "command.ignored")
+            self._reply(cmd, "done" if executed else "ignored")
+        return len(pending)
+
+    def _execute(self, cmd):
+        """Applique la commande. Retourne False si elle était sans objet (pompe déjà arrêtée…)."""
+        command = cmd["command"]
+        if command == "START_WATERING":
+            return self.irrigation.start_watering_manual(cmd["duration"])
+        if command == "STOP_WATERING":
+            return self.irrigation.stop_watering_manual()
+        self.lighting.set_manual(cmd["value"], cmd["duration"])
+        return True
+
+    def _reply(self, cmd, status, error=None):
+        cmd_id = cmd.get("id")
+        if not isinstance(cmd_id, (str, int)) or len(str(cmd_id)) > 64:
+            cmd_id = None   # commande refusée : id non renvoyé tel quel
+        result = {"id": cmd_id, "command": cmd.get("command"), "status": status}
+        if error:
+            result["error"] = error
+        received = cmd.get("received")
+        if received is not None:
+            queued = perf_counter_ns() - received
+            result["queue_ms"] = round(queued / 1e6, 3)
+            if status in ("done", "ignored"):
+                metrics.observe("command.queue", queued)
+                sent = cmd.get("ts")
+                if isinstance(sent, (int, float)) and not isinstance(sent, bool):
+                    latency = self._clock.time() * 1000 - sent
+                    if latency >= 0:   # horloges désynchronisées : latence non mesurable
+                        result["latency_ms"] = round(latency, 1)
+                        metrics.observe("command.latency", int(latency * 1e6))
+        if self.reply is not None:
+            try:
+                self.reply(result)
+            except Exception as e:
+                logger.error(f"[CMD] Réponse impossible — {e}")
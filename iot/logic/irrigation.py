@@ -1,12 +1,14 @@
-import threading
+import hal
 from config import SOIL_MOISTURE_LOW, SOIL_MOISTURE_HIGH
 from utils.logger import logger
 
 class IrrigationManager:
-    def __init__(self, pump):
+    def __init__(self, pump, clock=None):
         self.pump = pump
         self.is_watering = False
         self.manual_override = False
+        self._clock = clock or hal.clock()
+        self._manual_until = None   # end of manual watering, checked by check() on the control thread
 
     def check(self, moisture_level):
         """
@@ -16,6 +18,8 @@ class IrrigationManager:
         - No change if in between
         """
         if self.manual_override:
+            if self._manual_until is not None and self._clock.monotonic() >= self._manual_until:
+                self._stop_manual_watering()
             return  # Skip automatic check during manual operation
 
         if moisture_level is None:
@@ -23,47 +27,51 @@ class IrrigationManager:
 
         if moisture_level < SOIL_MOISTURE_LOW:
             if not self.is_watering:
-                logger.info(f"Irrigation: Soil too dry ({moisture_level}% < {SOIL_MOISTURE_LOW}%). Pump ON.")
+                logger.info("Irrigation: Soil too dry (%s%% < %s%%). Pump ON.", moisture_level, SOIL_MOISTURE_LOW)
                 self.pump.on()
                 self.is_watering = True
         
         elif moisture_level > SOIL_MOISTURE_HIGH:
             if self.is_watering:
-                logger.info(f"Irrigation: Soil moist enough ({moisture_level}% > {SOIL_MOISTURE_HIGH}%). Pump OFF.")
+                logger.info("Irrigation: Soil moist enough (%s%% > %s%%). Pump OFF.", moisture_level, SOIL_MOISTURE_HIGH)
                 self.pump.off()
                 self.is_watering = False
         
         else:
             # In hysteresis zone (deadband), maintain current state
-            logger.debug(f"Irrigation: In range ({moisture_level}%). Pump remains {'ON' if self.is_watering else 'OFF'}.")
+            logger.debug("Irrigation: In range (%s%%). Pump remains %s.", moisture_level, 'ON' if self.is_watering else 'OFF')
 
     def start_watering_manual(self, duration):
-        """Starts watering for a specific duration in a separate thread."""
+        """
+        Starts watering for a specific duration; check() stops it once the
+        deadline is reached. Returns False if the pump was already running.
+        """
         if self.is_watering:
             logger.warning("Irrigation: Pump is already running.")
-            return
+            return False
 
         logger.info(f"Irrigation: Starting manual watering for {duration} seconds.")
         self.manual_override = True
         self.pump.on()
         self.is_watering = True
-
-        # Non-blocking timer
-        timer = threading.Timer(duration, self._stop_manual_watering)
-        timer.start()
+        self._manual_until = self._clock.monotonic() + duration
+        return True
 
     def _stop_manual_watering(self):
         logger.info("Irrigation: Manual watering finished.")
         self.pump.off()
         self.is_watering = False
         self.manual_override = False
+        self._manual_until = None
 
     def stop_watering_manual(self):
         """Immediately stops a running manual watering cycle (STOP_WATERING command)."""
         if not self.is_watering:
             logger.warning("Irrigation: Pump is not running, nothing to stop.")
-            return
+            return False
         logger.info("Irrigation: Manual stop requested via MQTT.")
         self.pump.off()
         self.is_watering = False
         self.manual_override = False
+        self._manual_until = None
+        return True
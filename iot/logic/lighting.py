@@ -1,32 +1,32 @@
 import datetime
-import threading
+import hal
 from config import LIGHT_SCHEDULE_HIGH_START, LIGHT_SCHEDULE_MED_START, LIGHT_SCHEDULE_OFF_START
 from utils.logger import logger
 
 class LightingManager:
-    def __init__(self, grow_light):
+    def __init__(self, grow_light, clock=None):
         self.grow_light = grow_light
         self.manual_override = False
-        self._timer = None
+        self._clock = clock or hal.clock()
+        self._manual_until = None   # fin de dérogation, vérifiée par check() (thread de contrôle)
 
     def set_manual(self, intensity, duration=3600):
         """Active l'éclairage manuel pour une durée (défaut: 1 heure)."""
         logger.info(f"Lighting: Commande manuelle reçue → {intensity}% pour {duration}s")
         self.manual_override = True
         self.grow_light.set_intensity(intensity)
-
-        if self._timer:
-            self._timer.cancel()
-        self._timer = threading.Timer(duration, self._clear_manual)
-        self._timer.start()
+        self._manual_until = self._clock.monotonic() + duration
 
     def _clear_manual(self):
         logger.info("Lighting: Fin de la dérogation manuelle. Retour au mode Auto.")
         self.manual_override = False
+        self._manual_until = None
         self.check() # forcer la mise à jour immédiate
 
     def check(self):
         if self.manual_override:
+            if self._manual_until is not None and self._clock.monotonic() >= self._manual_until:
+                self._clear_manual()
             return  # Ignorer le planning automatique si forcé manuellement
 
         """
@@ -35,7 +35,7 @@ class LightingManager:
         - 12h → 17h : Après-midi (Modéré) → lampe ON (50%)
         - 17h → 5h : Nuit (OFF) → lampe OFF (0%)
         """
-        hour = datetime.datetime.now().hour
+        hour = datetime.datetime.fromtimestamp(self._clock.time()).hour
 
         if 5 <= hour < 12:
             intensity = 100
@@ -48,6 +48,6 @@ class LightingManager:
             mode = "Nuit (OFF)"
 
         if self.grow_light.intensity != intensity:
-            logger.info(f"Lighting: {hour}h → {mode} → {intensity}%")
+            logger.info("Lighting: %sh → %s → %s%%", hour, mode, intensity)
             self.grow_light.set_intensity(intensity)
 
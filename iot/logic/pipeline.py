@@ -0,0 +1,128 @@
+from time import perf_counter_ns
+from actuators.outputs import outputs
+from config import DHT_MAX_AGE
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class ControlPipeline:
+    """
+    Étapes de contrôle d'un cycle, à partir des valeurs capteurs :
+    éclairage, IA anomalie, arrosage, alertes LEDs/LCD, base de données,
+    publication MQTT.
+
+    Partagé par main.py (valeurs de l'ordonnanceur) et replay.py (valeurs
+    d'une trace enregistrée), pour que le rejeu exerce exactement le même code.
+
+    Les commandes d'actionneurs des étapes 0 à 4 sont regroupées dans un
+    batch actuators.outputs : seules les transitions réelles sont écrites, en
+    un commit, avant la base de données et MQTT. L'étape 0 exécute les
+    commandes MQTT reçues depuis le cycle précédent (logic/commands.py) : les
+    gestionnaires et les actionneurs ne sont modifiés que par ce thread.
+
+    Le score IA lissé est enregistré avec chaque lecture et publié sur
+    TOPIC_SENSORS_ANOMALY à chaque fenêtre évaluée ; les changements du
+    drapeau d'anomalie sont publiés sur TOPIC_ALERTS.
+
+    Chaque étape est chronométrée dans utils.metrics (histogrammes
+    "stage.<étape>").
+    """
+
+    def __init__(self, grow_light, pump, irrigation, lighting, alerts, anomaly, db, mqtt_client, commands=None):
+        self.grow_light  = grow_light
+        self.pump        = pump
+        self.irrigation  = irrigation
+        self.lighting    = lighting
+        self.alerts      = alerts
+        self.anomaly     = anomaly
+        self.db          = db
+        self.mqtt_client = mqtt_client
+        self.commands    = commands   # CommandDispatcher (None : pas de commandes, ex. rejeu)
+        self._anomaly    = False   # drapeau IA du cycle précédent (fronts → alertes)
+
+    def step(self, sample_ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark):
+        """Exécute un cycle. Retourne True si l'IA a détecté une anomalie."""
+        logger.info("T:%s°C H:%s%% (âge %s) Pluie:%s%% Lux:%s Nuit:%s",
+                    temp, hum, "-" if dht_age is None else f"{dht_age:.1f}s", rain_pct, lux, is_dark)
+
+        # Valeur DHT11 périmée → traitée comme absente (IA, base de données)
+        if dht_age is not None and dht_age > DHT_MAX_AGE:
+            fresh_temp, fresh_hum = None, None
+        else:
+            fresh_temp, fresh_hum = temp, hum
+
+        with outputs.batch():
+            has_anomaly = self._control(temp, hum, fresh_temp, fresh_hum, dht_age,
+                                        rain_pct, rain_digital, lux, is_dark)
+            t0 = perf_counter_ns()
+        t1 = perf_counter_ns()   # commit des transitions à la sortie du batch
+        metrics.observe("stage.outputs", t1 - t0)
+
+        # 5. Sauvegarde
+        self.db.save_reading(fresh_temp, fresh_hum, rain_pct, lux, None, ts=sample_ts,
+                             anomaly_score=self.anomaly.score)
+        t0 = perf_counter_ns()
+        metrics.observe("stage.db", t0 - t1)
+
+        # 6. Publication MQTT
+        self.mqtt_client.publish_sensors(
+            temp=temp,         hum=hum,
+            lux=lux,           is_dark=is_dark,
+            light_intensity=self.grow_light.intensity,
+            rain_pct=rain_pct, rain_digital=rain_digital,
+            pump_on=self.pump.is_on, ts=sample_ts
+        )
+        if self.anomaly.scored:   # une publication par fenêtre évaluée
+            self.mqtt_client.publish_anomaly(self.anomaly.score, self.anomaly.raw_score, has_anomaly)
+        if has_anomaly != self._anomaly:
+            self._anomaly = has_anomaly
+            if has_anomaly:
+                self.mqtt_client.publish_alert(f"Anomalie IA (score {self.anomaly.score:.3f})", "error")
+            else:
+                self.mqtt_client.publish_alert("Fin d'anomalie IA", "info")
+        metrics.observe("stage.mqtt", perf_counter_ns() - t0)
+        return has_anomaly
+
+    def _control(self, temp, hum, fresh_temp, fresh_hum, dht_age, rain_pct, rain_digital, lux, is_dark):
+        """Étapes 0 à 4 (décisions d'actionneurs). Retourne has_anomaly."""
+        t0 = perf_counter_ns()
+        # 0. Commandes MQTT en attente (arrosage / éclairage manuels)
+        if self.commands is not None and self.commands.drain():
+            t1 = perf_counter_ns()
+            metrics.observe("stage.commands", t1 - t0)
+            t0 = t1
+        # 1. Éclairage
+        if self.lighting.manual_override:
+            self.lighting.check()   # Mode manuel : seule l'expiration de la dérogation est vérifiée
+        elif is_dark:
+            if self.grow_light.intensity != 100:
+                self.grow_light.set_intensity(100)
+        else:
+            self.lighting.check()
+        t1 = perf_counter_ns()
+        metrics.observe("stage.lighting", t1 - t0)
+
+        # Conversion de la valeur ADC pluie brute (255=sec, 0=eau) en % d'humidité du sol
+        virtual_moisture = ((255.0 - rain_pct) / 255.0) * 100.0
+
+        # 2. IA anomalie (score par fenêtre, lissé, drapeau avec hystérésis)
+        # Le modèle est entraîné sur l'ADC pluie brut, comme stocké en base
+        was_anomaly = self.anomaly.is_anomaly
+        has_anomaly = self.anomaly.update(fresh_temp, fresh_hum, rain_pct, lux)
+        if has_anomaly and not was_anomaly:
+            logger.warning("Anomalie IA détectée! (score %.3f)", self.anomaly.score)
+        elif was_anomaly and not has_anomaly:
+            logger.info("Anomalie IA terminée (score %.3f)", self.anomaly.score)
+        t0 = perf_counter_ns()
+        metrics.observe("stage.anomaly", t0 - t1)
+
+        # 3. Pompe et Arrosage Automatique
+        self.irrigation.check(virtual_moisture)
+        t1 = perf_counter_ns()
+        metrics.observe("stage.irrigation", t1 - t0)
+
+        # 4. Alertes LEDs + LCD
+        self.alerts.update(temp, hum, rain_pct, rain_digital, is_dark, has_anomaly, dht_age)
+        t0 = perf_counter_ns()
+        metrics.observe("stage.alerts", t0 - t1)
+        return has_anomaly
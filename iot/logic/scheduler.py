@@ -0,0 +1,189 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+import hal
+from config import SCHEDULER_WORKERS
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class Sample:
+    """Dernière valeur d'une source, avec son heure d'acquisition."""
+    __slots__ = ("value", "ts", "monotonic", "duration")
+
+    def __init__(self, value, ts, monotonic, duration):
+        self.value     = value       # valeur retournée par la fonction de lecture
+        self.ts        = ts          # epoch ms (début de la lecture)
+        self.monotonic = monotonic   # clock.monotonic() (début de la lecture)
+        self.duration  = duration    # s
+
+
+class _Source:
+    def __init__(self, name, read_fn, interval):
+        self.name     = name
+        self.read_fn  = read_fn
+        self.interval = interval
+        self.next_due = None
+        self.running  = False
+        self.ready    = threading.Event()
+        self.runs     = 0
+        self.misses   = 0    # échéances sautées (lecture précédente encore en cours / retard)
+        self.overruns = 0    # lectures plus longues que l'intervalle
+        self.errors   = 0
+        self.last_duration = 0.0
+        self.max_duration  = 0.0
+        self.metric        = f"sensor.{name}"   # histogramme utils.metrics (temps CPU réel)
+
+
+class SensorScheduler:
+    """
+    Ordonnanceur multi-cadence des capteurs.
+
+    Chaque source a son propre intervalle et des échéances absolues
+    (t0 + k * intervalle), donc aucune dérive ne s'accumule. Les lectures
+    tournent en parallèle dans un petit pool de threads ; une source dont la
+    lecture précédente n'est pas terminée saute son échéance (comptée comme
+    `misses`). La boucle de contrôle consomme snapshot(), qui contient la
+    valeur la plus récente de chaque source.
+
+    Avec une horloge virtuelle (HAL simulé), pas de thread ni de pool :
+    la boucle appelle run_pending() à chaque itération et les lectures dues
+    sont faites dans le thread appelant.
+    """
+
+    def __init__(self, max_workers=SCHEDULER_WORKERS, clock=None):
+        self._clock    = clock or hal.clock()
+        self._sources  = {}
+        self._samples  = {}
+        self._lock     = threading.Lock()
+        self._wakeup   = threading.Event()
+        self._stop     = threading.Event()
+        self._thread   = None
+        self._pool     = None
+        if not self._clock.virtual:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sensor")
+
+    def add_source(self, name, read_fn, interval):
+        """Enregistre une source : read_fn() est appelée toutes les `interval` secondes."""
+        self._sources[name] = _Source(name, read_fn, interval)
+
+    # ── Cycle de vie ──────────────────────────────────────────────
+
+    def start(self):
+        now = self._clock.monotonic()
+        for source in self._sources.values():
+            source.next_due = now
+        if self._clock.virtual:
+            self.run_pending()
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=False)
+
+    def wait_ready(self, timeout=None):
+        """Attend une première valeur de chaque source. Retourne True si toutes sont prêtes."""
+        if self._clock.virtual:
+            return all(source.ready.is_set() for source in self._sources.values())
+        deadline = None if timeout is None else self._clock.monotonic() + timeout
+        for source in self._sources.values():
+            remaining = None if deadline is None else max(0.0, deadline - self._clock.monotonic())
+            if not source.ready.wait(remaining):
+                return False
+        return True
+
+    # ── Dispatch ──────────────────────────────────────────────────
+
+    def _due_sources(self):
+        """Sources dont l'échéance est atteinte (marquées en cours), échéances avancées."""
+        now = self._clock.monotonic()
+        due = []
+        for source in self._sources.values():
+            if now < source.next_due:
+                continue
+            # Échéances entières déjà dépassées (ex. pool saturé) → manquées
+            late = int((now - source.next_due) // source.interval)
+            with self._lock:
+                busy = source.running
+                if busy:
+                    source.misses += 1 + late
+                else:
+                    source.misses += late
+                    source.running = True
+            if not busy:
+                due.append(source)
+            source.next_due += (late + 1) * source.interval
+        return due
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            for source in self._due_sources():
+                self._pool.submit(self._run, source)
+
+            now = self._clock.monotonic()
+            next_due = min(s.next_due for s in self._sources.values()) if self._sources else now + 1
+            self._wakeup.wait(max(0.0, next_due - now))
+            self._wakeup.clear()
+
+    def run_pending(self):
+        """Lit, dans le thread appelant, les sources arrivées à échéance (horloge virtuelle)."""
+        for source in self._due_sources():
+            self._run(source)
+
+    def _run(self, source):
+        start_mono = self._clock.monotonic()
+        start_ts   = int(self._clock.time() * 1000)
+        start_ns   = perf_counter_ns()
+        try:
+            value = source.read_fn()
+        except Exception as e:
+            with self._lock:
+                source.errors += 1
+                source.running = False
+            metrics.incr("sensor_errors")
+            logger.error(f"Scheduler: lecture '{source.name}' échouée: {e}")
+            return
+        metrics.observe(source.metric, perf_counter_ns() - start_ns)
+        duration = self._clock.monotonic() - start_mono
+        with self._lock:
+            self._samples[source.name] = Sample(value, start_ts, start_mono, duration)
+            source.runs         += 1
+            source.running       = False
+            source.last_duration = duration
+            source.max_duration  = max(source.max_duration, duration)
+            if duration > source.interval:
+                source.overruns += 1
+        source.ready.set()
+        if duration > source.interval:
+            logger.warning(f"Scheduler: '{source.name}' a pris {duration:.2f}s (> {source.interval}s)")
+
+    # ── Consommation ──────────────────────────────────────────────
+
+    def snapshot(self):
+        """Retourne {nom: Sample} avec la valeur la plus récente de chaque source."""
+        with self._lock:
+            return dict(self._samples)
+
+    def stats(self):
+        """Compteurs par source : lectures, échéances manquées, dépassements, erreurs."""
+        with self._lock:
+            return {
+                s.name: {
+                    "interval":      s.interval,
+                    "runs":          s.runs,
+                    "misses":        s.misses,
+                    "overruns":      s.overruns,
+                    "errors":        s.errors,
+                    "last_duration": s.last_duration,
+                    "max_duration":  s.max_duration,
+                }
+                for s in self._sources.values()
+            }
@@ -1,8 +1,12 @@
-import time
-import json
+from time import perf_counter_ns
+_IMPORT_START = perf_counter_ns()   # durée des imports : phase "imports" du démarrage
+
 import threading
+import hal
 from config import (LOOP_INTERVAL, PIN_PUMP, PIN_GROW_LIGHT,
-                    PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED)
+                    PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED,
+                    SENSOR_INTERVALS, TRACE_PATH, METRICS_INTERVAL,
+                    STARTUP_LAZY, RC_CALIBRATION_PATH)
 from utils.logger import logger
 
 from sensors.temperature import TemperatureSensor
@@ -13,134 +17,179 @@ from actuators.pump import Pump
 from actuators.grow_light import GrowLight
 from actuators.leds import Leds
 from actuators.lcd import Lcd
-from utils.database import DatabaseManager
-from analysis.inference import AnomalyDetector
+from utils.database import DatabaseManager, epoch_ms
+from utils.trace import TraceWriter
+from utils.metrics import metrics, PhaseTimer
+from analysis.inference import create_detector   # numpy / modèle : chargés par load_model()
 
 from logic.lighting import LightingManager
 from logic.alert_manager import AlertManager
 from logic.irrigation import IrrigationManager
+from logic.scheduler import SensorScheduler
+from logic.pipeline import ControlPipeline
+from logic.commands import CommandDispatcher
 
 from mqtt.client import MqttClient
 
+_IMPORTS_NS = perf_counter_ns() - _IMPORT_START
+
+
+def _latest(snapshot, name, default=None):
+    """Valeur la plus récente d'une source de l'ordonnanceur (ou `default`)."""
+    sample = snapshot.get(name)
+    return sample.value if sample is not None else default
 
-def main():
+
+def main(max_iterations=None):
+    """
+    Boucle principale. `max_iterations` borne le nombre de cycles (None =
+    infini) — utile avec le HAL simulé et son horloge virtuelle.
+
+    STARTUP_LAZY : le modèle IA se charge en arrière-plan (IA active dès
+    qu'il est prêt), MQTT se connecte dans le thread de paho et la
+    calibration RC mémorisée est appliquée puis revalidée en arrière-plan.
+    La durée de chaque phase jusqu'à la première lecture publiée est
+    loguée et enregistrée dans utils.metrics ("startup.<phase>").
+    """
+    startup = PhaseTimer(metrics, "startup")
+    startup.record("imports", _IMPORTS_NS)
     logger.info("=== Smart Garden — Démarrage ===")
+    clock = hal.clock()
+    lazy  = STARTUP_LAZY and not clock.virtual   # horloge virtuelle : pas de threads
 
     # ── GPIO : mode global avant toute initialisation matérielle ──────
-    if not __import__('config').MOCK_MODE:
-        try:
-            import RPi.GPIO as GPIO
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)   # éviter les warnings "already in use"
-            logger.info("GPIO: mode BCM activé")
-        except ImportError:
-            pass   # non-Pi (dev)
+    try:
+        GPIO = hal.gpio()
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)   # éviter les warnings "already in use"
+        logger.info(f"GPIO: mode BCM activé (HAL {hal.get_backend().name})")
+    except ImportError:
+        GPIO = None   # non-Pi (dev)
+    startup.mark("gpio")
 
     # ── Capteurs ───────────────────────────────────────────────────────
     temp_sensor  = TemperatureSensor()       # DHT11 → temp + humidité
     light_sensor = LightSensor()             # LDR ADC + RC → lux + is_dark
     rain_sensor  = WaterLevelSensor()        # Pluie ADC A0 + GPIO 17
+    startup.mark("sensors")
 
     # ── Actionneurs ────────────────────────────────────────────────────
     pump       = Pump(PIN_PUMP)              # GPIO 18 (relais actif-LOW)
     grow_light = GrowLight(PIN_GROW_LIGHT)   # GPIO 22
     leds       = Leds(PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED)
     lcd        = Lcd()
+    startup.mark("actuators")
 
     # ── Logique ────────────────────────────────────────────────────────
     irrigation = IrrigationManager(pump)
     lighting   = LightingManager(grow_light)
     alerts     = AlertManager(leds, lcd)
     db         = DatabaseManager()
-    anomaly    = AnomalyDetector()
+    anomaly    = create_detector(background=lazy)   # moteur : ANOMALY_ENGINE
+    startup.mark("logic")
 
     # ── MQTT ───────────────────────────────────────────────────────────
-    def command_callback(topic, payload):
-        try:
-            data    = json.loads(payload)
-            command = data.get('command')
-            logger.info(f"[CMD] {command} {data}")
-
-            if command == 'START_WATERING':
-                duration = data.get('duration', 10)
-                irrigation.start_watering_manual(duration)
-
-            elif command == 'STOP_WATERING':
-                irrigation.stop_watering_manual()
-
-            elif command == 'SET_INTENSITY':
-                # Force l'éclairage manuellement pour 1h (3600s)
-                lighting.set_manual(data.get('value', 0), 3600)
-
-        except Exception as e:
-            logger.error(f"[CMD] Erreur: {e}")
-
-    mqtt_client = MqttClient(command_callback)
-    mqtt_client.connect()
+    # Commandes validées par le thread réseau, exécutées en début de cycle par la boucle
+    commands = CommandDispatcher(irrigation, lighting)
+    mqtt_client = MqttClient(commands.submit)
+    commands.reply = mqtt_client.publish_command_result
+    mqtt_client.connect(blocking=not lazy)
+    startup.mark("mqtt")
+
+    pipeline = ControlPipeline(grow_light, pump, irrigation, lighting, alerts, anomaly, db, mqtt_client,
+                               commands)
+    recorder = None
+    if TRACE_PATH:
+        recorder = TraceWriter(TRACE_PATH)
+        logger.info(f"Trace: enregistrement des capteurs → {TRACE_PATH}")
 
     # ── Calibration RC lumière ─────────────────────────────────────────
-    logger.info("Calibration RC lumière (2 s)…")
-    light_sensor.calibrate_rc()
+    if STARTUP_LAZY:
+        light_sensor.start_calibration(RC_CALIBRATION_PATH)   # mémorisée, revalidée en arrière-plan
+    else:
+        logger.info("Calibration RC lumière (2 s)…")
+        light_sensor.calibrate_rc(RC_CALIBRATION_PATH)
+    startup.mark("rc_calibration")
+
+    # ── Ordonnanceur capteurs (cadence propre à chaque source) ─────────
+    scheduler = SensorScheduler()
+    scheduler.add_source("dht",   temp_sensor.read, SENSOR_INTERVALS["dht"])
+    scheduler.add_source("rain",  lambda: (rain_sensor.read(), rain_sensor._read_digital()),
+                         SENSOR_INTERVALS["rain"])
+    scheduler.add_source("light", lambda: (light_sensor.read(), light_sensor.is_dark),
+                         SENSOR_INTERVALS["light"])
+    scheduler.start()
+    if not scheduler.wait_ready(timeout=max(SENSOR_INTERVALS.values())):
+        logger.warning("Scheduler: certaines sources n'ont pas encore de valeur.")
+    startup.mark("sensors_ready")
 
     logger.info("Boucle principale démarrée.")
 
+    loop_overruns = 0
+    iterations    = 0
+    next_tick     = clock.monotonic()
+    next_metrics  = next_tick + METRICS_INTERVAL
     try:
-        while True:
-            # 1. Lire les capteurs
-            temp, hum    = temp_sensor.read()
-            lux          = light_sensor.read()       # met à jour is_dark
-            rain_pct     = rain_sensor.read()        # 0-100 %
-            rain_digital = rain_sensor._read_digital()  # 0=pluie, 1=sec
-
-            logger.info(f"T:{temp}°C H:{hum}% Pluie:{rain_pct}% Lux:{lux} Nuit:{light_sensor.is_dark}")
-
-            # 2. Éclairage
-            if lighting.manual_override:
-                pass # Mode manuel en cours, on ne touche à rien
-            elif light_sensor.is_dark:
-                if grow_light.intensity != 100:
-                    grow_light.set_intensity(100)
+        while max_iterations is None or iterations < max_iterations:
+            iterations += 1
+            loop_start  = perf_counter_ns()
+            if clock.virtual:
+                scheduler.run_pending()
+                lcd.poll()        # rotation des pages LCD (pas de thread de rendu)
+
+            # 1. Dernières valeurs capteurs (échantillonnées par l'ordonnanceur)
+            snapshot = scheduler.snapshot()
+            temp, hum, dht_age     = _latest(snapshot, "dht", (None, None, None))
+            lux, is_dark           = _latest(snapshot, "light", (0, False))
+            rain_pct, rain_digital = _latest(snapshot, "rain", (0, 1))  # 0-255, 0=pluie
+            if dht_age is not None:
+                dht_age += clock.monotonic() - snapshot["dht"].monotonic
+            # horodatage d'acquisition = échantillon le plus récent
+            sample_ts = max((s.ts for s in snapshot.values()), default=epoch_ms())
+
+            if recorder:
+                recorder.record(sample_ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark)
+
+            # 2. Contrôle : éclairage, IA, arrosage, alertes, base, MQTT
+            pipeline.step(sample_ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark)
+            metrics.observe("loop", perf_counter_ns() - loop_start)
+            if iterations == 1:
+                startup.mark("first_reading")
+                logger.info("Démarrage: %s (IA %s)", startup.report(),
+                            "prête" if anomaly.ready.is_set() else "en chargement")
+
+            # 3. Résumé des métriques (fenêtre de METRICS_INTERVAL s)
+            if clock.monotonic() >= next_metrics:
+                next_metrics += METRICS_INTERVAL
+                mqtt_client.publish_metrics(metrics.summary(reset=True))
+
+            # Échéance absolue : la durée du cycle ne s'ajoute pas à la période
+            next_tick += LOOP_INTERVAL
+            delay = next_tick - clock.monotonic()
+            if delay > 0:
+                clock.sleep(delay)
             else:
-                lighting.check()
-
-            # 3. IA anomalie
-            alert_msg = None
-            has_anomaly = anomaly.check(temp, hum, rain_pct, lux)
-            if has_anomaly:
-                logger.warning("Anomalie IA détectée!")
-                # leds.set('red', True)  # Désormais géré par alert_manager
-                alert_msg = {"message": "Anomalie IA détectée", "level": "error"}
-
-            # 4. Pompe et Arrosage Automatique
-            # Conversion de la valeur ADC pluie brute (255=sec, 0=eau) en % d'humidité du sol
-            virtual_moisture = ((255.0 - rain_pct) / 255.0) * 100.0
-            irrigation.check(virtual_moisture)
-
-            # 5. Alertes LEDs + LCD
-            alerts.update(temp, hum, rain_pct, rain_digital, light_sensor.is_dark, has_anomaly)
-
-            # 6. Sauvegarde
-            db.save_reading(temp, hum, rain_pct, lux, None)
-
-            # 5. Publication MQTT
-            mqtt_client.publish_sensors(
-                temp=temp,         hum=hum,
-                lux=lux,           is_dark=light_sensor.is_dark,
-                light_intensity=grow_light.intensity,
-                rain_pct=rain_pct, rain_digital=rain_digital,
-                pump_on=pump.is_on
-            )
-
-            time.sleep(LOOP_INTERVAL)
+                loop_overruns += 1
+                metrics.incr("loop_overruns")
+                logger.warning(f"Boucle: dépassement de {-delay:.2f}s ({loop_overruns} au total)")
+                next_tick = clock.monotonic()
 
     except KeyboardInterrupt:
         logger.info("Arrêt.")
+    finally:
+        scheduler.stop()
+        temp_sensor.stop()
         pump.cleanup()
         grow_light.cleanup()
         leds.set('green', False)
-        if not __import__('config').MOCK_MODE:
+        lcd.close()               # arrête le thread de rendu
+        mqtt_client.close()       # la file hors connexion reste sur disque
+        anomaly.close()           # moteur "stats" : sauvegarde l'état appris
+        db.close()                # vide le tampon d'écriture (write-behind)
+        if recorder:
+            recorder.close()
+        if GPIO is not None:
             try:
-                import RPi.GPIO as GPIO
                 GPIO.cleanup()
             except Exception:
                 pass
@@ -1,14 +1,50 @@
 import paho.mqtt.client as mqtt
 import json
+import re
+import threading
+import time
+from time import perf_counter_ns
 from config import (MQTT_BROKER, MQTT_PORT, MQTT_CLIENT_ID,
                     TOPIC_COMMANDS_WATER, TOPIC_COMMANDS_LIGHT,
-                    TOPIC_SENSORS_TEMP, TOPIC_SENSORS_LIGHT, TOPIC_SENSORS_WATER,
-                    TOPIC_ALERTS)
+                    TOPIC_SENSORS_ANOMALY, TOPIC_ALERTS, TOPIC_METRICS, TOPIC_COMMANDS_REPLY,
+                    TOPIC_STATE, TOPIC_SYNC_REQUEST, TOPIC_SYNC_REPLY, SNAPSHOT_INTERVAL,
+                    MQTT_OUTBOX_DIR, MQTT_OUTBOX_BATCH, MQTT_OUTBOX_RATE, MQTT_OUTBOX_ACK_TIMEOUT,
+                    MQTT_RECONNECT_MIN_DELAY, MQTT_RECONNECT_MAX_DELAY)
+from mqtt.outbox import Outbox
+from mqtt.publisher import Publisher
+from mqtt.snapshot import StateCache
+from mqtt.telemetry import TelemetryEncoder
 from utils.logger import logger
+from utils.metrics import metrics
+
+_CLIENT_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")   # id de client admis dans un topic de réponse
 
 
 class MqttClient:
-    def __init__(self, command_callback):
+    """
+    Client MQTT du jardin : commandes entrantes, publications capteurs,
+    anomalies, alertes et métriques.
+
+    Hors connexion (broker arrêté, Wi-Fi coupé), les publications sont
+    conservées dans une file sur disque (mqtt/outbox.py). À la reconnexion,
+    le thread "mqtt-outbox" les renvoie dans l'ordre, par lots QoS 1 de
+    MQTT_OUTBOX_BATCH au plus MQTT_OUTBOX_RATE messages/s ; tant que la file
+    n'est pas vide, les nouvelles publications y passent aussi (ordre
+    conservé). outbox_dir=None désactive la file (QoS 0 seul, comme avant).
+
+    Les publish_*() ne font qu'un ajout O(1) dans un Publisher
+    (mqtt/publisher.py) : sérialisation, paho et file sur disque sont dans
+    le thread "mqtt-publisher". Les valeurs capteurs, anomalies et métriques
+    en attente sont coalescées par topic ; les alertes, jamais.
+
+    Tableaux de bord : l'état courant et les SNAPSHOT_WINDOW dernières
+    trames (mqtt/snapshot.py) sont publiés en retained sur TOPIC_STATE à la
+    connexion puis toutes les SNAPSHOT_INTERVAL s ; une demande sur
+    TOPIC_SYNC_REQUEST reçoit les trames manquantes sur TOPIC_SYNC_REPLY/<id>.
+    Ni l'un ni l'autre ne passe par la file sur disque (toujours régénérés).
+    """
+
+    def __init__(self, command_callback, outbox_dir=MQTT_OUTBOX_DIR):
         try:
             self.client = mqtt.Client(
                 callback_api_version=mqtt.CallbackAPIVersion.VERSION1,
@@ -20,57 +56,235 @@ class MqttClient:
         self.client.on_connect    = self._on_connect
         self.client.on_message    = self._on_message
         self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish    = self._on_publish
         self.command_callback     = command_callback
+        self.telemetry            = TelemetryEncoder()
+        self.state                = StateCache(self.telemetry.boot)
+        self._state_ts            = None   # acquisition (ms) du dernier état publié
+        self.client.reconnect_delay_set(MQTT_RECONNECT_MIN_DELAY, MQTT_RECONNECT_MAX_DELAY)
+        self.connected            = False
+        self.outbox               = Outbox(outbox_dir) if outbox_dir else None
+        self._wake                = threading.Event()   # connexion ou nouveau message en file
+        self._stop                = threading.Event()
+        self._drainer             = None
+        self.publisher            = Publisher(self._send, overflow=self._store if self.outbox else None)
+        if self.outbox is not None:
+            metrics.gauge("outbox.pending_bytes", lambda: self.outbox.pending_bytes)
+
+    def connect(self, blocking=True):
+        """
+        blocking=False : la connexion (DNS, TCP, CONNACK) se fait dans le
+        thread réseau de paho ; les publications d'ici là vont dans la file.
 
-    def connect(self):
+        Si la première connexion échoue, paho réessaie en arrière-plan
+        (délai MQTT_RECONNECT_MIN_DELAY doublé jusqu'à MQTT_RECONNECT_MAX_DELAY),
+        comme après une déconnexion.
+        """
+        logger.info(f"MQTT: Connexion à {MQTT_BROKER}:{MQTT_PORT}…")
+        from config import MQTT_USERNAME, MQTT_PASSWORD
+        if MQTT_USERNAME and MQTT_PASSWORD:
+            self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
         try:
-            logger.info(f"MQTT: Connexion à {MQTT_BROKER}:{MQTT_PORT}…")
-            from config import MQTT_USERNAME, MQTT_PASSWORD
-            if MQTT_USERNAME and MQTT_PASSWORD:
-                self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
-            self.client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
-            self.client.loop_start()
+            if blocking:
+                self.client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+            else:
+                self.client.connect_async(MQTT_BROKER, MQTT_PORT, keepalive=60)
         except Exception as e:
-            logger.error(f"MQTT: Connexion échouée — {e}")
+            logger.error(f"MQTT: Connexion échouée — {e} (nouvel essai en arrière-plan)")
+            self.client.connect_async(MQTT_BROKER, MQTT_PORT, keepalive=60)
+        self.client.loop_start()
+        if self.outbox is not None and self._drainer is None:
+            self._drainer = threading.Thread(target=self._drain, name="mqtt-outbox", daemon=True)
+            self._drainer.start()
+
+    def close(self):
+        """Publie ce qui reste à envoyer, arrête le renvoi et la boucle réseau ; la file reste sur disque."""
+        self.publisher.close()
+        self._stop.set()
+        self._wake.set()
+        if self._drainer is not None:
+            self._drainer.join(timeout=MQTT_OUTBOX_ACK_TIMEOUT)
+        try:
+            self.client.loop_stop()
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self.outbox is not None:
+            self.outbox.close()
 
     def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logger.info("MQTT: Connecté.")
+            self.connected = True
             client.subscribe(TOPIC_COMMANDS_WATER)   # START/STOP_WATERING
             client.subscribe(TOPIC_COMMANDS_LIGHT)   # SET_INTENSITY
+            client.subscribe(TOPIC_SYNC_REQUEST)
+            if self.telemetry.mode == "frame":
+                # Décodage des trames par les clients (régénéré à chaque connexion, jamais mis en file)
+                self._send(*self.telemetry.schema(), retain=True, store=False)
+            # État retenu à jour, même vide (nouveau "b" : les clients oublient l'ancien démarrage)
+            self._send(TOPIC_STATE, self.state.snapshot, retain=True, store=False)
+            self._wake.set()
         else:
             logger.error(f"MQTT: code {rc}")
 
     def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
         if rc != 0:
             logger.warning(f"MQTT: Déconnexion inattendue (rc={rc})")
 
+    def _on_publish(self, client, userdata, mid):
+        self.publisher.acked(mid)
+
     def _on_message(self, client, userdata, msg):
         try:
-            self.command_callback(msg.topic, msg.payload.decode())
+            if msg.topic == TOPIC_SYNC_REQUEST:
+                self._on_sync(json.loads(msg.payload))
+            else:
+                self.command_callback(msg.topic, msg.payload.decode())
         except Exception as e:
             logger.error(f"MQTT: Erreur message — {e}")
 
+    def _on_sync(self, request):
+        """Demande de resynchronisation d'un tableau de bord : trames de seq > since (ou état complet)."""
+        client_id = str(request.get("id", ""))
+        if not _CLIENT_ID.fullmatch(client_id):
+            logger.warning("MQTT: demande de synchronisation ignorée (id invalide)")
+            return
+        since, boot = request.get("since"), request.get("b")
+        since = int(since) if isinstance(since, (int, float)) else None
+        metrics.incr("sync.requests")
+        # Construit par le thread de publication ; une seule réponse en attente par client
+        self.publisher.submit(f"{TOPIC_SYNC_REPLY}/{client_id}",
+                              lambda: self.state.snapshot(since, boot), store=False)
+
     # ── Publication ────────────────────────────────────────────────────
 
-    def publish_sensors(self, temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on=False):
-        self._publish(TOPIC_SENSORS_TEMP,  {"temperature": temp, "humidity": hum})
-        self._publish(TOPIC_SENSORS_LIGHT, {"light": lux, "is_dark": is_dark, "intensity": light_intensity})
-        self._publish(TOPIC_SENSORS_WATER, {
-            "rain_pct":     rain_pct,
-            "rain_digital": rain_digital,
-            "pump_on":      pump_on,
-        })
+    def publish_sensors(self, temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on=False,
+                        ts=None):
+        """Trame de télémétrie du cycle (TELEMETRY_MODE, voir mqtt/telemetry.py). ts : acquisition (ms)."""
+        if ts is None:
+            ts = int(time.time() * 1000)
+        for topic, payload in self.telemetry.messages(temp, hum, lux, is_dark, light_intensity,
+                                                      rain_pct, rain_digital, pump_on, ts):
+            self.publisher.submit(topic, payload)
+        self.state.add(self.telemetry.last_row)
+        if (self.connected and SNAPSHOT_INTERVAL
+                and (self._state_ts is None or ts - self._state_ts >= SNAPSHOT_INTERVAL * 1000)):
+            self._state_ts = ts
+            # Construit au dernier moment par le thread de publication (coalescé)
+            self.publisher.submit(TOPIC_STATE, self.state.snapshot, retain=True, store=False)
+
+    def publish_anomaly(self, score, raw_score, is_anomaly):
+        """Score IA lissé (> 0 = anomalie), score brut de la fenêtre et drapeau avec hystérésis."""
+        data = {
+            "score":   round(score, 4),
+            "raw":     round(raw_score, 4),
+            "anomaly": is_anomaly,
+        }
+        self.state.add_anomaly(data)
+        self._publish(TOPIC_SENSORS_ANOMALY, data)
 
     def publish_alert(self, message, level="info"):
-        self._publish(TOPIC_ALERTS, {"message": message, "level": level})
+        self._publish(TOPIC_ALERTS, {"message": message, "level": level}, coalesce=False)   # jamais perdue
+
+    def publish_command_result(self, result):
+        """Réponse à une commande (logic/commands.py) : jamais coalescée, inutile après une coupure."""
+        self._publish(TOPIC_COMMANDS_REPLY, result, coalesce=False, store=False)
 
-    def _publish(self, topic, data: dict):
+    def publish_metrics(self, summary):
+        """Résumé compact de utils.metrics (latences par étape + compteurs)."""
+        self._publish(TOPIC_METRICS, summary)
+
+    def _publish(self, topic, data: dict, coalesce=True, store=True):
+        self.publisher.submit(topic, data, coalesce=coalesce, store=store)   # sérialisé par le thread de publication
+
+    def _send(self, topic, payload, retain=False, store=True):
+        """
+        Envoi effectif (thread mqtt-publisher). payload : str/bytes, dict
+        (JSON) ou fonction qui le construit. Retourne le MQTTMessageInfo de
+        paho, ou None.
+        """
+        if not store and not self.connected:
+            # Snapshot, réponse : sans objet hors connexion (renvoyé à la reconnexion)
+            metrics.incr("publish.skipped")
+            logger.debug("MQTT: hors connexion, %s ignoré", topic)
+            return None
+        start = perf_counter_ns()
+        if callable(payload):
+            payload = payload()
+        if isinstance(payload, dict):
+            payload = json.dumps(payload)
+        outbox = self.outbox if store else None
+        if outbox is not None and (not self.connected or not outbox.empty()):
+            # Hors connexion, ou renvoi en cours : en file, derrière les messages en attente
+            self._store(topic, payload, retain)
+            metrics.observe("mqtt.publish", perf_counter_ns() - start)
+            return None
+        result = None
         try:
-            result = self.client.publish(topic, json.dumps(data), qos=0)
+            result = self.client.publish(topic, payload, qos=0, retain=retain)
             if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                metrics.incr("publish_errors")
                 logger.warning(f"MQTT: Publish rc={result.rc} → {topic}")
+                if outbox is not None:
+                    self._store(topic, payload, retain)
             else:
-                logger.debug(f"MQTT: → {topic}")
+                logger.debug("MQTT: → %s", topic)
         except Exception as e:
+            metrics.incr("publish_errors")
             logger.error(f"MQTT: Publish error — {e}")
+        metrics.observe("mqtt.publish", perf_counter_ns() - start)
+        return result
+
+    def _store(self, topic, payload, retain):
+        if isinstance(payload, dict):
+            payload = json.dumps(payload)
+        try:
+            self.outbox.append(topic, payload, retain)
+        except OSError as e:
+            metrics.incr("outbox.errors")
+            logger.error(f"MQTT outbox: écriture impossible — {e}")
+        self._wake.set()
+
+    # ── Renvoi de la file ─────────────────────────────────────────────
+
+    def _drain(self):
+        """Thread mqtt-outbox : renvoie la file par lots dès que le broker est joignable."""
+        while not self._stop.is_set():
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            while self.connected and not self._stop.is_set() and not self.outbox.empty():
+                start = time.monotonic()
+                if not self._send_batch():
+                    break   # pas d'accusé : nouvel essai au prochain réveil (ou reconnexion)
+                # Débit limité : un lot de MQTT_OUTBOX_BATCH au plus toutes les BATCH/RATE s
+                self._stop.wait(max(0.0, MQTT_OUTBOX_BATCH / MQTT_OUTBOX_RATE - (time.monotonic() - start)))
+
+    def _send_batch(self):
+        try:
+            batch, position = self.outbox.read_batch(MQTT_OUTBOX_BATCH)
+        except OSError as e:
+            logger.error(f"MQTT outbox: lecture impossible — {e}")
+            return False
+        if position is None:
+            return True
+        infos = []
+        for _, topic, payload, retain in batch:
+            info = self.client.publish(topic, payload, qos=1, retain=retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return False
+            infos.append(info)
+        # Point de reprise avancé seulement quand tout le lot est accusé (QoS 1)
+        deadline = time.monotonic() + MQTT_OUTBOX_ACK_TIMEOUT
+        for info in infos:
+            try:
+                info.wait_for_publish(timeout=max(0.0, deadline - time.monotonic()))
+            except (RuntimeError, ValueError):
+                return False
+            if not info.is_published():
+                logger.warning("MQTT outbox: lot non confirmé, nouvel essai")
+                return False
+        self.outbox.commit(position)
+        metrics.incr("outbox.sent", len(batch))
+        return True
@@ -0,0 +1,249 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from config import MQTT_OUTBOX_DIR, MQTT_OUTBOX_MAX_BYTES, MQTT_OUTBOX_SEGMENT_BYTES
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Enregistrement : crc32 u32 | longueur u32 | corps
+# corps : ts f64 (s epoch) | retain u8 | topic_len u16 | topic | payload
+_HEADER = struct.Struct("<II")
+_BODY   = struct.Struct("<dBH")
+CHECKPOINT = "checkpoint.json"
+
+
+class Outbox:
+    """
+    File d'attente sur disque des publications MQTT faites hors connexion
+    (store-and-forward), bornée, en segments append-only.
+
+    Les messages sont ajoutés dans l'ordre de publication (donc
+    d'horodatage) au segment courant, remplacé au-delà de `segment_bytes`.
+    Le point de reprise (segment, offset) du prochain message à envoyer est
+    enregistré dans checkpoint.json (remplacement atomique) après chaque lot
+    confirmé par le broker : un redémarrage reprend là où l'envoi s'était
+    arrêté, un lot non confirmé est renvoyé (doublons possibles, les trames
+    de télémétrie portent un numéro de séquence).
+
+    Au-delà de `max_bytes` en attente, les segments les plus anciens sont
+    supprimés (métrique outbox.evicted). Un enregistrement tronqué (coupure
+    de courant) en fin de segment est écarté à l'ouverture (CRC).
+
+    Aucun réseau ici : MqttClient décide quand stocker et vide la file.
+    """
+
+    def __init__(self, directory=MQTT_OUTBOX_DIR, max_bytes=MQTT_OUTBOX_MAX_BYTES,
+                 segment_bytes=MQTT_OUTBOX_SEGMENT_BYTES):
+        self.directory     = directory
+        self.max_bytes     = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock         = threading.Lock()
+        self._writer       = None
+        self._reader       = None   # fichier du segment en cours d'envoi, gardé ouvert entre deux lots
+        self._reader_segment = None
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".seg"))
+        self._next_segment = self._segments[-1] + 1 if self._segments else 0
+        self._read_segment, self._read_offset = self._load_checkpoint()
+        while self._segments and self._segments[0] < self._read_segment:
+            os.remove(self._path(self._segments.pop(0)))   # déjà envoyé (arrêt avant la suppression)
+        if self._segments:
+            self._repair(self._segments[-1])
+        self._pending = sum(os.path.getsize(self._path(s)) for s in self._segments) - self._read_offset
+        if self._pending:
+            logger.info("MQTT outbox: %d octets en attente (%d segments)", self._pending, len(self._segments))
+
+    # ── Fichiers ──────────────────────────────────────────────────────
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:012d}.seg")
+
+    def _load_checkpoint(self):
+        """(segment, offset) du prochain message à envoyer, cohérent avec les segments présents."""
+        first = self._segments[0] if self._segments else 0
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT)) as f:
+                data = json.load(f)
+            segment, offset = int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError):
+            return first, 0
+        if segment not in self._segments:
+            return first, 0   # segment déjà envoyé ou évincé
+        return segment, min(offset, os.path.getsize(self._path(segment)))
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT)
+        tmp  = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segment": self._read_segment, "offset": self._read_offset}, f)
+        os.replace(tmp, path)
+
+    def _repair(self, segment):
+        """Tronque le segment après le dernier enregistrement valide."""
+        path = self._path(segment)
+        with open(path, "rb") as f:
+            data = f.read()
+        end = 0
+        for _, next_offset in self._records(data, 0):
+            end = next_offset
+        if end < len(data):
+            logger.warning("MQTT outbox: %d octets invalides tronqués en fin de %s", len(data) - end, path)
+            with open(path, "r+b") as f:
+                f.truncate(end)
+
+    @staticmethod
+    def _decode(body):
+        ts, retain, topic_len = _BODY.unpack_from(body, 0)
+        topic_end = _BODY.size + topic_len
+        return ts, body[_BODY.size:topic_end].decode(), body[topic_end:], bool(retain)
+
+    @classmethod
+    def _records(cls, data, offset):
+        """Itère (enregistrement, offset suivant) à partir d'offset ; s'arrête au premier invalide."""
+        while offset + _HEADER.size <= len(data):
+            crc, length = _HEADER.unpack_from(data, offset)
+            start, end = offset + _HEADER.size, offset + _HEADER.size + length
+            if end > len(data) or zlib.crc32(data[start:end]) != crc:
+                return
+            yield cls._decode(data[start:end]), end
+            offset = end
+
+    @classmethod
+    def _read_record(cls, f):
+        """Enregistrement suivant de f et sa taille, ou None (fin, tronqué ou invalide)."""
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        crc, length = _HEADER.unpack(header)
+        body = f.read(length)
+        if len(body) < length or zlib.crc32(body) != crc:
+            return None
+        return cls._decode(body), _HEADER.size + length
+
+    # ── Écriture ──────────────────────────────────────────────────────
+
+    def append(self, topic, payload, retain=False, ts=None):
+        """Ajoute un message à la file (ts : horodatage de publication, s epoch)."""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        topic_bytes = topic.encode()
+        body   = _BODY.pack(time.time() if ts is None else ts, int(retain), len(topic_bytes)) + topic_bytes + payload
+        record = _HEADER.pack(zlib.crc32(body), len(body)) + body
+        with self._lock:
+            if self._writer is None or self._writer.tell() + len(record) > self.segment_bytes:
+                self._rotate()
+            self._writer.write(record)
+            self._writer.flush()
+            self._pending += len(record)
+            metrics.incr("outbox.stored")
+            while self._pending > self.max_bytes and len(self._segments) > 1:
+                self._evict_oldest()
+
+    def _rotate(self):
+        if self._writer is not None:
+            os.fsync(self._writer.fileno())
+            self._writer.close()
+            self._writer = None
+        segment = self._next_segment
+        self._next_segment += 1
+        self._segments.append(segment)
+        if len(self._segments) == 1:
+            self._read_segment, self._read_offset = segment, 0
+        self._writer = open(self._path(segment), "ab")
+
+    def _evict_oldest(self):
+        segment = self._segments.pop(0)
+        path = self._path(segment)
+        size = os.path.getsize(path)
+        self._close_reader(segment)
+        dropped = size - (self._read_offset if segment == self._read_segment else 0)
+        os.remove(path)
+        self._pending -= dropped
+        self._read_segment, self._read_offset = self._segments[0], 0
+        metrics.incr("outbox.evicted")
+        logger.warning("MQTT outbox: plein, segment le plus ancien supprimé (%d octets perdus)", dropped)
+
+    # ── Lecture ───────────────────────────────────────────────────────
+
+    @property
+    def pending_bytes(self):
+        return self._pending
+
+    def empty(self):
+        return self._pending <= 0
+
+    def _reader_at(self, segment, offset):
+        """Fichier du segment positionné à offset (pas de seek si la lecture continue le lot précédent)."""
+        if self._reader_segment != segment:
+            self._close_reader()
+            self._reader = open(self._path(segment), "rb")
+            self._reader_segment = segment
+        if self._reader.tell() != offset:
+            self._reader.seek(offset)
+        return self._reader
+
+    def _close_reader(self, segment=None):
+        if self._reader is not None and segment in (None, self._reader_segment):
+            self._reader.close()
+            self._reader, self._reader_segment = None, None
+
+    def read_batch(self, max_records):
+        """
+        Jusqu'à max_records messages (ts, topic, payload, retain) à partir du
+        point de reprise, et la position à passer à commit() une fois envoyés.
+        Seuls ces enregistrements sont lus (fichier gardé ouvert entre deux lots).
+        """
+        with self._lock:
+            if self._pending <= 0:
+                return [], None
+            segment, offset = self._read_segment, self._read_offset
+            f = self._reader_at(segment, offset)
+            batch, end = [], offset
+            while len(batch) < max_records:
+                record = self._read_record(f)
+                if record is None:
+                    break
+                batch.append(record[0])
+                end += record[1]
+            if not batch and segment != self._segments[-1]:
+                # Fin de segment (ou enregistrement corrompu) : passer au suivant
+                end = os.path.getsize(self._path(segment))
+            return batch, (segment, end)
+
+    def commit(self, position):
+        """Marque comme envoyés les messages jusqu'à `position` (retour de read_batch)."""
+        segment, offset = position
+        with self._lock:
+            if segment != self._read_segment:
+                return   # segment évincé entre-temps
+            self._pending -= offset - self._read_offset
+            self._read_offset = offset
+            if offset >= os.path.getsize(self._path(segment)):
+                if segment != self._segments[-1]:
+                    # Segment entièrement envoyé : suivant
+                    self._close_reader(segment)
+                    os.remove(self._path(self._segments.pop(0)))
+                    self._read_segment, self._read_offset = self._segments[0], 0
+                elif self._pending <= 0:
+                    # File vide : on repart d'un segment neuf au prochain ajout
+                    if self._writer is not None:
+                        self._writer.close()
+                        self._writer = None
+                    self._close_reader(segment)
+                    os.remove(self._path(self._segments.pop()))
+                    self._read_segment, self._read_offset = self._next_segment, 0
+            self._save_checkpoint()
+
+    def close(self):
+        with self._lock:
+            self._close_reader()
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._writer.close()
+                self._writer = None
+            self._save_checkpoint()
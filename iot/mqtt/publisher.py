@@ -0,0 +1,147 @@
+import threading
+from collections import deque
+from time import perf_counter_ns
+from config import MQTT_PUBLISH_QUEUE
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class Publisher:
+    """
+    Publication MQTT hors de la boucle de contrôle.
+
+    submit() ne fait qu'un ajout O(1) sous verrou ; le thread
+    "mqtt-publisher" appelle `send(topic, payload, retain, store)` (paho,
+    file hors connexion si store) pour chaque message, dans l'ordre de
+    soumission.
+
+      - coalesce=True (capteurs, anomalie, métriques) : une seule valeur en
+        attente par topic ; une valeur plus récente remplace la précédente
+        à sa place dans la file (compteur publish.coalesced) : un lien lent
+        ne publie jamais de relevés périmés derrière des plus récents ;
+      - coalesce=False (alertes) : chaque message est conservé. Si la file
+        bornée (`max_queue`) est pleine, il est mis de côté et le thread de
+        publication le confie à `overflow` (file sur disque) avant le message
+        suivant (compteur publish.spilled ; au-delà de `max_queue` mis de
+        côté, perdu) ; une valeur coalescible est alors ignorée (compteur
+        publish.dropped).
+
+    Métriques : jauge mqtt.queue_depth, compteurs publish.coalesced /
+    publish.dropped, histogrammes mqtt.queue_wait (soumission → appel paho)
+    et mqtt.ack (soumission → on_publish de paho, voir acked()).
+    """
+
+    def __init__(self, send, max_queue=MQTT_PUBLISH_QUEUE, overflow=None):
+        self._send      = send
+        self.max_queue  = max_queue
+        self._overflow  = overflow
+        self._order     = deque()   # topic (coalescible) ou (topic, payload, retain, store, t0)
+        self._latest    = {}        # topic → [payload, retain, store, t0] en attente
+        self._spilled   = deque()   # (topic, payload, retain) pour overflow, file pleine
+        self._cond      = threading.Condition()
+        self._acks      = {}        # mid paho → t0, jusqu'à on_publish
+        self._early     = set()     # on_publish reçu pendant send(), avant le retour de publish()
+        self._sending   = False     # send() en cours dans le thread de publication
+        self._ack_lock  = threading.Lock()
+        self._stopping  = False
+        metrics.gauge("mqtt.queue_depth", lambda: len(self._order))
+        self._thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._order)
+
+    def submit(self, topic, payload, retain=False, coalesce=True, store=True):
+        t0 = perf_counter_ns()
+        with self._cond:
+            if coalesce:
+                pending = self._latest.get(topic)
+                if pending is not None:
+                    pending[:] = payload, retain, store, t0
+                    metrics.incr("publish.coalesced")
+                    return
+                if len(self._order) >= self.max_queue:
+                    metrics.incr("publish.dropped")
+                    return
+                self._latest[topic] = [payload, retain, store, t0]
+                self._order.append(topic)
+            else:
+                if len(self._order) >= self.max_queue:
+                    if self._overflow is None or len(self._spilled) >= self.max_queue:
+                        metrics.incr("publish.dropped")
+                        logger.error("MQTT: file de publication pleine, message perdu → %s", topic)
+                        return
+                    # Écriture sur disque par le thread de publication, pas ici
+                    self._spilled.append((topic, payload, retain))
+                    metrics.incr("publish.spilled")
+                else:
+                    self._order.append((topic, payload, retain, store, t0))
+            self._cond.notify()
+
+    def _spill(self, spilled):
+        for topic, payload, retain in spilled:
+            try:
+                self._overflow(topic, payload, retain)
+            except Exception as e:
+                logger.error(f"MQTT: file de publication pleine, message perdu → {topic} ({e})")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._order and not self._spilled and not self._stopping:
+                    self._cond.wait()
+                spilled, item = None, None
+                if self._spilled:
+                    spilled, self._spilled = self._spilled, deque()
+                elif not self._order:
+                    return   # arrêt demandé, file vidée
+                else:
+                    item = self._order.popleft()
+                    if isinstance(item, str):
+                        payload, retain, store, t0 = self._latest.pop(item)
+                        topic = item
+                    else:
+                        topic, payload, retain, store, t0 = item
+            if spilled:
+                self._spill(spilled)
+                continue
+            metrics.observe("mqtt.queue_wait", perf_counter_ns() - t0)
+            with self._ack_lock:
+                self._sending = True
+            info = None
+            try:
+                info = self._send(topic, payload, retain, store)
+            except Exception as e:
+                logger.error(f"MQTT: erreur de publication — {e}")
+            mid = getattr(info, "mid", None)
+            with self._ack_lock:
+                # Accusés reçus pendant send() : au plus le nôtre, les autres
+                # (file hors connexion, envois directs) ne sont pas à nous
+                self._sending, early, self._early = False, self._early, set()
+                if mid is None:
+                    continue
+                if mid not in early:
+                    self._acks[mid] = t0
+                    if len(self._acks) > 10 * self.max_queue:   # accusés jamais reçus (déconnexion)
+                        self._acks.clear()
+                    continue
+            metrics.observe("mqtt.ack", perf_counter_ns() - t0)
+
+    def acked(self, mid):
+        """À appeler depuis on_publish de paho : latence soumission → envoi/accusé."""
+        with self._ack_lock:
+            t0 = self._acks.pop(mid, None)
+            if t0 is None:
+                # Peut-être le message en cours d'envoi, accusé avant le retour de publish() ;
+                # sinon mid d'un autre émetteur (file hors connexion, _on_connect) : ignoré
+                if self._sending:
+                    self._early.add(mid)
+                return
+        metrics.observe("mqtt.ack", perf_counter_ns() - t0)
+
+    def close(self, timeout=5.0):
+        """Publie ce qui reste en file puis arrête le thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
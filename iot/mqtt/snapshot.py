@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+from itertools import islice
+from config import SNAPSHOT_WINDOW
+from mqtt.telemetry import JSON_KEYS
+
+SNAPSHOT_VERSION = 1
+_COLUMNS = tuple(key for key in JSON_KEYS if key != "b")   # s, t, T, H, … : clés courtes de la trame JSON
+
+
+class StateCache:
+    """
+    État courant du jardin et dernières trames, en mémoire, pour les
+    tableaux de bord qui se (re)connectent.
+
+    add() garde les SNAPSHOT_WINDOW dernières trames (anneau, O(1)) ;
+    snapshot() en fait un message compact, en colonnes à clés courtes :
+
+        {"v": 1, "b": boot, "s": dernier seq, "full": true,
+         "w": {"s": [...], "t": [...], "T": [...], ...},
+         "a": dernière anomalie, "A": [[t, score], ...]}
+
+    publié en retained sur TOPIC_STATE (un abonnement suffit pour avoir
+    l'état et les courbes), et en réponse à une demande de resynchronisation
+    {"since": seq, "b": boot} : seules les trames de seq > since sont alors
+    renvoyées ("full": false), sauf si `since` n'est plus dans l'anneau ou
+    vient d'un autre démarrage (`b`, identifiant porté par chaque trame) : fenêtre
+    complète, le client remplace ses courbes.
+
+    add() (boucle de contrôle) se contente d'un deque.append atomique ;
+    anomalies et snapshot() (threads MQTT) passent par un verrou.
+    """
+
+    def __init__(self, boot, window=SNAPSHOT_WINDOW):
+        self.boot      = boot                   # TelemetryEncoder.boot : celui des trames
+        self._frames   = deque(maxlen=window)   # trames à clés courtes
+        self._anomaly  = None                   # dernier message d'anomalie
+        self._scores   = deque(maxlen=window)   # (seq, t, score)
+        self._lock     = threading.Lock()
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def seq(self):
+        return self._frames[-1]["s"] if self._frames else 0
+
+    def add(self, row):
+        """row : trame à clés courtes (TelemetryEncoder.last_row), non modifiée ensuite."""
+        self._frames.append(row)   # deque.append est atomique
+
+    def add_anomaly(self, data):
+        """data : message d'anomalie du cycle, daté par la dernière trame."""
+        with self._lock:
+            last = self._frames[-1] if self._frames else {"s": 0, "t": int(time.time() * 1000)}
+            seq, ts = last["s"], last["t"]
+            self._anomaly = dict(data, t=ts)
+            self._scores.append((seq, ts, data.get("score")))
+
+    def snapshot(self, since=None, boot=None):
+        """Message d'état (dict) : complet, ou les trames postérieures à `since` du démarrage `boot`."""
+        with self._lock:
+            frames = self._frames
+            last   = frames[-1]["s"] if frames else 0
+            first  = frames[0]["s"] if frames else 1
+            full   = since is None or boot != self.boot or not first - 1 <= since <= last
+            if full:
+                rows, scores = list(frames), list(self._scores)
+            else:
+                # seq consécutifs dans l'anneau : position directe
+                rows   = list(islice(frames, since - first + 1, None))
+                scores = [score for score in self._scores if score[0] > since]
+            anomaly = self._anomaly
+        return {
+            "v": SNAPSHOT_VERSION, "b": self.boot, "s": last, "full": full,
+            "w": {key: [row.get(key) for row in rows] for key in _COLUMNS} if rows else {},
+            "a": anomaly,
+            "A": [[t, score] for _, t, score in scores],
+        }
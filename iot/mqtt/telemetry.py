@@ -0,0 +1,149 @@
+import json
+import struct
+import time
+from config import (TELEMETRY_MODE, TELEMETRY_ENCODING, TELEMETRY_LEGACY_INTERVAL,
+                    TOPIC_TELEMETRY, TOPIC_TELEMETRY_SCHEMA,
+                    TOPIC_SENSORS_TEMP, TOPIC_SENSORS_LIGHT, TOPIC_SENSORS_WATER)
+
+SCHEMA_VERSION = 2
+
+# Trame JSON : clés courtes → champs (publié dans le schéma)
+JSON_KEYS = {
+    "b": "boot", "s": "seq", "t": "ts", "T": "temperature", "H": "humidity", "L": "light",
+    "D": "is_dark", "I": "intensity", "R": "rain_pct", "W": "rain_digital", "P": "pump_on",
+}
+
+# Trame binaire (little-endian, 27 octets) :
+#   version u8 | seq u32 | boot u32 | ts u64 (ms) | temperature i16 (×10) | humidity u16 (×10)
+#   | light u16 (lux) | rain_pct u16 (ADC) | intensity u8 (%) | flags u8
+# flags : bit 0 is_dark, bit 1 rain_digital, bit 2 pump_on
+# Valeur absente : -32768 (i16), 65535 (u16), 255 (u8)
+# boot : identifiant du démarrage ; seq repart de 1 à chaque démarrage, un
+# client ne compare que des seq de même boot (trames d'avant un redémarrage
+# renvoyées par la file hors connexion).
+BINARY_FORMAT = "<BIIQhHHHBB"
+BINARY_FIELDS = ("version", "seq", "boot", "ts", "temperature", "humidity", "light", "rain_pct", "intensity",
+                 "flags")
+BINARY_SCALE  = {"temperature": 10, "humidity": 10}
+_FRAME = struct.Struct(BINARY_FORMAT)
+# Version 1 (sans boot, 23 octets) : encore décodée, la file hors connexion peut en contenir
+_FRAME_V1 = struct.Struct("<BIQhHHHBB")
+
+
+def _round(value, digits=None):
+    return None if value is None else round(value, digits)
+
+
+def _i16(value, scale=1):
+    return -32768 if value is None else max(-32767, min(32767, round(value * scale)))
+
+
+def _u16(value, scale=1):
+    return 65535 if value is None else max(0, min(65534, round(value * scale)))
+
+
+class TelemetryEncoder:
+    """
+    Messages capteurs d'un cycle, selon TELEMETRY_MODE :
+
+      - "frame"  : une trame par cycle sur TOPIC_TELEMETRY (numéro de
+        séquence + horodatage d'acquisition), en JSON compact à clés courtes
+        ou en binaire struct (TELEMETRY_ENCODING, schéma publié sur
+        TOPIC_TELEMETRY_SCHEMA). Les trois topics historiques restent publiés
+        toutes les TELEMETRY_LEGACY_INTERVAL s (compatibilité) ;
+      - "legacy" : les trois messages JSON historiques à chaque cycle.
+
+    Sans réseau ni paho : utilisé par MqttClient et par le substitut de replay.py.
+    """
+
+    def __init__(self, mode=TELEMETRY_MODE, encoding=TELEMETRY_ENCODING,
+                 legacy_interval=TELEMETRY_LEGACY_INTERVAL):
+        if mode not in ("frame", "legacy"):
+            raise ValueError(f"mode de télémétrie inconnu : {mode!r}")
+        if encoding not in ("json", "binary"):
+            raise ValueError(f"encodage de télémétrie inconnu : {encoding!r}")
+        self.mode            = mode
+        self.encoding        = encoding
+        self.legacy_interval = legacy_interval
+        self.seq             = 0
+        self.boot            = int(time.time() * 1000) & 0xFFFFFFFF   # identifiant opaque du démarrage
+        self.last_row        = None   # trame à clés courtes du dernier cycle (row())
+        self._legacy_ts      = None   # horodatage (ms) de la dernière publication historique
+
+    def schema(self):
+        """(topic, payload) du schéma de trame, à publier en retained."""
+        schema = {"version": SCHEMA_VERSION, "encoding": self.encoding, "topic": TOPIC_TELEMETRY}
+        if self.encoding == "json":
+            schema["keys"] = JSON_KEYS
+        else:
+            schema.update(format=BINARY_FORMAT, fields=BINARY_FIELDS, scale=BINARY_SCALE,
+                          flags=["is_dark", "rain_digital", "pump_on"],
+                          missing={"i16": -32768, "u16": 65535, "u8": 255})
+        return TOPIC_TELEMETRY_SCHEMA, json.dumps(schema, separators=(",", ":"))
+
+    def messages(self, temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on=False, ts=None):
+        """Liste de (topic, payload) à publier pour ce cycle. ts : acquisition (ms epoch)."""
+        if ts is None:
+            ts = int(time.time() * 1000)
+        # Numéroté dans les deux modes : l'état retenu (mqtt/snapshot.py) s'appuie sur seq
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.last_row = self.row(temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on, ts)
+        if self.mode == "legacy":
+            return self._legacy(temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on)
+
+        if self.encoding == "json":
+            payload = json.dumps(self.last_row, separators=(",", ":"))
+        else:
+            flags = bool(is_dark) | (bool(rain_digital) << 1) | (bool(pump_on) << 2)
+            payload = _FRAME.pack(SCHEMA_VERSION, self.seq, self.boot, int(ts), _i16(temp, 10), _u16(hum, 10),
+                                  _u16(lux), _u16(rain_pct),
+                                  255 if light_intensity is None else max(0, min(254, int(light_intensity))),
+                                  flags)
+        out = [(TOPIC_TELEMETRY, payload)]
+
+        if self.legacy_interval and (self._legacy_ts is None or ts - self._legacy_ts >= self.legacy_interval * 1000):
+            self._legacy_ts = ts
+            out += self._legacy(temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on)
+        return out
+
+    def row(self, temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on, ts):
+        """Trame JSON du dernier seq, en dict à clés courtes (JSON_KEYS)."""
+        # Même résolution que la trame binaire : 0,1 °C / 0,1 %, lux et ADC entiers
+        return {
+            "b": self.boot, "s": self.seq, "t": ts, "T": _round(temp, 1), "H": _round(hum, 1), "L": _round(lux),
+            "D": int(bool(is_dark)), "I": light_intensity, "R": _round(rain_pct), "W": rain_digital,
+            "P": int(bool(pump_on)),
+        }
+
+    @staticmethod
+    def _legacy(temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on):
+        return [
+            (TOPIC_SENSORS_TEMP,  json.dumps({"temperature": temp, "humidity": hum})),
+            (TOPIC_SENSORS_LIGHT, json.dumps({"light": lux, "is_dark": is_dark, "intensity": light_intensity})),
+            (TOPIC_SENSORS_WATER, json.dumps({
+                "rain_pct":     rain_pct,
+                "rain_digital": rain_digital,
+                "pump_on":      pump_on,
+            })),
+        ]
+
+
+def decode_frame(payload):
+    """Trame (JSON ou binaire) → dict aux noms de champs complets (outils, tests)."""
+    if isinstance(payload, (bytes, bytearray)) and payload[:1] != b"{":
+        if payload[0] == 1:
+            values = dict(zip((name for name in BINARY_FIELDS if name != "boot"), _FRAME_V1.unpack(payload)))
+            values["boot"] = None
+        else:
+            values = dict(zip(BINARY_FIELDS, _FRAME.unpack(payload)))
+        flags = values.pop("flags")
+        for name, size in (("temperature", "i16"), ("humidity", "u16"), ("light", "u16"), ("rain_pct", "u16")):
+            missing = -32768 if size == "i16" else 65535
+            value = values[name]
+            values[name] = None if value == missing else value / BINARY_SCALE.get(name, 1)
+        if values["intensity"] == 255:
+            values["intensity"] = None
+        values.update(is_dark=bool(flags & 1), rain_digital=(flags >> 1) & 1, pump_on=bool(flags & 4))
+        return values
+    data = json.loads(payload)
+    return {JSON_KEYS.get(key, key): value for key, value in data.items()}
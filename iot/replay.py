@@ -0,0 +1,235 @@
+"""
+Rejeu accéléré d'une trace capteurs à travers toute la chaîne de contrôle.
+
+    python replay.py traces/jardin.sgt.gz            # rejoue une trace enregistrée (TRACE_PATH)
+    python replay.py --generate 14 traces/2sem.sgt   # génère 14 jours avec le HAL simulé
+
+Le rejeu tourne sur le HAL simulé avec une horloge virtuelle calée sur les
+horodatages de la trace : IrrigationManager, LightingManager,
+détecteur d'anomalies (ANOMALY_ENGINE ou --engine, sans persistance),
+AlertManager, base de données (fichier temporaire par défaut) et un substitut MQTT qui sérialise les messages sans les envoyer.
+Aucune attente réelle : le débit (itérations/s) est affiché à la fin.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import hal
+from config import (ANOMALY_ENGINE, HAL_SIM_SEED, LOOP_INTERVAL, SENSOR_INTERVALS,
+                    TELEMETRY_MODE, TELEMETRY_ENCODING, SNAPSHOT_INTERVAL,
+                    PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED)
+from hal.clocks import VirtualClock
+from hal.simulated import SimBackend
+from utils.logger import logger
+from utils.trace import TraceWriter, read_trace
+
+
+class MqttStandIn:
+    """Remplace MqttClient : sérialise les messages (dont l'état retenu) comme _publish(), sans réseau."""
+
+    def __init__(self, telemetry=TELEMETRY_MODE, encoding=TELEMETRY_ENCODING):
+        from mqtt.telemetry import TelemetryEncoder
+        from mqtt.snapshot import StateCache
+        self.messages  = 0
+        self.bytes     = 0
+        self.telemetry = TelemetryEncoder(telemetry, encoding)
+        self.state     = StateCache(self.telemetry.boot)
+        self._state_ts = None
+
+    def connect(self):
+        pass
+
+    def publish_sensors(self, temp, hum, lux, is_dark, light_intensity, rain_pct, rain_digital, pump_on=False,
+                        ts=None):
+        for _, payload in self.telemetry.messages(temp, hum, lux, is_dark, light_intensity,
+                                                  rain_pct, rain_digital, pump_on, ts):
+            self._send(payload)
+        self.state.add(self.telemetry.last_row)
+        if SNAPSHOT_INTERVAL and (self._state_ts is None or ts - self._state_ts >= SNAPSHOT_INTERVAL * 1000):
+            self._state_ts = ts
+            self._publish(self.state.snapshot())
+
+    def publish_anomaly(self, score, raw_score, is_anomaly):
+        data = {"score": round(score, 4), "raw": round(raw_score, 4), "anomaly": is_anomaly}
+        self.state.add_anomaly(data)
+        self._publish(data)
+
+    def publish_alert(self, message, level="info"):
+        self._publish({"message": message, "level": level})
+
+    def _publish(self, data):
+        self._send(json.dumps(data))
+
+    def _send(self, payload):
+        self.messages += 1
+        self.bytes    += len(payload)
+
+
+def generate(path, days, seed=HAL_SIM_SEED, start=None):
+    """Enregistre `days` jours de capteurs simulés (un échantillon par LOOP_INTERVAL)."""
+    clock = VirtualClock(start)
+    hal.set_backend(SimBackend(clock=clock, seed=seed))
+
+    from sensors.temperature import TemperatureSensor
+    from sensors.light_sensor import LightSensor
+    from sensors.water_level import WaterLevelSensor
+    from logic.scheduler import SensorScheduler
+
+    temp_sensor  = TemperatureSensor()
+    light_sensor = LightSensor()
+    rain_sensor  = WaterLevelSensor()
+    light_sensor.calibrate_rc()
+
+    scheduler = SensorScheduler()
+    scheduler.add_source("dht",   temp_sensor.read, SENSOR_INTERVALS["dht"])
+    scheduler.add_source("rain",  lambda: (rain_sensor.read(), rain_sensor._read_digital()),
+                         SENSOR_INTERVALS["rain"])
+    scheduler.add_source("light", lambda: (light_sensor.read(), light_sensor.is_dark),
+                         SENSOR_INTERVALS["light"])
+    scheduler.start()
+
+    cycles = int(days * 86400 / LOOP_INTERVAL)
+    with TraceWriter(path) as writer:
+        next_tick = clock.monotonic()
+        for _ in range(cycles):
+            scheduler.run_pending()
+            snapshot = scheduler.snapshot()
+            temp, hum, dht_age = snapshot["dht"].value if "dht" in snapshot else (None, None, None)
+            lux, is_dark = snapshot["light"].value
+            rain_pct, rain_digital = snapshot["rain"].value
+            if dht_age is not None:
+                dht_age += clock.monotonic() - snapshot["dht"].monotonic
+            sample_ts = max(s.ts for s in snapshot.values())
+            writer.record(sample_ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark)
+            next_tick += LOOP_INTERVAL
+            clock.sleep(next_tick - clock.monotonic())
+    scheduler.stop()
+    return cycles
+
+
+def replay(path, db_path=None, limit=None, seed=HAL_SIM_SEED, engine=ANOMALY_ENGINE,
+           telemetry=TELEMETRY_MODE, encoding=TELEMETRY_ENCODING):
+    """
+    Rejoue la trace `path` aussi vite que possible. Retourne un dict de
+    résultats (itérations, durée, itérations/s, durée simulée, ...).
+    """
+    records = read_trace(path)
+    first = next(records, None)
+    if first is None:
+        raise ValueError(f"{path}: trace vide")
+
+    clock = VirtualClock(start=first[0] / 1000.0)
+    backend = SimBackend(clock=clock, seed=seed)
+    hal.set_backend(backend)
+
+    from actuators.outputs import outputs
+    from actuators.pump import Pump
+    from actuators.grow_light import GrowLight
+    from actuators.leds import Leds
+    from actuators.lcd import Lcd
+    from analysis.inference import create_detector
+    from logic.alert_manager import AlertManager
+    from logic.irrigation import IrrigationManager
+    from logic.lighting import LightingManager
+    from logic.pipeline import ControlPipeline
+    from utils.database import DatabaseManager
+
+    tmp_dir = None
+    if db_path is None:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="replay-")
+        db_path = os.path.join(tmp_dir.name, "replay.db")
+
+    pump       = Pump()
+    grow_light = GrowLight()
+    leds       = Leds(PIN_LED_GREEN, PIN_LED_ORANGE, PIN_LED_RED)
+    lcd        = Lcd()
+    db         = DatabaseManager(db_path)
+    mqtt_stand = MqttStandIn(telemetry, encoding)
+    pipeline   = ControlPipeline(
+        grow_light, pump,
+        IrrigationManager(pump), LightingManager(grow_light), AlertManager(leds, lcd),
+        create_detector(engine, persistent=False), db, mqtt_stand,
+    )
+
+    iterations = 0
+    anomalies  = 0
+    last_ts    = first[0]
+    start      = time.perf_counter()
+    try:
+        record = first
+        while record is not None:
+            ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark = record
+            clock.advance(max(0.0, ts / 1000.0 - clock.time()))
+            if pipeline.step(ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark):
+                anomalies += 1
+            iterations += 1
+            last_ts = ts
+            if limit is not None and iterations >= limit:
+                break
+            record = next(records, None)
+        loop_elapsed = time.perf_counter() - start
+        db.close()   # inclut la vidange du tampon d'écriture
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    elapsed = time.perf_counter() - start
+    switches = outputs.stats()
+
+    return {
+        "iterations":       iterations,
+        "simulated_hours":  (last_ts - first[0]) / 3600000.0,
+        "loop_seconds":     loop_elapsed,
+        "elapsed_seconds":  elapsed,
+        "iterations_per_s": iterations / elapsed if elapsed > 0 else float("inf"),
+        "anomalies":        anomalies,
+        "pump_starts":      switches["pump"]["starts"],
+        "led_toggles":      sum(v["transitions"] for k, v in switches.items() if k.startswith("led_")),
+        "mqtt_messages":    mqtt_stand.messages,
+        "mqtt_bytes":       mqtt_stand.bytes,
+        "lcd":              lcd.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu accéléré d'une trace capteurs.")
+    parser.add_argument("trace", help="fichier trace (.sgt ou .sgt.gz)")
+    parser.add_argument("--generate", type=float, metavar="JOURS",
+                        help="génère une trace simulée de JOURS jours au lieu de rejouer")
+    parser.add_argument("--db", help="base SQLite du rejeu (défaut : fichier temporaire)")
+    parser.add_argument("--limit", type=int, help="nombre max d'itérations")
+    parser.add_argument("--seed", type=int, default=HAL_SIM_SEED)
+    parser.add_argument("--engine", choices=("forest", "stats"), default=ANOMALY_ENGINE,
+                        help="moteur d'anomalies (défaut : ANOMALY_ENGINE)")
+    parser.add_argument("--telemetry", choices=("frame", "legacy"), default=TELEMETRY_MODE,
+                        help="publication capteurs (défaut : TELEMETRY_MODE)")
+    parser.add_argument("--encoding", choices=("json", "binary"), default=TELEMETRY_ENCODING,
+                        help="encodage des trames (défaut : TELEMETRY_ENCODING)")
+    parser.add_argument("--verbose", action="store_true", help="garde les logs INFO (lent)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    if args.generate:
+        t0 = time.perf_counter()
+        cycles = generate(args.trace, args.generate, seed=args.seed)
+        print(f"Trace: {cycles} cycles ({args.generate} j) → {args.trace} "
+              f"en {time.perf_counter() - t0:.1f}s")
+        return
+
+    result = replay(args.trace, db_path=args.db, limit=args.limit, seed=args.seed, engine=args.engine,
+                    telemetry=args.telemetry, encoding=args.encoding)
+    print(f"Rejeu: {result['iterations']} itérations ({result['simulated_hours']:.1f} h simulées) "
+          f"en {result['elapsed_seconds']:.2f}s → {result['iterations_per_s']:.0f} it/s")
+    print(f"  boucle {result['loop_seconds']:.2f}s | anomalies {result['anomalies']} | "
+          f"démarrages pompe {result['pump_starts']} | bascules LED {result['led_toggles']} | MQTT {result['mqtt_messages']} msg "
+          f"({result['mqtt_bytes']} o)")
+    lcd = result["lcd"]
+    print(f"  LCD {lcd['renders']} rendus, {lcd['skipped']} évités, {lcd['transfers']} transferts I2C")
+
+
+if __name__ == "__main__":
+    main()
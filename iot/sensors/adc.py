@@ -0,0 +1,102 @@
+import threading
+import hal
+from config import ADC_ADDRESS, ADC_MAX_AGE
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class Pcf8591:
+    """
+    Service ADC partagé — PCF8591 (I2C, adresse 0x4B).
+
+    Un seul SMBus pour tous les capteurs analogiques (pluie A0, sol A1,
+    lumière A2). Un scan lit les 4 canaux en une seule transaction I2C
+    grâce à l'auto-incrément du PCF8591 :
+
+        control = 0x40 (sortie analogique active → oscillateur toujours ON)
+                | 0x04 (auto-incrément) | canal 0, entrées simples
+        lecture de 5 octets : [périmé, A0, A1, A2, A3]
+
+    Les valeurs sont servies depuis le dernier scan tant qu'il a moins de
+    `max_age` secondes ; l'accès au bus est sérialisé par un verrou.
+    """
+
+    _CONTROL = 0x40 | 0x04
+    CHANNELS = 4
+
+    def __init__(self, address=ADC_ADDRESS, bus_id=1, max_age=ADC_MAX_AGE):
+        self.address  = address
+        self.bus_id   = bus_id
+        self.max_age  = max_age
+
+        self._bus       = None
+        self._clock     = hal.clock()
+        self._lock      = threading.Lock()
+        self._values    = None   # (A0, A1, A2, A3)
+        self._timestamp = None   # clock.monotonic() du dernier scan
+        self.scans      = 0
+
+        self._init_bus()
+
+    def _init_bus(self):
+        try:
+            self._bus = hal.i2c_bus(self.bus_id)
+            logger.info(f"Sensor [ADC]: SMBus OK (adresse={hex(self.address)}, bus {self.bus_id})")
+        except Exception as e:
+            logger.error(f"Sensor [ADC]: SMBus init failed: {e}")
+            self._bus = None
+
+    def scan(self):
+        """
+        Lit les 4 canaux en une transaction et retourne (valeurs, timestamp).
+        Lève une exception si le bus est indisponible (le bus est réouvert
+        pour le prochain appel).
+        """
+        with self._lock:
+            return self._scan_locked()
+
+    def _scan_locked(self):
+        if self._bus is None:
+            self._init_bus()
+            if self._bus is None:
+                raise IOError("bus I2C non disponible")
+        try:
+            data = self._bus.read_i2c_block_data(self.address, self._CONTROL, self.CHANNELS + 1)
+        except Exception:
+            metrics.incr("adc_errors")
+            hal.reset_i2c_bus(self.bus_id)
+            self._init_bus()
+            raise
+        self._values    = tuple(data[1:self.CHANNELS + 1])   # data[0] = conversion précédente
+        self._timestamp = self._clock.monotonic()
+        self.scans     += 1
+        return self._values, self._timestamp
+
+    def snapshot(self, max_age=None):
+        """
+        Retourne (valeurs, timestamp) du dernier scan, en rescannant si
+        celui-ci a plus de `max_age` secondes.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if self._timestamp is None or self._clock.monotonic() - self._timestamp > max_age:
+                return self._scan_locked()
+            return self._values, self._timestamp
+
+    def read(self, channel, max_age=None):
+        """Retourne la valeur brute 0-255 du canal `channel` (A0-A3)."""
+        values, _ = self.snapshot(max_age)
+        return values[channel]
+
+
+_instances      = {}
+_instances_lock = threading.Lock()
+
+
+def get_adc(address=ADC_ADDRESS):
+    """Retourne le service ADC partagé pour `address` (un par backend HAL)."""
+    key = (hal.get_backend(), address)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = Pcf8591(address)
+        return _instances[key]
@@ -1,7 +1,13 @@
-import random
+import json
+import os
+import threading
 import time
-from config import MOCK_MODE, PIN_LDR, PIN_LDR_RC, ADC_ADDRESS
+import hal
+from config import (PIN_LDR, PIN_LDR_RC, ADC_ADDRESS, LIGHT_RC_MODE,
+                    RC_CALIBRATION_PATH, RC_CALIBRATION_TOLERANCE, RC_CALIBRATION_CONFIRM)
+from sensors.adc import get_adc
 from utils.logger import logger
+from utils.metrics import metrics
 
 
 class LightSensor:
@@ -10,12 +16,18 @@ class LightSensor:
 
     1. ADC PCF8591 (I2C, adresse 0x4B, canal A2 = PIN_LDR)
        → valeur lux approx. (0-1000) publiée sur MQTT.
-       Commande correcte : 0x40 | channel
+       Lue via le service ADC partagé (sensors/adc.py).
 
     2. RC-timing GPIO (PIN_LDR_RC = GPIO 27)
        → détection obscurité booléenne (is_dark).
        Si le circuit RC n'est pas branché (baseline ≈ 0),
        bascule automatiquement sur le seuil ADC (lux < 100 = nuit).
+       Mode "edge" (défaut) : temps de charge en µs mesuré sur front
+       montant (GPIO.wait_for_edge), sans boucle active.
+       Mode "poll" : ancien comptage d'itérations en boucle active.
+       La baseline est mémorisée (RC_CALIBRATION_PATH) : au démarrage,
+       start_calibration() l'applique tout de suite et la revalide en
+       arrière-plan au lieu de bloquer ~2,5 s avant la première lecture.
 
     Câblage GPIO 27 (RC) :
         3.3V ──▶ R 10kΩ ──┬── LDR ──▶ GND
@@ -30,53 +42,54 @@ class LightSensor:
     _RC_N_CAL    = 15     # lectures calibration
     _RC_DELAY    = 0.01
     _RC_TIMEOUT  = 0.5
+    _RC_EDGE_SLICE = 0.05   # s par wait_for_edge() : un front manqué se voit à la tranche suivante
+    _RC_DISCHARGE = 0.02
+    # Baseline minimale (unité du mode) en dessous de laquelle le RC est absent
+    _RC_MIN_BASELINE = {"poll": 10, "edge": 200}   # itérations / µs
 
     # ── Seuil ADC de secours (si RC non branché) ──────────────────
     _ADC_DARK_THRESHOLD = 100   # lux < 100 → nuit
 
-    def __init__(self, channel=PIN_LDR, address=ADC_ADDRESS, rc_pin=PIN_LDR_RC):
+    def __init__(self, channel=PIN_LDR, address=ADC_ADDRESS, rc_pin=PIN_LDR_RC, adc=None,
+                 gpio=None, rc_mode=LIGHT_RC_MODE):
         self.channel   = channel
         self.address   = address
         self.rc_pin    = rc_pin
+        self.rc_mode   = rc_mode
         self.is_dark   = False
 
-        self._bus           = None
+        self._adc           = adc if adc is not None else get_adc(address)
+        self._gpio          = gpio    # module compatible RPi.GPIO (HAL)
+        self._clock         = hal.clock()
         self._rc_calibrated = False   # True si baseline valide
         self._rc_baseline   = None
         self._threshold_on  = None
         self._threshold_off = None
+        self._rc_candidates = []      # baselines mesurées en désaccord avec la mémorisée, concordantes entre elles
+        self._rc_lock       = threading.Lock()   # une seule mesure RC à la fois (lecture / calibration)
 
-        if not MOCK_MODE:
-            self._init_bus()
+        if self._gpio is None:
+            try:
+                self._gpio = hal.gpio()
+            except Exception as e:
+                logger.error(f"Sensor [Light RC]: GPIO indisponible: {e}")
 
-    # ── I2C / ADC ─────────────────────────────────────────────────
+    # ── RC-timing ─────────────────────────────────────────────────
 
-    def _init_bus(self):
-        try:
-            import smbus
-            self._bus = smbus.SMBus(1)
-            logger.info(f"Sensor [Light]: SMBus OK (adresse={hex(self.address)}, canal A{self.channel})")
-        except Exception as e:
-            logger.error(f"Sensor [Light]: SMBus init failed: {e}")
-            self._bus = None
+    def _rc_measure(self):
+        if self.rc_mode == "edge":
+            return self._rc_measure_edge()
+        return self._rc_measure_poll()
 
-    def _read_adc_raw(self):
+    def _rc_measure_poll(self):
         """
-        Formule identique au code de test : 0x84 | (channel << 4).
-        Double-read pour éliminer le byte périmé.
+        Comptage en boucle active (unité : itérations).
+        Mode historique : le délai de garde reste sur l'horloge réelle.
         """
-        command = 0x84 | (self.channel << 4)
-        self._bus.write_byte(self.address, command)
-        self._bus.read_byte(self.address)          # byte périmé
-        return self._bus.read_byte(self.address)   # valeur réelle
-
-    # ── RC-timing ─────────────────────────────────────────────────
-
-    def _rc_measure(self):
-        import RPi.GPIO as GPIO
+        GPIO = self._gpio
         GPIO.setup(self.rc_pin, GPIO.OUT)
         GPIO.output(self.rc_pin, GPIO.LOW)
-        time.sleep(0.02)
+        self._clock.sleep(self._RC_DISCHARGE)
         GPIO.setup(self.rc_pin, GPIO.IN)
         count = 0
         start = time.time()
@@ -86,39 +99,208 @@ class LightSensor:
                 break
         return count
 
+    def _rc_measure_edge(self):
+        """
+        Temps de charge (unité : µs) mesuré sur le front montant.
+        Le thread dort dans wait_for_edge() au lieu de boucler ; les
+        instants viennent de l'horloge monotone haute résolution.
+
+        Le front peut passer entre la lecture de l'entrée et l'armement de
+        wait_for_edge() (RPi.GPIO n'arme la détection que sur une entrée) :
+        il est alors manqué et l'attente expire avec l'entrée déjà HIGH.
+        Ce cas est distingué d'un vrai timeout et la mesure est refaite une
+        fois ; None si le front est encore manqué. Un front manqué veut dire
+        une charge rapide (lumière) : ce n'est pas un timeout (obscurité).
+        """
+        for _ in range(2):
+            charge = self._rc_charge_edge()
+            if charge is not None:
+                return charge
+            metrics.incr("rc_missed_edges")
+        return None
+
+    def _rc_charge_edge(self):
+        """
+        Une mesure (µs) ; None si le front a été manqué.
+        L'attente est découpée en tranches de _RC_EDGE_SLICE : après chaque
+        tranche sans front, une entrée déjà HIGH signale le front manqué
+        sans attendre la fin de _RC_TIMEOUT.
+        """
+        GPIO = self._gpio
+        GPIO.setup(self.rc_pin, GPIO.OUT)
+        GPIO.output(self.rc_pin, GPIO.LOW)
+        self._clock.sleep(self._RC_DISCHARGE)
+        start = self._clock.perf_counter_ns()
+        GPIO.setup(self.rc_pin, GPIO.IN)
+        # Front déjà passé avant l'armement de la détection (charge très rapide)
+        if GPIO.input(self.rc_pin) == GPIO.HIGH:
+            return (self._clock.perf_counter_ns() - start) / 1000.0
+        deadline = start + int(self._RC_TIMEOUT * 1e9)
+        while True:
+            remaining = (deadline - self._clock.perf_counter_ns()) / 1e9
+            if remaining <= 0:
+                metrics.incr("rc_timeouts")
+                return self._RC_TIMEOUT * 1e6
+            timeout = max(1, round(min(self._RC_EDGE_SLICE, remaining) * 1000))
+            if GPIO.wait_for_edge(self.rc_pin, GPIO.RISING, timeout=timeout) is not None:
+                return (self._clock.perf_counter_ns() - start) / 1000.0
+            if GPIO.input(self.rc_pin) == GPIO.HIGH:
+                return None   # chargé pendant l'armement : front manqué
+
     def _rc_average(self, n):
+        """Moyenne de n mesures, sans les fronts manqués (None si aucune mesure valide)."""
         readings = []
-        for _ in range(n):
-            readings.append(self._rc_measure())
-            time.sleep(self._RC_DELAY)
-        return sum(readings) / len(readings)
+        with self._rc_lock:
+            for _ in range(n):
+                value = self._rc_measure()
+                if value is not None:
+                    readings.append(value)
+                self._clock.sleep(self._RC_DELAY)
+        return sum(readings) / len(readings) if readings else None
 
-    def calibrate_rc(self):
+    def calibrate_rc(self, path=None):
         """
         Calibration RC (bloque ~2 s, à appeler une fois avant la boucle).
         Si la baseline est trop faible (circuit non branché),
         désactive le RC et utilise le seuil ADC à la place.
+        path : fichier où mémoriser la baseline (optionnel).
         """
-        if MOCK_MODE:
+        baseline = self._measure_baseline()
+        if baseline is not None and self._apply_baseline(baseline) and path:
+            self.save_calibration(path)
+
+    def start_calibration(self, path=RC_CALIBRATION_PATH):
+        """
+        Démarrage rapide : applique la baseline mémorisée (si elle correspond
+        au pin et au mode), puis la revalide dans un thread — ou calibre en
+        arrière-plan s'il n'y en a pas (seuil ADC en attendant).
+        Horloge virtuelle : tout est fait tout de suite, sans thread.
+        """
+        if self._gpio is None:
             return
+        stored = self._rc_baseline if self.load_calibration(path) else None
+        if self._clock.virtual:
+            self._revalidate(path, stored)
+            return
+        threading.Thread(target=self._revalidate, args=(path, stored), name="rc-calibration",
+                         daemon=True).start()
 
-        logger.info(f"Sensor [Light RC]: Calibration GPIO {self.rc_pin} (2 s)…")
-        time.sleep(2)
+    def load_calibration(self, path=RC_CALIBRATION_PATH):
+        """Applique la baseline mémorisée. Retourne True si elle a été appliquée."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sensor [Light RC]: Calibration mémorisée illisible ({e})")
+            return False
+        if data.get("pin") != self.rc_pin or data.get("mode") != self.rc_mode:
+            logger.info("Sensor [Light RC]: Calibration mémorisée pour un autre pin/mode, ignorée.")
+            return False
+        self._rc_candidates = [float(c) for c in data.get("candidates", [])]
+        return self._apply_baseline(float(data["baseline"]))
+
+    def save_calibration(self, path=RC_CALIBRATION_PATH):
+        """Mémorise la baseline courante (écriture atomique)."""
+        if not self._rc_calibrated:
+            return
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"pin": self.rc_pin, "mode": self.rc_mode,
+                           "baseline": self._rc_baseline, "candidates": self._rc_candidates,
+                           "saved": int(self._clock.time())}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Sensor [Light RC]: Impossible de mémoriser la calibration ({e})")
+
+    def revalidate_rc(self, path=RC_CALIBRATION_PATH):
+        """
+        Mesure une nouvelle baseline et la compare à la baseline mémorisée :
+          - pas de baseline mémorisée → la mesure est appliquée et mémorisée ;
+          - écart ≤ RC_CALIBRATION_TOLERANCE → dérive normale, mise à jour ;
+          - écart plus grand → mesure faite dans l'obscurité, ou baseline
+            mémorisée fausse : la baseline mémorisée est conservée et la mesure
+            notée comme candidate. Après RC_CALIBRATION_CONFIRM revalidations
+            consécutives hors tolérance mais concordantes entre elles, leur
+            moyenne remplace la baseline mémorisée ;
+          - circuit absent → mode ADC.
+        Avec une baseline mémorisée, rien n'est mesuré tant que l'ADC lit
+        l'obscurité (ou ne répond pas) : des démarrages de nuit ne peuvent
+        pas remplacer une bonne baseline.
+        """
+        self._revalidate(path, self._rc_baseline if self.load_calibration(path) else None)
+
+    def _revalidate(self, path, stored):
+        if stored is not None and not self._adc_light():
+            logger.info("Sensor [Light RC]: Obscurité (ADC) → revalidation reportée, baseline mémorisée conservée")
+            return
+        baseline = self._measure_baseline()
+        if baseline is None:
+            return
+        if stored is not None and not self._agrees(baseline, stored) \
+                and baseline >= self._RC_MIN_BASELINE.get(self.rc_mode, 10):
+            if all(self._agrees(baseline, c) for c in self._rc_candidates):
+                self._rc_candidates.append(baseline)
+            else:
+                self._rc_candidates = [baseline]
+            if len(self._rc_candidates) < RC_CALIBRATION_CONFIRM:
+                logger.warning(
+                    f"Sensor [Light RC]: Baseline mesurée {baseline:.1f} ≠ mémorisée {stored:.1f} "
+                    f"(> {RC_CALIBRATION_TOLERANCE:.0%}) → baseline mémorisée conservée "
+                    f"({len(self._rc_candidates)}/{RC_CALIBRATION_CONFIRM})"
+                )
+                self.save_calibration(path)
+                return
+            baseline = sum(self._rc_candidates) / len(self._rc_candidates)
+            logger.warning(
+                f"Sensor [Light RC]: {len(self._rc_candidates)} mesures concordantes ≠ mémorisée "
+                f"{stored:.1f} → baseline remplacée par {baseline:.1f}"
+            )
+        self._rc_candidates = []
+        if self._apply_baseline(baseline):
+            self.save_calibration(path)
+
+    def _adc_light(self):
+        """True si l'ADC lit le jour (lux ≥ _ADC_DARK_THRESHOLD) ; False la nuit ou si l'ADC ne répond pas."""
+        try:
+            return self._read_lux() >= self._ADC_DARK_THRESHOLD
+        except Exception as e:
+            logger.warning(f"Sensor [Light]: Erreur ADC: {e}")
+            return False
+
+    @staticmethod
+    def _agrees(baseline, reference):
+        return abs(baseline - reference) <= RC_CALIBRATION_TOLERANCE * reference
+
+    def _measure_baseline(self):
+        """Moyenne de _RC_N_CAL mesures après 2 s de stabilisation (None si échec)."""
+        if self._gpio is None:
+            return None
+
+        logger.info(f"Sensor [Light RC]: Calibration GPIO {self.rc_pin} (2 s, mode {self.rc_mode})…")
+        self._clock.sleep(2)
 
         try:
             baseline = self._rc_average(self._RC_N_CAL)
         except Exception as e:
             logger.warning(f"Sensor [Light RC]: Calibration échouée ({e}) → mode ADC")
-            return
+            return None
+        if baseline is None:
+            logger.warning("Sensor [Light RC]: Calibration échouée (tous les fronts manqués)")
+        return baseline
 
-        if baseline < 10:
+    def _apply_baseline(self, baseline):
+        """Seuils dérivés de la baseline ; False (mode ADC) si le circuit semble absent."""
+        if baseline < self._RC_MIN_BASELINE.get(self.rc_mode, 10):
             # Circuit RC absent ou court-circuit → bascule sur ADC
             logger.warning(
                 f"Sensor [Light RC]: Baseline trop faible ({baseline:.1f}) "
                 f"→ circuit RC probablement absent. Mode ADC activé."
             )
             self._rc_calibrated = False
-            return
+            return False
 
         self._rc_baseline   = baseline
         self._threshold_on  = baseline * (1 + self._DELTA_ON)
@@ -129,16 +311,26 @@ class LightSensor:
             f"Sensor [Light RC]: baseline={baseline:.1f} | "
             f"ON>{self._threshold_on:.1f} | OFF<{self._threshold_off:.1f}"
         )
+        return True
 
     def _update_is_dark_via_rc(self):
         """Met à jour is_dark via RC (avec hystérésis)."""
         value = self._rc_average(self._RC_N)
+        if value is None:
+            return   # fronts manqués : pas de mesure, état conservé
         if not self.is_dark and value > self._threshold_on:
             self.is_dark = True
-            logger.info(f"Sensor [Light RC]: Nuit (count={value:.0f})")
+            logger.info("Sensor [Light RC]: Nuit (mesure=%.0f)", value)
         elif self.is_dark and value < self._threshold_off:
             self.is_dark = False
-            logger.info(f"Sensor [Light RC]: Jour (count={value:.0f})")
+            logger.info("Sensor [Light RC]: Jour (mesure=%.0f)", value)
+
+    def _read_lux(self):
+        """Luminosité ADC en lux (0-1000) ; exception si l'ADC ne répond pas."""
+        raw = self._adc.read(self.channel)
+        lux = round((raw / 255.0) * 1000)
+        logger.debug("Sensor [Light] ADC: raw=%s → %s lux", raw, lux)
+        return lux
 
     # ── Interface publique ─────────────────────────────────────────
 
@@ -149,22 +341,12 @@ class LightSensor:
           - via RC-timing si calibré
           - via seuil ADC si RC non disponible
         """
-        if MOCK_MODE:
-            lux = random.randint(50, 1000)
-            self.is_dark = lux < 200
-            logger.debug(f"Sensor [Light] (mock): {lux} lux, is_dark={self.is_dark}")
-            return lux
-
         # ── Lecture ADC ──
         lux = 0
-        if self._bus:
-            try:
-                raw = self._read_adc_raw()
-                lux = round((raw / 255.0) * 1000)
-                logger.debug(f"Sensor [Light] ADC: raw={raw} → {lux} lux")
-            except Exception as e:
-                logger.error(f"Sensor [Light]: Erreur ADC: {e}")
-                self._init_bus()
+        try:
+            lux = self._read_lux()
+        except Exception as e:
+            logger.error(f"Sensor [Light]: Erreur ADC: {e}")
 
         # ── is_dark : RC ou ADC ──
         if self._rc_calibrated:
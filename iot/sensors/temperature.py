@@ -1,65 +1,124 @@
-import random
-from config import MOCK_MODE, PIN_DHT
+import threading
+import hal
+from config import PIN_DHT, DHT_READ_INTERVAL
 from utils.logger import logger
+from utils.metrics import metrics
 
 class TemperatureSensor:
     """
     Capteur de température et d'humidité DHT11 via adafruit_dht.
     GPIO 4 (par défaut) en mode BCM.
+
+    Un thread d'acquisition interroge le DHT11 à son propre rythme
+    (`interval`, jamais moins d'1 s entre deux lectures) et conserve le
+    dernier échantillon valide avec son heure de capture. read() ne bloque
+    jamais : il retourne ce dernier échantillon et son âge.
+
+    Avec une horloge virtuelle (HAL simulé), pas de thread : read() lance
+    lui-même la lecture quand l'intervalle est écoulé.
     """
-    def __init__(self, pin=PIN_DHT):
+    _MIN_INTERVAL = 1.0   # le DHT11 ne supporte pas plus d'une lecture/s
+
+    def __init__(self, pin=PIN_DHT, interval=DHT_READ_INTERVAL):
         self.pin = pin
         self.type = "DHT11"
+        self.interval = max(self._MIN_INTERVAL, interval)
         self._dht        = None
         self._last_temp   = None   # dernière valeur valide
         self._last_hum    = None
-        self._fail_count  = 0
-        if not MOCK_MODE:
-            self._init_sensor()
+        self._last_time   = None   # clock.monotonic() de la dernière valeur valide
+        self._last_try    = None   # clock.monotonic() de la dernière tentative
+        self._fail_count  = 0      # échecs consécutifs
+        self._clock       = hal.clock()
+        self._lock        = threading.Lock()
+        self._stop        = threading.Event()
+        self._thread      = None
+        self._init_sensor()
+        if not self._clock.virtual:
+            self.start()
 
     def _init_sensor(self):
         try:
-            import board
-            import adafruit_dht
-            gpio_pin = getattr(board, f"D{self.pin}")
-            self._dht = adafruit_dht.DHT11(gpio_pin)
+            self._dht = hal.dht11(self.pin)
             logger.info(f"Sensor [Temp/Hum]: DHT11 initialisé sur GPIO{self.pin}")
         except Exception as e:
             logger.error(f"Sensor [Temp/Hum]: Impossible d'initialiser DHT11: {e}")
 
+    # ── Thread d'acquisition ──────────────────────────────────────
+
+    def start(self):
+        """Démarre le thread d'acquisition (sans effet s'il tourne déjà)."""
+        if self._dht is None or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._acquire_loop, name="dht11", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread d'acquisition."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _acquire_loop(self):
+        next_read = self._clock.monotonic()
+        while not self._stop.is_set():
+            self._acquire_once()
+            # Échéances absolues : pas de dérive liée à la durée de lecture
+            next_read += self.interval
+            delay = next_read - self._clock.monotonic()
+            if delay < self._MIN_INTERVAL:
+                delay = self._MIN_INTERVAL
+                next_read = self._clock.monotonic() + delay
+            self._stop.wait(delay)
+
+    def _acquire_once(self):
+        """Une seule lecture DHT11 (le DHT11 rate souvent une lecture)."""
+        self._last_try = self._clock.monotonic()
+        try:
+            temperature = self._dht.temperature
+            humidity    = self._dht.humidity
+            if temperature is not None and humidity is not None:
+                with self._lock:
+                    self._last_temp  = temperature
+                    self._last_hum   = humidity
+                    self._last_time  = self._clock.monotonic()
+                    self._fail_count = 0
+                logger.debug("Sensor [Temp/Hum]: %s°C | %s%%", temperature, humidity)
+                return True
+            logger.debug("Sensor [Temp/Hum]: lecture None")
+        except RuntimeError as e:
+            logger.debug("Sensor [Temp/Hum]: RuntimeError: %s", e)
+        except Exception as e:
+            logger.error(f"Sensor [Temp/Hum]: Erreur inattendue: {e}")
+
+        with self._lock:
+            self._fail_count += 1
+            fail_count = self._fail_count
+        metrics.incr("dht_failures")
+        if fail_count in (3, 10) or fail_count % 30 == 0:
+            logger.warning(f"Sensor [Temp/Hum]: {fail_count} échecs consécutifs")
+        return False
+
+    # ── Interface publique ─────────────────────────────────────────
+
+    @property
+    def fail_count(self):
+        """Nombre d'échecs de lecture consécutifs."""
+        return self._fail_count
+
     def read(self):
         """
-        Retourne un tuple (température °C, humidité %).
-        Retourne (None, None) en cas d'erreur de lecture.
+        Retourne un tuple (température °C, humidité %, âge en secondes)
+        du dernier échantillon valide, sans bloquer.
+        Retourne (None, None, None) si aucune lecture n'a encore réussi.
         """
-        if MOCK_MODE:
-            temp = round(random.uniform(20.0, 35.0), 1)
-            hum = round(random.uniform(40.0, 90.0), 1)
-            logger.debug(f"Sensor [Temp/Hum] (mock): {temp}°C, {hum}%")
-            return temp, hum
-        else:
-            # Jusqu'à 3 tentatives — le DHT11 rate souvent la 1ère lecture
-            for attempt in range(3):
-                try:
-                    temperature = self._dht.temperature
-                    humidity    = self._dht.humidity
-                    if temperature is not None and humidity is not None:
-                        self._last_temp  = temperature
-                        self._last_hum   = humidity
-                        self._fail_count = 0
-                        logger.debug(f"Sensor [Temp/Hum]: {temperature}°C | {humidity}%")
-                        return temperature, humidity
-                    logger.warning(f"Sensor [Temp/Hum]: None (tentative {attempt+1}/3)")
-                except RuntimeError as e:
-                    logger.warning(f"Sensor [Temp/Hum]: RuntimeError tentative {attempt+1}/3: {e}")
-                except Exception as e:
-                    logger.error(f"Sensor [Temp/Hum]: Erreur inattendue: {e}")
-                    break
-                import time; time.sleep(0.5)
+        if self._clock.virtual and self._dht is not None and (
+                self._last_try is None or self._clock.monotonic() - self._last_try >= self.interval):
+            self._acquire_once()
 
-            # Toutes les tentatives échouent → réutiliser la dernière valeur connue
-            self._fail_count += 1
-            if self._last_temp is not None:
-                logger.warning(f"Sensor [Temp/Hum]: Échec lecture ({self._fail_count}x) — valeur cachée utilisée")
-                return self._last_temp, self._last_hum
-            return None, None
+        with self._lock:
+            if self._last_time is None:
+                return None, None, None
+            return self._last_temp, self._last_hum, self._clock.monotonic() - self._last_time
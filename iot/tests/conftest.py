@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Modules are imported as in the app (from config import ..., run from iot/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hal
+from utils.logger import logger
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _close_log_writer():
+    """The log writer thread flushes pytest's capture stream: stop it before pytest closes it."""
+    yield
+    for handler in logger.handlers:
+        handler.close()
+
+
+@pytest.fixture
+def sim_clock():
+    """Simulated HAL on a virtual clock for one test; yields the clock."""
+    from hal.clocks import VirtualClock
+    from hal.simulated import SimBackend
+    previous = hal._backend   # None: backend from config.py, created on demand
+    clock = VirtualClock()
+    hal.set_backend(SimBackend(clock=clock))
+    yield clock
+    hal.set_backend(previous)
@@ -0,0 +1,42 @@
+import math
+import os
+import random
+
+import pytest
+
+from config import ANOMALY_ENGINE, LOOP_INTERVAL
+from analysis.inference import COMPILED_PATH, MODEL_PATH, AnomalyDetector, create_detector
+
+
+def _garden(clock, rng, hours, heat=0.0):
+    """Readings every LOOP_INTERVAL on the daily cycle of the garden, `heat` °C above it."""
+    for _ in range(int(hours * 3600 / LOOP_INTERVAL)):
+        hour = clock.time() / 3600 % 24
+        phase = math.sin(2 * math.pi * (hour - 9) / 24)
+        daylight = max(0.0, math.sin(math.pi * (hour - 6) / 12))
+        yield (21 + 5 * phase + heat + rng.gauss(0, 0.5),
+               60 - 12 * phase - 2 * heat + rng.gauss(0, 2),
+               120 + rng.gauss(0, 2),
+               80 + 800 * daylight + rng.gauss(0, 10))
+        clock.advance(LOOP_INTERVAL)
+
+
+def test_committed_forest_artefacts_load():
+    # Stale artefacts (other features) are refused at load: the forest engine would never score
+    present = os.path.exists(COMPILED_PATH) or os.path.exists(MODEL_PATH)
+    assert (AnomalyDetector().model is not None) == present
+    if ANOMALY_ENGINE == "forest":
+        assert present, "ANOMALY_ENGINE = 'forest' without a model: python -m analysis.train_model"
+
+
+def test_default_engine_scores_and_flags(sim_clock):
+    detector = create_detector(persistent=False)
+    assert detector.ready.is_set() and (detector.model is not None or getattr(detector, "loaded", False))
+    rng = random.Random(0)
+    # The stats engine learns one day before scoring; the forest scores at once
+    for reading in _garden(sim_clock, rng, 25):
+        detector.update(*reading)
+    assert detector.windows > 0 and not detector.is_anomaly
+    flags = [detector.update(*reading) for reading in _garden(sim_clock, rng, 0.25, heat=12)]
+    assert any(flags)
+    detector.close()
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from config import TOPIC_COMMANDS_WATER, TOPIC_COMMANDS_LIGHT, COMMAND_DEDUP
+from logic.commands import CommandDispatcher
+from logic.irrigation import IrrigationManager
+from logic.lighting import LightingManager
+
+
+class Pump:
+    def __init__(self):
+        self.calls = []
+
+    def on(self):
+        self.calls.append("on")
+
+    def off(self):
+        self.calls.append("off")
+
+
+class GrowLight:
+    def __init__(self):
+        self.intensity = 0
+
+    def set_intensity(self, value):
+        self.intensity = value
+
+
+@pytest.fixture
+def garden(sim_clock):
+    """Dispatcher branché sur de vrais gestionnaires ; réponses dans `replies`."""
+    replies = []
+    irrigation = IrrigationManager(Pump(), clock=sim_clock)
+    lighting = LightingManager(GrowLight(), clock=sim_clock)
+    dispatcher = CommandDispatcher(irrigation, lighting, reply=replies.append)
+    return dispatcher, irrigation, lighting, replies
+
+
+def _send(dispatcher, topic, **command):
+    dispatcher.submit(topic, json.dumps(command))
+
+
+def _status(replies):
+    return [(r["id"], r["status"]) for r in replies]
+
+
+def test_duplicate_id_runs_once(garden):
+    dispatcher, irrigation, _, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="a1", duration=30)
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="a1", duration=30)   # renvoi QoS 1
+    assert _status(replies) == [("a1", "duplicate")]
+    assert dispatcher.drain() == 1
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="a1", duration=30)   # après exécution
+    assert dispatcher.drain() == 0
+    assert _status(replies) == [("a1", "duplicate"), ("a1", "done"), ("a1", "duplicate")]
+    assert irrigation.pump.calls == ["on"]
+
+
+def test_dedup_window_forgets_old_ids(garden):
+    dispatcher, _, _, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id="old", value=10)
+    for i in range(COMMAND_DEDUP):
+        _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id=f"n{i}", value=20)
+    replies.clear()
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id="old", value=30)
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id=f"n{COMMAND_DEDUP - 1}", value=40)
+    assert _status(replies) == [(f"n{COMMAND_DEDUP - 1}", "superseded"), (f"n{COMMAND_DEDUP - 1}", "duplicate")]
+
+
+def test_newer_command_supersedes_pending_one(garden):
+    dispatcher, irrigation, lighting, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="w1", duration=30)
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id="l1", value=60)
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="w2", duration=90)
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="STOP_WATERING", id="w3")
+    assert _status(replies) == [("w1", "superseded"), ("w2", "superseded")]
+    assert dispatcher.drain() == 2   # une commande par actionneur
+    assert sorted(_status(replies)[2:]) == [("l1", "done"), ("w3", "ignored")]   # pompe déjà arrêtée
+    assert irrigation.pump.calls == []
+    assert lighting.grow_light.intensity == 60
+
+
+def test_rejected_commands_never_run(garden):
+    dispatcher, irrigation, _, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="START_WATERING", id="t1")   # mauvais topic
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="t2", duration=10 ** 6)
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="FLOOD", id="t3")
+    dispatcher.submit(TOPIC_COMMANDS_WATER, "{pas du json")
+    assert [r["status"] for r in replies] == ["rejected"] * 4
+    assert all(r.get("error") for r in replies)
+    assert dispatcher.drain() == 0 and irrigation.pump.calls == []
+    # Un id refusé n'est pas retenu : la commande corrigée passe
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="t2", duration=10)
+    assert dispatcher.drain() == 1
+
+
+def test_manual_commands_expire_on_the_control_loop(garden, sim_clock):
+    dispatcher, irrigation, lighting, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_WATER, command="START_WATERING", id="w", duration=30)
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id="l", value=70, duration=60)
+    dispatcher.drain()
+    assert irrigation.is_watering and lighting.manual_override
+
+    sim_clock.advance(29)
+    irrigation.check(10)   # sol sec : ignoré pendant l'arrosage manuel
+    lighting.check()
+    assert irrigation.is_watering and lighting.grow_light.intensity == 70
+
+    sim_clock.advance(1)
+    irrigation.check(50)
+    assert not irrigation.is_watering and not irrigation.manual_override
+    assert irrigation.pump.calls == ["on", "off"]
+
+    sim_clock.advance(30)
+    lighting.check()
+    assert not lighting.manual_override   # retour au planning automatique
+
+
+def test_latency_from_sender_timestamp(garden, sim_clock):
+    dispatcher, _, _, replies = garden
+    _send(dispatcher, TOPIC_COMMANDS_LIGHT, command="SET_INTENSITY", id="l", value=5,
+          ts=sim_clock.time() * 1000 - 250)
+    dispatcher.drain()
+    assert replies[-1]["status"] == "done"
+    assert replies[-1]["latency_ms"] == pytest.approx(250, abs=1)
+    assert replies[-1]["queue_ms"] >= 0
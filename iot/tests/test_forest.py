@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import IsolationForest
+
+from analysis.compile_forest import compile_forest
+from analysis.forest import CompiledForest
+from analysis.inference import FEATURES
+
+
+def _garden_like(rng, n):
+    return np.column_stack([
+        rng.normal(22, 4, n),        # temperature
+        rng.normal(55, 10, n),       # humidity
+        rng.uniform(0, 255, n),      # rain ADC
+        rng.uniform(0, 1000, n),     # light
+    ])
+
+
+def _on_thresholds(model):
+    """Readings sitting exactly on split thresholds (ties go left, after float32 rounding)."""
+    rows = []
+    for estimator, columns in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        inner = tree.feature >= 0
+        for feature, threshold in zip(tree.feature[inner][:3], tree.threshold[inner][:3]):
+            row = [22.0, 55.0, 120.0, 480.0]
+            row[columns[feature]] = threshold
+            rows.append(row)
+    return np.array(rows)
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    model = IsolationForest(n_estimators=50, contamination=0.05, random_state=0).fit(_garden_like(rng, 4000))
+    # Inputs around and well outside the training ranges, plus exact split thresholds
+    X = np.vstack([_garden_like(rng, 2000),
+                   rng.uniform(-100, 1200, (1000, len(FEATURES))),
+                   _on_thresholds(model)])
+    return model, compile_forest(model, FEATURES), X
+
+
+def test_scores_match_sklearn(fitted):
+    model, compiled, X = fitted
+    np.testing.assert_allclose(compiled.score_samples(X), model.score_samples(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(compiled.decision_function(X), model.decision_function(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_single_sample_matches_sklearn(fitted):
+    model, compiled, X = fitted
+    for row in X[:20]:
+        assert compiled.predict([row])[0] == model.predict([row])[0]
+        assert compiled.score_samples([row])[0] == pytest.approx(model.score_samples([row])[0], abs=1e-12)
+
+
+def test_save_load_round_trip(fitted, tmp_path):
+    model, compiled, X = fitted
+    path = tmp_path / "model.npz"
+    compiled.save(str(path))
+    loaded = CompiledForest.load(str(path))
+    assert tuple(loaded.feature_names) == FEATURES
+    assert loaded.n_features == len(FEATURES)
+    np.testing.assert_array_equal(loaded.score_samples(X), compiled.score_samples(X))
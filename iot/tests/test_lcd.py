@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from actuators.lcd import Lcd, LCD_COLS
+
+
+def _line(text):
+    return f"{text:<{LCD_COLS}}"
+
+
+@pytest.fixture
+def lcd(sim_clock):
+    lcd = Lcd()   # LCD simulé (PCF8574), rendu direct : pas de thread sur horloge virtuelle
+    yield lcd
+    lcd.close()
+
+
+def test_runs_cover_changed_cells_only():
+    old = _line("Temp 21.5C")
+    assert Lcd._runs(old, old) == []
+    assert Lcd._runs(None, old) == [(0, LCD_COLS)]
+    assert Lcd._runs(old, _line("Temp 21.6C")) == [(8, 9)]
+    assert Lcd._runs(old, _line("Temp 31.6C")) == [(5, 6), (8, 9)]
+    # Écart d'une cellule : fusionné (la réécrire coûte autant qu'un déplacement de curseur)
+    assert Lcd._runs(old, _line("Temp 2X.6C")) == [(6, 9)]
+    assert Lcd._runs(old, _line("Temp 21.5F")) == [(9, 10)]
+
+
+def test_plan_moves_the_cursor_only_when_needed(lcd):
+    shown = (_line("Temp 21.5C"), _line("Hum 40%"))
+    frame = (_line("Temp 21.6C"), _line("Hum 41%"))
+    ops, cost = lcd._plan(frame, shown, (0, 0))
+    assert ops == [("move", (0, 8)), ("write", "6"), ("move", (1, 5)), ("write", "1")]
+    assert cost == 4
+    ops, cost = lcd._plan(frame, shown, (0, 8))   # curseur déjà en place
+    assert ops[0] == ("write", "6") and cost == 3
+    assert lcd._plan(shown, shown, None) == ([], 0)
+
+
+def test_plan_from_unknown_screen_rewrites_every_row(lcd):
+    frame = (_line("Bonjour"), _line("Jardin"))
+    ops, cost = lcd._plan(frame, None, None)
+    assert ops == [("move", (0, 0)), ("write", frame[0]), ("move", (1, 0)), ("write", frame[1])]
+    assert cost == 2 + 2 * LCD_COLS
+
+
+def test_screen_matches_last_frame_with_fewer_transfers(lcd):
+    rng = random.Random(3)
+    screen = lcd._lcd
+    frames = 0
+    for i in range(300):
+        temp = 18 + rng.randint(0, 80) / 10
+        line1 = f"T:{temp:.1f}C H:{rng.randint(38, 44)}%"
+        line2 = "Pompe ON" if i % 50 < 5 else f"Lum {rng.randint(0, 999)} lx"
+        lcd.display(line1, line2)
+        frames += 1
+        assert screen.text() == [_line(line1), _line(line2)]
+    # Effacer + tout réécrire coûterait 1 + 2 × 16 transferts par image
+    assert lcd.transfers < frames * (1 + 2 * LCD_COLS) / 2
+
+
+def test_unchanged_frame_sends_nothing(lcd):
+    lcd.display("Temp 21.5C", "Hum 40%")
+    sent = lcd._lcd.i2c_bytes
+    lcd.display("Temp 21.5C", "Hum 40%")
+    lcd.display("Temp 21.5C", "Hum 40%   ")   # identique une fois complété à 16 colonnes
+    assert lcd._lcd.i2c_bytes == sent
+    assert lcd.stats()["skipped"] == 2
+
+
+def test_i2c_transfers_do_not_hold_the_state_lock(lcd):
+    device, free = lcd._lcd, []
+    write_string = device.write_string
+
+    def checked(text):
+        # display() / show_pages() d'un autre thread ne doivent pas attendre l'I2C
+        free.append(lcd._lock.acquire(blocking=False))
+        if free[-1]:
+            lcd._lock.release()
+        write_string(text)
+
+    device.write_string = checked
+    lcd.display("Temp 21.5C", "Hum 40%")
+    lcd.display("Temp 21.6C", "Hum 41%")
+    assert free and all(free)
+    assert lcd._lcd.text() == [_line("Temp 21.6C"), _line("Hum 41%")]
+
+
+def test_pages_rotate_on_the_virtual_clock(lcd, sim_clock):
+    lcd.display("Base", "")
+    lcd.show_pages([("Page 1", "a"), ("Page 2", "b")], period=3, repeat=False)
+    assert lcd._lcd.text() == [_line("Page 1"), _line("a")]
+    sim_clock.advance(3)
+    lcd.poll()
+    assert lcd._lcd.text() == [_line("Page 2"), _line("b")]
+    sim_clock.advance(3)
+    lcd.poll()
+    assert lcd._lcd.text() == [_line("Base"), _line("")]   # une seule passe : retour à la base
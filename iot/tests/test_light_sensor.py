@@ -0,0 +1,83 @@
+import pytest
+
+import hal
+from config import PIN_LDR_RC, RC_CALIBRATION_CONFIRM
+from sensors.light_sensor import LightSensor
+from utils.metrics import metrics
+
+
+class Adc:
+    def __init__(self, raw=200):
+        self.raw = raw
+
+    def read(self, channel):
+        return self.raw
+
+
+def _count(name):
+    return metrics.summary()["cnt"].get(name, 0)
+
+
+def _boot(gpio, adc, path):
+    """Un démarrage : baseline mémorisée appliquée puis revalidée (sans thread sur horloge virtuelle)."""
+    sensor = LightSensor(adc=adc, gpio=gpio, rc_mode="edge")
+    sensor.start_calibration(path)
+    return sensor
+
+
+@pytest.fixture
+def sensor(sim_clock):
+    """Capteur en mode edge sur le GPIO simulé, calibré sur 4 ms de charge."""
+    gpio = hal.gpio()
+    gpio.set_rc_charge_time(PIN_LDR_RC, 0.004)
+    sensor = LightSensor(adc=Adc(), gpio=gpio, rc_mode="edge")
+    sensor.calibrate_rc()
+    assert sensor._rc_baseline == pytest.approx(4000, rel=1e-3)
+    return sensor, gpio, sim_clock
+
+
+def test_missed_edges_are_left_out_of_the_average(sensor):
+    sensor, gpio, clock = sensor
+    timeouts, missed = _count("rc_timeouts"), _count("rc_missed_edges")
+    gpio.miss_edges(PIN_LDR_RC, 4)   # deux mesures sur cinq : front manqué deux fois
+    start = clock.monotonic()
+    assert sensor._rc_average(5) == pytest.approx(4000, rel=1e-3)
+    # Un front manqué coûte une tranche d'attente, pas tout _RC_TIMEOUT
+    assert clock.monotonic() - start < 5 * (sensor._RC_DISCHARGE + sensor._RC_DELAY + 0.004) \
+        + 4 * (sensor._RC_EDGE_SLICE + sensor._RC_DISCHARGE)
+    assert _count("rc_missed_edges") - missed == 4
+    assert _count("rc_timeouts") == timeouts
+
+
+def test_only_missed_edges_keep_the_state(sensor):
+    sensor, gpio, _ = sensor
+    timeouts = _count("rc_timeouts")
+    gpio.miss_edges(PIN_LDR_RC, 2 * sensor._RC_N)
+    assert sensor._rc_average(sensor._RC_N) is None
+    sensor.read()
+    assert not sensor.is_dark and _count("rc_timeouts") == timeouts
+
+
+def test_real_timeout_reads_dark(sensor):
+    sensor, gpio, _ = sensor
+    timeouts = _count("rc_timeouts")
+    gpio.set_rc_charge_time(PIN_LDR_RC, 2.0)   # LDR dans le noir : pas de front avant _RC_TIMEOUT
+    sensor.read()
+    assert sensor.is_dark and _count("rc_timeouts") - timeouts == sensor._RC_N
+    gpio.set_rc_charge_time(PIN_LDR_RC, 0.004)
+    sensor.read()
+    assert not sensor.is_dark
+
+
+def test_dark_boots_keep_the_stored_baseline(sim_clock, tmp_path):
+    gpio, path = hal.gpio(), str(tmp_path / "rc_calibration.json")
+    gpio.set_rc_charge_time(PIN_LDR_RC, 0.004)
+    assert _boot(gpio, Adc(200), path)._rc_baseline == pytest.approx(4000, rel=1e-3)
+    gpio.set_rc_charge_time(PIN_LDR_RC, 0.008)   # nuit : charge deux fois plus lente
+    for _ in range(RC_CALIBRATION_CONFIRM + 1):
+        sensor = _boot(gpio, Adc(10), path)
+    assert sensor._rc_baseline == pytest.approx(4000, rel=1e-3)
+    # De jour, des revalidations concordantes remplacent toujours une baseline mémorisée fausse
+    for _ in range(RC_CALIBRATION_CONFIRM):
+        sensor = _boot(gpio, Adc(200), path)
+    assert sensor._rc_baseline == pytest.approx(8000, rel=1e-3)
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from mqtt.outbox import Outbox, _BODY, _HEADER
+
+TOPIC  = "jardin/capteurs"
+RECORD = _HEADER.size + _BODY.size + len(TOPIC) + len("m0000")   # taille fixe d'un message de test
+
+
+def _fill(outbox, start, count):
+    for i in range(start, start + count):
+        outbox.append(TOPIC, f"m{i:04d}", ts=1_700_000_000 + i)
+
+
+def _drain(outbox, batch=4):
+    """Vide la file comme MqttClient._send_batch (lot confirmé → commit) ; payloads dans l'ordre."""
+    sent = []
+    for _ in range(10000):
+        records, position = outbox.read_batch(batch)
+        if position is None:
+            return sent
+        sent += [payload.decode() for _, _, payload, _ in records]
+        outbox.commit(position)
+    raise AssertionError("la file ne se vide pas")
+
+
+def _segments(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+def _numbers(payloads):
+    return [int(p[1:]) for p in payloads]
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "outbox")
+
+
+def test_resumes_from_checkpoint(directory):
+    outbox = Outbox(directory, segment_bytes=256)
+    _fill(outbox, 0, 20)
+    records, position = outbox.read_batch(5)
+    assert [r[1] for r in records] == [TOPIC] * 5
+    outbox.commit(position)
+    records, _ = outbox.read_batch(5)   # envoyé mais jamais confirmé
+    outbox.close()
+
+    outbox = Outbox(directory, segment_bytes=256)
+    assert _numbers(_drain(outbox)) == list(range(5, 20))   # lot non confirmé renvoyé
+    assert outbox.empty() and outbox.pending_bytes == 0
+    assert _segments(directory) == []
+
+
+def test_truncated_tail_is_dropped_on_open(directory):
+    outbox = Outbox(directory)
+    _fill(outbox, 0, 5)
+    outbox.close()
+    path = _segments(directory)[-1]
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x30\x00\x00\x00partiel")   # coupure de courant pendant l'écriture
+
+    outbox = Outbox(directory)
+    assert os.path.getsize(path) == size
+    _fill(outbox, 5, 3)   # les ajouts suivants restent lisibles
+    assert _numbers(_drain(outbox)) == list(range(8))
+
+
+def test_corrupt_record_skips_rest_of_segment(directory):
+    outbox = Outbox(directory, segment_bytes=256)
+    _fill(outbox, 0, 30)
+    outbox.close()
+    first = _segments(directory)[0]
+    with open(first, "rb") as f:
+        data = bytearray(f.read())
+    data[RECORD + 20] ^= 0xFF   # corps du 2e enregistrement : CRC faux
+    with open(first, "wb") as f:
+        f.write(data)
+
+    outbox = Outbox(directory, segment_bytes=256)
+    sent = _numbers(_drain(outbox))
+    assert sent == [0] + list(range(256 // RECORD, 30))   # fin du segment abîmé perdue, la suite est envoyée
+    assert outbox.empty()
+
+
+def test_eviction_drops_oldest_segments_first(directory):
+    outbox = Outbox(directory, max_bytes=1000, segment_bytes=256)
+    _fill(outbox, 0, 200)
+    assert outbox.pending_bytes <= 1000
+    assert len(_segments(directory)) <= 5
+    sent = _numbers(_drain(outbox))
+    assert sent == list(range(sent[0], 200))   # suffixe contigu : seuls les plus anciens ont disparu
+    assert sent[0] > 0
+
+
+def test_eviction_after_partial_send(directory):
+    outbox = Outbox(directory, max_bytes=600, segment_bytes=256)
+    _fill(outbox, 0, 10)
+    records, position = outbox.read_batch(3)
+    outbox.commit(position)
+    _fill(outbox, 10, 30)   # dépasse max_bytes : le segment en cours d'envoi est évincé
+    pending = outbox.pending_bytes
+    sent = _numbers(_drain(outbox))
+    assert sent == list(range(sent[0], 40)) and sent[0] > 3
+    assert pending == RECORD * len(sent)
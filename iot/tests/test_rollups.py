@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from utils.database import DatabaseManager, ROLLUPS, SENSOR_COLUMNS
+
+T0 = 1_700_000_007_300   # not aligned on a minute
+STEP = 7_000
+
+
+def _readings():
+    """~4 h of irregular readings: NULLs, a gap, an anomaly score that starts late."""
+    rows = []
+    for i in range(2200):
+        if 400 <= i < 460:
+            continue   # sensor outage: empty minutes
+        rows.append((
+            20 + (i % 17) * 0.5,                         # temperature
+            None if i % 11 == 0 else 40.0 + i % 9,       # humidity
+            float(i % 255),                              # soil_moisture
+            (i * 37) % 1000,                             # light_intensity
+            None,                                        # water_level: no sensor
+            T0 + i * STEP + (i % 3) * 100,               # ts
+            None if i < 300 else (i % 5) / 10,           # anomaly_score
+        ))
+    return rows
+
+
+def _expected(rows, size, lo=None, hi=None):
+    """bucket → (n, then count, min, max, mean per column), from the raw rows."""
+    buckets = {}
+    for row in rows:
+        ts = row[5]
+        if (lo is not None and ts < lo) or (hi is not None and ts >= hi):
+            continue
+        buckets.setdefault(ts // size * size, []).append(row)
+    out = {}
+    for bucket, members in buckets.items():
+        stats = [len(members)]
+        for value_index in (0, 1, 2, 3, 4, 6):   # SENSOR_COLUMNS order
+            values = [m[value_index] for m in members if m[value_index] is not None]
+            stats += [len(values), min(values, default=None), max(values, default=None),
+                      sum(values) / len(values) if values else None]
+        out[bucket] = stats
+    return out
+
+
+def _assert_stats(actual, expected):
+    assert actual[0] == expected[0]
+    for i in range(1, len(expected), 4):
+        assert actual[i:i + 3] == pytest.approx(expected[i:i + 3])
+        assert actual[i + 3] == pytest.approx(expected[i + 3], rel=1e-9)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "garden.db")
+    db = DatabaseManager(path, batch_size=64, flush_interval=60)   # rollups updated at every group commit
+    rows = _readings()
+    for temp, hum, soil, light, water, ts, score in rows:
+        db.save_reading(temp, hum, soil, light, water, ts=ts, anomaly_score=score)
+    assert db.flush(timeout=30)
+    yield db, path, rows
+    db.close()
+
+
+@pytest.mark.parametrize("name,size", ROLLUPS[:2])
+def test_rollup_buckets_match_raw_rows(db, name, size):
+    _, path, rows = db
+    conn = sqlite3.connect(path)
+    try:
+        watermark = conn.execute("SELECT watermark FROM rollup_state WHERE resolution = ?", (name,)).fetchone()[0]
+        table = {row[0]: list(row[1:]) for row in conn.execute(f"SELECT * FROM readings_{name}")}
+    finally:
+        conn.close()
+    expected = _expected(rows, size, hi=watermark)
+    assert len(expected) >= 2
+    assert sorted(table) == sorted(expected)   # every complete bucket, no empty one, nothing past the watermark
+    for bucket, stats in expected.items():
+        _assert_stats(table[bucket], stats)
+
+
+def test_history_includes_the_incomplete_tail(db):
+    manager, _, rows = db
+    start, end = T0 - 60_000, rows[-1][5] + 1
+    expected = _expected(rows, 60_000, lo=start, hi=end)
+    history = list(manager.query_history(start, end, max_points=len(expected) + 10))
+    assert manager.pick_resolution(start, end, len(expected) + 10) == "1m"
+    assert [h[0] for h in history] == sorted(expected)
+    for bucket, n, *values in history:
+        stats = expected[bucket]
+        assert n == stats[0]
+        for column in range(len(SENSOR_COLUMNS)):
+            _, low, high, mean = stats[1 + 4 * column:5 + 4 * column]
+            assert values[3 * column:3 * column + 3] == pytest.approx([mean, low, high])
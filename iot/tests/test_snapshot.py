@@ -0,0 +1,64 @@
+import pytest
+
+from mqtt.snapshot import StateCache
+from mqtt.telemetry import TelemetryEncoder
+
+TS = 1_700_000_000_000
+
+
+@pytest.fixture
+def garden():
+    """Encodeur et état retenu d'un même démarrage ; 8 trames dans un anneau de 5."""
+    encoder = TelemetryEncoder("frame", "json", legacy_interval=0)
+    cache = StateCache(encoder.boot, window=5)
+    for i in range(8):
+        encoder.messages(20 + i, 50, 100 * i, False, 0, 120, 0, ts=TS + i * 2000)
+        cache.add(encoder.last_row)
+    return encoder, cache
+
+
+def test_full_snapshot_holds_the_window_in_columns(garden):
+    encoder, cache = garden
+    state = cache.snapshot()
+    assert state["full"] and state["s"] == 8 and state["b"] == encoder.boot
+    assert state["w"]["s"] == [4, 5, 6, 7, 8]
+    assert state["w"]["T"] == [23, 24, 25, 26, 27]
+    assert state["w"]["t"] == [TS + i * 2000 for i in range(3, 8)]
+    assert "b" not in state["w"]   # porté une fois par le message, pas par trame
+
+
+def test_delta_since_a_seq_still_in_the_ring(garden):
+    encoder, cache = garden
+    state = cache.snapshot(since=6, boot=encoder.boot)
+    assert not state["full"] and state["s"] == 8
+    assert state["w"]["s"] == [7, 8]
+    up_to_date = cache.snapshot(since=8, boot=encoder.boot)
+    assert not up_to_date["full"] and up_to_date["w"] == {}
+    assert cache.snapshot(since=3, boot=encoder.boot)["w"]["s"] == [4, 5, 6, 7, 8]   # juste avant l'anneau
+
+
+@pytest.mark.parametrize("since,boot_delta", [(2, 0), (9, 0), (6, 1), (None, 0)])
+def test_full_window_when_the_delta_cannot_be_served(garden, since, boot_delta):
+    # Trop ancien (évincé), en avance sur nous, autre démarrage, ou pas de seq
+    encoder, cache = garden
+    state = cache.snapshot(since=since, boot=encoder.boot + boot_delta)
+    assert state["full"] and state["w"]["s"] == [4, 5, 6, 7, 8]
+
+
+def test_anomaly_scores_follow_the_frames(garden):
+    encoder, cache = garden
+    cache.add_anomaly({"score": 0.12, "anomaly": True})
+    encoder.messages(30, 50, 0, False, 0, 120, 0, ts=TS + 20_000)
+    cache.add(encoder.last_row)
+    cache.add_anomaly({"score": -0.05, "anomaly": False})
+    state = cache.snapshot()
+    assert state["a"] == {"score": -0.05, "anomaly": False, "t": TS + 20_000}
+    assert state["A"] == [[TS + 14_000, 0.12], [TS + 20_000, -0.05]]
+    assert cache.snapshot(since=8, boot=encoder.boot)["A"] == [[TS + 20_000, -0.05]]
+
+
+def test_empty_cache():
+    cache = StateCache(boot=1, window=5)
+    state = cache.snapshot()
+    assert state["s"] == 0 and state["w"] == {} and state["A"] == []
+    assert not cache.snapshot(since=0, boot=1)["full"]
@@ -0,0 +1,77 @@
+import json
+import struct
+
+import pytest
+
+from config import TOPIC_TELEMETRY, TOPIC_SENSORS_TEMP
+from mqtt.telemetry import TelemetryEncoder, decode_frame, BINARY_FORMAT, _FRAME_V1
+
+TS = 1_700_000_000_123
+READING = dict(temp=21.37, hum=48.04, lux=512.4, is_dark=False, light_intensity=80, rain_pct=131.6,
+               rain_digital=1, pump_on=True)
+
+
+def _frame(encoder, ts=TS, **changes):
+    (topic, payload), *legacy = encoder.messages(ts=ts, **dict(READING, **changes))
+    assert topic == TOPIC_TELEMETRY
+    return payload, legacy
+
+
+@pytest.mark.parametrize("encoding", ["json", "binary"])
+def test_round_trip(encoding):
+    encoder = TelemetryEncoder("frame", encoding, legacy_interval=0)
+    payload, legacy = _frame(encoder)
+    assert legacy == []
+    frame = decode_frame(payload)
+    # Même résolution dans les deux encodages : 0,1 °C / 0,1 %, lux et ADC entiers
+    assert frame["seq"] == 1 and frame["ts"] == TS and frame["boot"] == encoder.boot
+    assert frame["temperature"] == 21.4 and frame["humidity"] == 48.0
+    assert frame["light"] == 512 and frame["rain_pct"] == 132 and frame["intensity"] == 80
+    assert (frame["is_dark"], frame["rain_digital"], frame["pump_on"]) == (False, 1, True)
+    assert decode_frame(_frame(encoder, is_dark=True, pump_on=False)[0])["seq"] == 2
+
+
+@pytest.mark.parametrize("encoding", ["json", "binary"])
+def test_missing_values_round_trip(encoding):
+    encoder = TelemetryEncoder("frame", encoding, legacy_interval=0)
+    payload, _ = _frame(encoder, temp=None, hum=None, lux=None, light_intensity=None, rain_pct=None)
+    frame = decode_frame(payload)
+    assert [frame[k] for k in ("temperature", "humidity", "light", "intensity", "rain_pct")] == [None] * 5
+
+
+def test_binary_frame_is_fixed_size_and_clamped():
+    encoder = TelemetryEncoder("frame", "binary", legacy_interval=0)
+    payload, _ = _frame(encoder, temp=5000, hum=-5, lux=10 ** 6, light_intensity=300)
+    assert len(payload) == struct.calcsize(BINARY_FORMAT) == 27
+    frame = decode_frame(payload)
+    assert frame["temperature"] == 3276.7 and frame["humidity"] == 0
+    assert frame["light"] == 65534 and frame["intensity"] == 254
+
+
+def test_version_1_binary_frames_still_decode():
+    # Trame d'avant l'identifiant de démarrage, encore possible dans la file hors connexion
+    payload = _FRAME_V1.pack(1, 42, TS, 214, 480, 512, 132, 80, 0b101)
+    frame = decode_frame(payload)
+    assert frame["version"] == 1 and frame["boot"] is None
+    assert (frame["seq"], frame["ts"], frame["temperature"], frame["humidity"]) == (42, TS, 21.4, 48.0)
+    assert (frame["is_dark"], frame["rain_digital"], frame["pump_on"]) == (True, 0, True)
+
+
+def test_seq_wraps_at_32_bits():
+    encoder = TelemetryEncoder("frame", "binary", legacy_interval=0)
+    encoder.seq = 0xFFFFFFFF
+    assert decode_frame(_frame(encoder)[0])["seq"] == 0
+
+
+def test_legacy_topics_every_interval():
+    encoder = TelemetryEncoder("frame", "json", legacy_interval=60)
+    assert len(_frame(encoder)[1]) == 3
+    assert _frame(encoder, ts=TS + 30_000)[1] == []
+    legacy = _frame(encoder, ts=TS + 60_000)[1]
+    assert legacy[0] == (TOPIC_SENSORS_TEMP, json.dumps({"temperature": 21.37, "humidity": 48.04}))
+
+
+def test_legacy_mode_publishes_only_the_historic_topics():
+    encoder = TelemetryEncoder("legacy", "json")
+    topics = [topic for topic, _ in encoder.messages(ts=TS, **READING)]
+    assert len(topics) == 3 and TOPIC_TELEMETRY not in topics
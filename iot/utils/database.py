@@ -1,29 +1,96 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
 from datetime import datetime
+from config import DB_BATCH_SIZE, DB_FLUSH_INTERVAL, LOOP_INTERVAL
 from utils.logger import logger
+from utils.metrics import metrics
 
 DB_NAME = "garden.db"
 
+# Bump when _migrate() learns a new step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 4
+
+# Sensor columns that may be requested through query_range(); new columns are
+# appended (rollup tables are read positionally, in this order)
+SENSOR_COLUMNS = ("temperature", "humidity", "soil_moisture", "light_intensity", "water_level",
+                  "anomaly_score")
+
+QUERY_CHUNK_SIZE = 1000
+
+# Rollup tables, finest first: (name, bucket size in ms). Buckets are aligned
+# on the epoch, so daily buckets are UTC days.
+ROLLUPS = (
+    ("1m", 60 * 1000),
+    ("1h", 60 * 60 * 1000),
+    ("1d", 24 * 60 * 60 * 1000),
+)
+HISTORY_MAX_POINTS = 500
+
+# Sentinels understood by the writer thread
+_FLUSH = object()
+_STOP  = object()
+
+
+def epoch_ms(value=None):
+    """Converts a datetime / epoch milliseconds (returned as int) / None (now) to integer epoch milliseconds."""
+    if value is None:
+        return int(time.time() * 1000)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
 class DatabaseManager:
-    def __init__(self):
-        self.conn = None
+    """
+    SQLite storage with a write-behind buffer.
+
+    save_reading() only enqueues the row; a dedicated writer thread owns one
+    long-lived WAL connection and commits rows in groups, as soon as
+    `batch_size` rows are pending or `flush_interval` seconds have elapsed
+    since the oldest pending row. close() flushes everything on shutdown.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL):
+        self.db_name        = db_name
+        self.batch_size     = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.conn           = None
+
+        self._queue  = queue.Queue()
+        self._writer = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "rows_enqueued":  0,
+            "rows_written":   0,
+            "rows_failed":    0,
+            "flushes":        0,
+            "last_flush_ms":  0.0,
+            "max_flush_ms":   0.0,
+            "total_flush_ms": 0.0,
+        }
+        self._started_at = time.monotonic()
+
         self.init_db()
+        self._start_writer()
 
     def get_connection(self):
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = sqlite3.connect(self.db_name)
             return conn
         except sqlite3.Error as e:
             logger.error(f"Database error: {e}")
             return None
 
     def init_db(self):
-        """Creates the readings table if it doesn't exist."""
+        """Creates the readings table if it doesn't exist, switches the file to WAL mode and migrates it."""
         try:
             conn = self.get_connection()
             if conn:
                 cursor = conn.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS readings (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,58 +99,508 @@ class DatabaseManager:
                         humidity REAL,
                         soil_moisture REAL,
                         light_intensity INTEGER,
-                        water_level REAL
+                        water_level REAL,
+                        ts INTEGER,
+                        anomaly_score REAL
                     )
                 """)
                 conn.commit()
+                self._migrate(conn)
                 conn.close()
                 logger.info("Database initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
 
-    def save_reading(self, temp, hum, soil, light, water_level):
-        """Saves a new sensor reading."""
+    def _migrate(self, conn):
+        """
+        Upgrades an existing database to SCHEMA_VERSION.
+
+        v1: `ts` = acquisition time in integer epoch milliseconds, backfilled
+            from the legacy text `timestamp` (UTC), plus a covering index on
+            (ts, sensor columns) so range queries never touch the table.
+        v2: rollup tables.
+        v3: export high-water marks.
+        v4: `anomaly_score` (smoothed IsolationForest score) in the readings,
+            the covering index and the rollups. The single-file CSV export
+            is rebuilt once so its header gains the new column.
+        """
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 1:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(readings)")]
+            with conn:
+                if "ts" not in columns:
+                    conn.execute("ALTER TABLE readings ADD COLUMN ts INTEGER")
+                conn.execute("""
+                    UPDATE readings
+                    SET ts = CAST(strftime('%s', timestamp) AS INTEGER) * 1000
+                    WHERE ts IS NULL
+                """)
+                indexed = [c for c in SENSOR_COLUMNS if c in columns]
+                conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_readings_ts
+                    ON readings (ts, {", ".join(indexed)})
+                """)
+                conn.execute("PRAGMA user_version = 1")
+            logger.info("Database migrated to schema v1 (epoch-ms timestamps).")
+
+        if version < 2:
+            stats = ", ".join(
+                f"{c}_count INTEGER, {c}_min REAL, {c}_max REAL, {c}_mean REAL" for c in SENSOR_COLUMNS
+            )
+            with conn:
+                for name, _ in ROLLUPS:
+                    conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS readings_{name} (
+                            bucket INTEGER PRIMARY KEY,
+                            n INTEGER,
+                            {stats}
+                        )
+                    """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS rollup_state (
+                        resolution TEXT PRIMARY KEY,
+                        watermark INTEGER
+                    )
+                """)
+                conn.execute("PRAGMA user_version = 2")
+            logger.info("Database migrated to schema v2 (rollup tables).")
+
+        if version < 3:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS export_state (
+                        target TEXT PRIMARY KEY,
+                        last_id INTEGER
+                    )
+                """)
+                conn.execute("PRAGMA user_version = 3")
+            logger.info("Database migrated to schema v3 (export high-water marks).")
+
+        if version < 4:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(readings)")]
+            with conn:
+                if "anomaly_score" not in columns:
+                    conn.execute("ALTER TABLE readings ADD COLUMN anomaly_score REAL")
+                conn.execute("DROP INDEX IF EXISTS idx_readings_ts")
+                conn.execute(f"""
+                    CREATE INDEX idx_readings_ts
+                    ON readings (ts, {", ".join(SENSOR_COLUMNS)})
+                """)
+                for name, _ in ROLLUPS:
+                    existing = [row[1] for row in conn.execute(f"PRAGMA table_info(readings_{name})")]
+                    if "anomaly_score_count" not in existing:
+                        for stat, kind in (("count", "INTEGER"), ("min", "REAL"), ("max", "REAL"), ("mean", "REAL")):
+                            conn.execute(f"ALTER TABLE readings_{name} ADD COLUMN anomaly_score_{stat} {kind}")
+                conn.execute("DELETE FROM export_state WHERE target LIKE '%|single%'")
+                conn.execute("PRAGMA user_version = 4")
+            logger.info("Database migrated to schema v4 (anomaly scores).")
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    def _open_writer_connection(self):
+        """Long-lived connection used only by the writer thread."""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode, NORMAL only fsyncs at checkpoints: a power cut can lose
+        # the last group commit but never corrupts the database.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _start_writer(self):
         try:
-            conn = self.get_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO readings (temperature, humidity, soil_moisture, light_intensity, water_level)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (temp, hum, soil, light, water_level))
-                conn.commit()
-                conn.close()
-                logger.debug("Sensor reading saved to database.")
+            self.conn = self._open_writer_connection()
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e}")
+            self.conn = None
+            return
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    def save_reading(self, temp, hum, soil, light, water_level, ts=None, anomaly_score=None):
+        """
+        Queues a new sensor reading (never blocks on disk).
+        ts = acquisition time in epoch milliseconds (defaults to now).
+        anomaly_score = smoothed AnomalyDetector score at that time, if any.
+        """
+        if ts is None:
+            ts = epoch_ms()
+        self._queue.put((temp, hum, soil, light, water_level, ts, anomaly_score))
+        with self._stats_lock:
+            self._stats["rows_enqueued"] += 1
+
+    def flush(self, timeout=None):
+        """Blocks until every reading queued so far has been committed."""
+        if self._writer is None or not self._writer.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Flushes pending readings and stops the writer thread."""
+        if self._writer is None:
+            return
+        self._queue.put((_STOP, None))
+        self._writer.join(timeout)
+        self._writer = None
+        if self.conn:
+            try:
+                self.conn.close()
+            except sqlite3.Error as e:
+                logger.error(f"Database error: {e}")
+            self.conn = None
+        logger.info("Database closed.")
+
+    def _writer_loop(self):
+        pending = []
+        oldest  = None   # monotonic time of the oldest pending row
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - oldest))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item[0] is _FLUSH:
+                self._commit(pending)
+                pending, oldest = [], None
+                item[1].set()
+                continue
+            if item is not None and item[0] is _STOP:
+                self._commit(pending)
+                return
+
+            if item is not None:
+                if not pending:
+                    oldest = time.monotonic()
+                pending.append(item)
+
+            if pending and (len(pending) >= self.batch_size
+                            or time.monotonic() - oldest >= self.flush_interval):
+                self._commit(pending)
+                pending, oldest = [], None
+
+    def _commit(self, rows):
+        """Inserts a group of rows in a single transaction."""
+        if not rows or self.conn is None:
+            return
+        start = time.perf_counter()
+        try:
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT INTO readings (temperature, humidity, soil_moisture, light_intensity, water_level,
+                                          ts, anomaly_score)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                self._update_rollups(self.conn)
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            metrics.observe("db.commit", int(elapsed_ms * 1e6))
+            with self._stats_lock:
+                self._stats["rows_written"]   += len(rows)
+                self._stats["flushes"]        += 1
+                self._stats["last_flush_ms"]   = elapsed_ms
+                self._stats["max_flush_ms"]    = max(self._stats["max_flush_ms"], elapsed_ms)
+                self._stats["total_flush_ms"] += elapsed_ms
+            logger.debug("Database: %d readings committed in %.1f ms.", len(rows), elapsed_ms)
         except Exception as e:
-            logger.error(f"Failed to save reading: {e}")
+            with self._stats_lock:
+                self._stats["rows_failed"] += len(rows)
+            metrics.incr("db_errors")
+            logger.error(f"Failed to save {len(rows)} readings: {e}")
+
+    # ------------------------------------------------------------------
+    # Rollups (1 min / 1 h / 1 day)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _aggregate_sql(source, size, columns):
+        """
+        SELECT producing rollup rows of `size` ms from `source`
+        (None = raw readings, else the name of a finer rollup).
+        Row layout: bucket, n, then (count, min, max, mean) per column.
+        """
+        if source is None:
+            parts = [f"COUNT({c}), MIN({c}), MAX({c}), AVG({c})" for c in columns]
+            return (f"SELECT (ts / {size}) * {size} AS b, COUNT(*), {', '.join(parts)} "
+                    f"FROM readings WHERE ts >= ? AND ts < ? GROUP BY b ORDER BY b")
+        parts = [f"SUM({c}_count), MIN({c}_min), MAX({c}_max), "
+                 f"SUM({c}_mean * {c}_count) / NULLIF(SUM({c}_count), 0)" for c in columns]
+        return (f"SELECT (bucket / {size}) * {size} AS b, SUM(n), {', '.join(parts)} "
+                f"FROM readings_{source} WHERE bucket >= ? AND bucket < ? GROUP BY b ORDER BY b")
+
+    @staticmethod
+    def _watermarks(conn):
+        return dict(conn.execute("SELECT resolution, watermark FROM rollup_state"))
+
+    def _update_rollups(self, conn):
+        """
+        Computes every rollup bucket that became complete since the last call.
+
+        The watermark of a resolution is the end of its last computed bucket:
+        buckets are only ever computed once, from the raw rows for 1 min and
+        from the next finer rollup for 1 h / 1 day. A bucket is complete when
+        the source has moved past its end (rows land in acquisition order, so
+        a reading older than the 1 min watermark is not rolled up).
+        """
+        watermarks = self._watermarks(conn)
+        source, source_end = None, conn.execute("SELECT MAX(ts) FROM readings").fetchone()[0]
+        for name, size in ROLLUPS:
+            if source_end is None:
+                return
+            limit = (source_end // size) * size
+            start = watermarks.get(name)
+            if start is None:
+                if source is None:
+                    first = conn.execute("SELECT MIN(ts) FROM readings").fetchone()[0]
+                else:
+                    first = conn.execute(f"SELECT MIN(bucket) FROM readings_{source}").fetchone()[0]
+                start = (first // size) * size if first is not None else limit
+            if limit > start:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO readings_{name} "
+                    f"{self._aggregate_sql(source, size, SENSOR_COLUMNS)}",
+                    (start, limit),
+                )
+                conn.execute("INSERT OR REPLACE INTO rollup_state VALUES (?, ?)", (name, limit))
+                start = limit
+            source, source_end = name, start
+
+    def pick_resolution(self, start, end, max_points=HISTORY_MAX_POINTS):
+        """
+        Returns the finest resolution ('raw', '1m', '1h' or '1d') whose number
+        of points over [start, end) fits in `max_points` ('1d' if none does).
+        """
+        span = max(0, epoch_ms(end) - epoch_ms(start))
+        if span / (LOOP_INTERVAL * 1000) <= max_points:
+            return "raw"
+        for name, size in ROLLUPS:
+            if span / size <= max_points:
+                return name
+        return ROLLUPS[-1][0]
+
+    def query_history(self, start, end, columns=None, max_points=HISTORY_MAX_POINTS):
+        """
+        Resolution-aware history: streams (bucket, n, mean, min, max per column)
+        tuples for [start, end), oldest first, at the resolution chosen by
+        pick_resolution(). Raw rows come out as (ts, 1, v, v, v, ...).
+
+        Completed buckets are read straight from the rollup table; the part of
+        the range past its watermark is aggregated from the finer rollups and
+        the raw tail, so the cost is O(buckets) rather than O(rows).
+        """
+        columns = tuple(columns) if columns else SENSOR_COLUMNS
+        resolution = self.pick_resolution(start, end, max_points)
+        if resolution == "raw":
+            for row in self.query_range(start, end, columns):
+                values = []
+                for v in row[1:]:
+                    values += (v, v, v)
+                yield (row[0], 1, *values)
+            return
+
+        unknown = [c for c in columns if c not in SENSOR_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+
+        levels = [name for name, _ in ROLLUPS]
+        size   = dict(ROLLUPS)[resolution]
+        lo     = (epoch_ms(start) // size) * size
+        end    = epoch_ms(end)
+
+        conn = self.get_connection()
+        if conn is None:
+            return
+        try:
+            watermarks = self._watermarks(conn)
+            # Coarsest source first: the target rollup, then finer ones, then raw rows
+            sources = levels[:levels.index(resolution) + 1][::-1] + [None]
+            pending = None
+            for source in sources:
+                hi = end if source is None else min(end, watermarks.get(source) or lo)
+                if hi <= lo:
+                    continue
+                if source == resolution:
+                    sql = (f"SELECT * FROM readings_{source} "
+                           f"WHERE bucket >= ? AND bucket < ? ORDER BY bucket")
+                    picked = [2 + 4 * SENSOR_COLUMNS.index(c) for c in columns]
+                else:
+                    sql = self._aggregate_sql(source, size, columns)
+                    picked = [2 + 4 * i for i in range(len(columns))]
+                cursor = conn.execute(sql, (lo, hi))
+                while True:
+                    rows = cursor.fetchmany(QUERY_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        row = (row[0], row[1], *[v for i in picked for v in row[i:i + 4]])
+                        if pending is not None and pending[0] == row[0]:
+                            pending = self._merge_buckets(pending, row)
+                            continue
+                        if pending is not None:
+                            yield self._format_bucket(pending)
+                        pending = row
+                lo = hi
+            if pending is not None:
+                yield self._format_bucket(pending)
+        finally:
+            conn.close()
 
-    def export_to_csv(self):
-        """Exports all data to a CSV file in the frontend public folder."""
+    @staticmethod
+    def _merge_buckets(a, b):
+        """Combines two partial rows of the same bucket (count, min, max, mean per column)."""
+        merged = [a[0], a[1] + b[1]]
+        for i in range(2, len(a), 4):
+            ca, cb = a[i] or 0, b[i] or 0
+            mins = [v for v in (a[i + 1], b[i + 1]) if v is not None]
+            maxs = [v for v in (a[i + 2], b[i + 2]) if v is not None]
+            mean = ((a[i + 3] or 0) * ca + (b[i + 3] or 0) * cb) / (ca + cb) if ca + cb else None
+            merged += [ca + cb, min(mins) if mins else None, max(maxs) if maxs else None, mean]
+        return tuple(merged)
+
+    @staticmethod
+    def _format_bucket(row):
+        """(bucket, n, count, min, max, mean, ...) → (bucket, n, mean, min, max, ...)."""
+        out = [row[0], row[1]]
+        for i in range(2, len(row), 4):
+            out += (row[i + 3], row[i + 1], row[i + 2])
+        return tuple(out)
+
+    def get_stats(self):
+        """Returns insert throughput and flush latency counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        total_ms = stats.pop("total_flush_ms")
+        stats["pending"]        = self._queue.qsize()
+        stats["rows_per_sec"]   = stats["rows_written"] / uptime
+        stats["avg_flush_ms"]   = total_ms / stats["flushes"] if stats["flushes"] else 0.0
+        stats["rows_per_flush"] = stats["rows_written"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def query_range(self, start, end, columns=None, chunk_size=QUERY_CHUNK_SIZE):
+        """
+        Streams readings with start <= ts < end, oldest first.
+
+        start / end: epoch milliseconds or datetime.
+        columns:     subset of SENSOR_COLUMNS (default: all of them).
+        Yields tuples (ts, *columns), fetched `chunk_size` rows at a time, so
+        the whole range is never materialised. Readings still sitting in the
+        write-behind buffer are not visible until the next group commit.
+        """
+        columns = tuple(columns) if columns else SENSOR_COLUMNS
+        unknown = [c for c in columns if c not in SENSOR_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+
+        conn = self.get_connection()
+        if conn is None:
+            return
+        try:
+            cursor = conn.execute(f"""
+                SELECT ts, {", ".join(columns)}
+                FROM readings
+                WHERE ts >= ? AND ts < ?
+                ORDER BY ts
+            """, (epoch_ms(start), epoch_ms(end)))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def export_to_csv(self, export_path=None, rotate_daily=False, compress=False):
+        """
+        Exports readings to CSV (default: frontend/public/report.csv), oldest first.
+
+        The export is incremental: the id of the last exported row is kept as a
+        high-water mark in `export_state`, so repeated calls only append new
+        rows and the cursor is consumed in chunks. If the file disappeared, it
+        is rebuilt from scratch.
+
+        rotate_daily: writes one segment per UTC day (report-YYYY-MM-DD.csv).
+        compress:     gzip the output (appends add a new gzip member).
+        """
         import csv
-        
-        # Path to frontend/public
-        # Current file is in iot/utils/
-        # We need to go up to iot/ -> smart/ -> frontend/ -> public/
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        export_path = os.path.join(base_dir, 'frontend', 'public', 'report.csv')
-        
+        import gzip
+
+        if export_path is None:
+            # Path to frontend/public
+            # Current file is in iot/utils/
+            # We need to go up to iot/ -> smart/ -> frontend/ -> public/
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            export_path = os.path.join(base_dir, 'frontend', 'public', 'report.csv')
+
+        root, ext = os.path.splitext(export_path)
+        suffix = ".gz" if compress else ""
+        target = f"{os.path.abspath(export_path)}|{'daily' if rotate_daily else 'single'}{suffix}"
+
+        def segment_path(row, ts_index):
+            if not rotate_daily:
+                return export_path + suffix
+            ts = row[ts_index]
+            day = time.strftime("%Y-%m-%d", time.gmtime(ts / 1000)) if ts is not None else str(row[1])[:10]
+            return f"{root}-{day}{ext}{suffix}"
+
         try:
             conn = self.get_connection()
             if conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM readings ORDER BY timestamp DESC")
-                rows = cursor.fetchall()
-                
-                # Get column names
-                headers = [description[0] for description in cursor.description]
-                
-                with open(export_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(headers)
-                    writer.writerows(rows)
-                
-                conn.close()
-                logger.info(f"Data exported successfully to {export_path}")
+                out_path, out_file, writer = None, None, None
+                try:
+                    row = conn.execute("SELECT last_id FROM export_state WHERE target = ?", (target,)).fetchone()
+                    last_id = row[0] if row else 0
+                    if not rotate_daily and not os.path.exists(export_path + suffix):
+                        last_id = 0
+                    fresh = last_id == 0   # fichier unique reconstruit depuis le début
+
+                    cursor = conn.execute("SELECT * FROM readings WHERE id > ? ORDER BY id", (last_id,))
+                    headers = [description[0] for description in cursor.description]
+                    ts_index = headers.index("ts")
+
+                    exported = 0
+                    while True:
+                        rows = cursor.fetchmany(QUERY_CHUNK_SIZE)
+                        if not rows:
+                            break
+                        for row in rows:
+                            path = segment_path(row, ts_index)
+                            if path != out_path:
+                                if out_file:
+                                    out_file.close()
+                                truncate = fresh and not rotate_daily
+                                new_file = truncate or not os.path.exists(path)
+                                mode = "wt" if truncate else "at"
+                                opener = gzip.open if compress else open
+                                out_file = opener(path, mode, newline='')
+                                out_path = path
+                                writer = csv.writer(out_file)
+                                if new_file:
+                                    writer.writerow(headers)
+                                fresh = False
+                            writer.writerow(row)
+                        out_file.flush()
+                        last_id = rows[-1][0]
+                        exported += len(rows)
+                        with conn:
+                            conn.execute("INSERT OR REPLACE INTO export_state VALUES (?, ?)", (target, last_id))
+                finally:
+                    if out_file:
+                        out_file.close()
+                    conn.close()
+
+                logger.info(f"Data exported successfully to {export_path} ({exported} new rows)")
                 return True
         except Exception as e:
             logger.error(f"Failed to export data: {e}")
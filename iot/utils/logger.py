@@ -1,16 +1,193 @@
+import atexit
 import logging
+import queue
 import sys
+import threading
+import time
+
+from config import LOG_ASYNC, LOG_QUEUE_SIZE, LOG_DEDUP_WINDOW, LOG_TEMPLATE_BURST
+
+_STOP = object()
+_SWEEP_PERIOD = 1.0   # s between two checks for closed rate-limit windows
+
+
+class LogRateLimiter:
+    """
+    Per-window deduplication and rate limiting, checked before the LogRecord
+    is even built (a suppressed call costs a dict lookup):
+
+      - identical messages (same level, template and arguments) pass once
+        per `window` seconds;
+      - below WARNING, one template (e.g. the per-cycle sensor line) passes
+        at most `burst` times per window, whatever its arguments.
+
+    Suppressed calls are counted; summaries() returns a "… ×N supprimés"
+    line for every window that closed with suppressed calls.
+    Use %-style arguments (logger.info("x=%s", x)): an f-string makes every
+    message a different template and is formatted even when filtered out.
+    """
+
+    def __init__(self, window=LOG_DEDUP_WINDOW, burst=LOG_TEMPLATE_BURST):
+        self.window     = window
+        self.burst      = burst
+        self.suppressed = 0
+        self._lock      = threading.Lock()
+        self._seen      = {}   # key → [window start, passed, suppressed, level, msg, args, kind]
+        self._closed    = []   # entries whose window closed with suppressed calls
+
+    def allow(self, level, msg, args):
+        now = time.monotonic()
+        template = (level, msg)
+        try:
+            identical = (level, msg, args)
+            hash(identical)
+        except TypeError:
+            identical = None   # arguments non hachables : pas de déduplication
+        checks = ((identical, 1, "identiques"),
+                  (template if level < logging.WARNING else None, self.burst, "similaires"))
+        with self._lock:
+            entries = []
+            for key, limit, kind in checks:
+                if key is None:
+                    continue
+                entry = self._seen.get(key)
+                if entry is None or now - entry[0] >= self.window:
+                    if entry is not None and entry[2]:
+                        self._closed.append(entry)
+                    entry = self._seen[key] = [now, 0, 0, level, msg, args, kind]
+                if entry[1] >= limit:
+                    entry[2] += 1
+                    self.suppressed += 1
+                    return False
+                entries.append(entry)
+            for entry in entries:
+                entry[1] += 1
+        return True
+
+    def summaries(self, force=False):
+        """[(level, text)] for the windows closed since the last call (all of them if force)."""
+        now = time.monotonic()
+        with self._lock:
+            closed, self._closed = self._closed, []
+            for key, entry in list(self._seen.items()):
+                if force or now - entry[0] >= self.window:
+                    del self._seen[key]
+                    if entry[2]:
+                        closed.append(entry)
+        out = []
+        for _, _, suppressed, level, msg, args, kind in closed:
+            try:
+                text = str(msg) % args if args else str(msg)
+            except (TypeError, ValueError):
+                text = str(msg)
+            out.append((level, f"{text} (… ×{suppressed} {kind} supprimés en {self.window:.0f}s)"))
+        return out
+
+
+class AsyncLogHandler(logging.Handler):
+    """
+    Non-blocking handler: emit() only puts the record on a bounded queue
+    (records are dropped and counted when it is full). A background thread
+    formats and writes them through `target`, and writes the rate limiter's
+    summaries as windows close.
+    """
+
+    def __init__(self, target, capacity=LOG_QUEUE_SIZE, limiter=None, name="SmartGarden"):
+        super().__init__()
+        self.target   = target
+        self.limiter  = limiter
+        self.dropped  = 0   # records lost because the queue was full
+        self._name    = name
+        self._queue   = queue.Queue(maxsize=capacity)
+        self._thread  = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def handle(self, record):
+        # Pas de verrou : Queue est déjà thread-safe
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+        super().close()
+
+    def _writer_loop(self):
+        next_sweep = time.monotonic() + _SWEEP_PERIOD
+        while True:
+            try:
+                record = self._queue.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                self._sweep(force=True)
+                self.target.flush()
+                return
+            if record is not None:
+                self._output(record)
+            if time.monotonic() >= next_sweep:
+                self._sweep()
+                next_sweep = time.monotonic() + _SWEEP_PERIOD
+            if self._queue.empty():
+                self.target.flush()
+
+    def _sweep(self, force=False):
+        if self.limiter is not None:
+            for level, text in self.limiter.summaries(force):
+                self._output(logging.LogRecord(self._name, level, __file__, 0, text, None, None))
+        if self.dropped:
+            lost, self.dropped = self.dropped, 0
+            self._output(logging.LogRecord(self._name, logging.WARNING, __file__, 0,
+                                           "Logger: %d messages perdus (file pleine)", (lost,), None))
+
+    def _output(self, record):
+        try:
+            self.target.handle(record)
+        except Exception:
+            self.handleError(record)
+
+
+class _GardenLogger(logging.Logger):
+    """Logger whose calls go through a LogRateLimiter before any record is built."""
+
+    limiter = None
+
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+        if self.limiter is not None and not exc_info and not self.limiter.allow(level, msg, args):
+            return
+        super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel + 1)
+
 
 def setup_logger(name="SmartGarden"):
-    logger = logging.getLogger(name)
+    previous = logging.getLoggerClass()
+    logging.setLoggerClass(_GardenLogger)
+    try:
+        logger = logging.getLogger(name)
+    finally:
+        logging.setLoggerClass(previous)
     logger.setLevel(logging.INFO)
-    
+
     if not logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         handler.setFormatter(formatter)
+        if LOG_ASYNC:
+            limiter = LogRateLimiter()
+            if isinstance(logger, _GardenLogger):
+                logger.limiter = limiter
+            handler = AsyncLogHandler(handler, limiter=limiter, name=name)
+            atexit.register(handler.close)
         logger.addHandler(handler)
-        
+
     return logger
 
 logger = setup_logger()
@@ -0,0 +1,84 @@
+import gzip
+import math
+import struct
+
+TRACE_MAGIC   = b"SGTR"
+TRACE_VERSION = 1
+
+# One record per control cycle, fixed size, little-endian:
+#   ts (epoch ms), temperature, humidity, dht_age (float32, NaN = None),
+#   rain ADC (0-255), rain_digital, lux (float32), is_dark
+_HEADER = struct.Struct("<4sBH")
+_RECORD = struct.Struct("<qfffBBf?")
+
+TRACE_FIELDS = ("ts", "temp", "hum", "dht_age", "rain_pct", "rain_digital", "lux", "is_dark")
+
+_NAN = float("nan")
+
+
+def _open(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def _f32(value):
+    return _NAN if value is None else float(value)
+
+
+def _opt(value):
+    return None if math.isnan(value) else round(value, 3)
+
+
+class TraceWriter:
+    """
+    Records raw sensor samples to a compact binary trace (27 bytes/cycle,
+    gzip-compressed when the path ends with .gz). Replay with replay.py.
+    """
+
+    def __init__(self, path):
+        self.path    = path
+        self.records = 0
+        self._file   = _open(path, "wb")
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, _RECORD.size))
+
+    def record(self, ts, temp, hum, dht_age, rain_pct, rain_digital, lux, is_dark):
+        self._file.write(_RECORD.pack(
+            int(ts), _f32(temp), _f32(hum), _f32(dht_age),
+            int(rain_pct) & 0xFF, int(rain_digital) & 0xFF, _f32(lux), bool(is_dark),
+        ))
+        self.records += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path, chunk_records=4096):
+    """
+    Yields one tuple per recorded cycle, in TRACE_FIELDS order. Missing
+    values (NaN on disk) come back as None. Reads the file in chunks.
+    """
+    with _open(path, "rb") as f:
+        magic, version, size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or size != _RECORD.size:
+            raise ValueError(f"{path}: not a v{TRACE_VERSION} sensor trace")
+        while True:
+            chunk = f.read(size * chunk_records)
+            if not chunk:
+                return
+            usable = len(chunk) - len(chunk) % size   # truncated tail (crash while recording)
+            for ts, temp, hum, age, rain, digital, lux, dark in _RECORD.iter_unpack(chunk[:usable]):
+                yield ts, _opt(temp), _opt(hum), _opt(age), rain, digital, round(lux, 3), dark
+            if usable < len(chunk):
+                return